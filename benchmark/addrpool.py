@@ -0,0 +1,35 @@
+'''
+AddrPool alloc/free pairs, as used by `nlm_request()`:
+every sequence number is banned for 0xff allocations.
+
+Usage::
+
+    python benchmark/addrpool.py [pairs]
+'''
+import sys
+import time
+from pyroute2.common import AddrPool
+
+
+def run(count, ban, window):
+    # `window` addresses are allocated at a time, like
+    # concurrent requests on one socket
+    pool = AddrPool(minaddr=0x000000ff, maxaddr=0x0000ffff)
+    active = [pool.alloc() for _ in range(window)]
+    t = time.time()
+    for i in range(count):
+        pool.free(active[i % window], ban=ban)
+        active[i % window] = pool.alloc()
+    return time.time() - t
+
+
+def main(count):
+    print('%-6s %-6s %10s %12s' % ('ban', 'window', 'total, s', 'pair, usec'))
+    for ban in (0, 0xff):
+        for window in (1, 64):
+            ret = run(count, ban, window)
+            print('%-6i %-6i %10.3f %12.3f' %
+                  (ban, window, ret, ret / count * 1000000))
+
+
+main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,95 @@
+'''
+Compare the generated (JIT) decoders with the generic decoder.
+
+Usage::
+
+    python benchmark/decoder.py [iterations]
+'''
+import sys
+import time
+from pyroute2 import config
+from pyroute2.netlink import cache_jit
+from pyroute2.netlink.rtnl import RTM_NEWROUTE
+from pyroute2.netlink.rtnl import RTM_NEWLINK
+from pyroute2.netlink.rtnl import RTM_NEWNEIGH
+from pyroute2.netlink.rtnl import RTM_NEWQDISC
+from pyroute2.netlink.rtnl.rtmsg import rtmsg
+from pyroute2.netlink.rtnl.ndmsg import ndmsg
+from pyroute2.netlink.rtnl.tcmsg import tcmsg
+from pyroute2.netlink.rtnl.ifinfmsg import ifinfmsg
+from pyroute2.netlink.rtnl.iprsocket import MarshalRtnl
+
+
+def sample(msg_class, msg_type, fields, attrs):
+    msg = msg_class()
+    msg.update(fields)
+    msg['attrs'] = attrs
+    msg['header']['type'] = msg_type
+    msg.encode()
+    return bytes(msg.data)
+
+
+samples = {
+    'rtmsg': sample(rtmsg, RTM_NEWROUTE,
+                    {'family': 2, 'dst_len': 24, 'table': 254},
+                    [['RTA_TABLE', 254],
+                     ['RTA_DST', '10.0.0.0'],
+                     ['RTA_GATEWAY', '10.1.1.1'],
+                     ['RTA_OIF', 2],
+                     ['RTA_PRIORITY', 100],
+                     ['RTA_METRICS', {'attrs': [['RTAX_MTU', 1400]]}]]),
+    'ifinfmsg': sample(ifinfmsg, RTM_NEWLINK,
+                       {'index': 3, 'flags': 0x1003},
+                       [['IFLA_IFNAME', 'eth0'],
+                        ['IFLA_MTU', 1500],
+                        ['IFLA_TXQLEN', 1000],
+                        ['IFLA_ADDRESS', '00:11:22:33:44:55'],
+                        ['IFLA_BROADCAST', 'ff:ff:ff:ff:ff:ff'],
+                        ['IFLA_QDISC', 'fq_codel'],
+                        ['IFLA_LINKINFO',
+                         {'attrs': [['IFLA_INFO_KIND', 'dummy']]}]]),
+    'ndmsg': sample(ndmsg, RTM_NEWNEIGH,
+                    {'family': 2, 'ifindex': 3, 'state': 2},
+                    [['NDA_DST', '10.0.0.1'],
+                     ['NDA_LLADDR', '00:11:22:33:44:55'],
+                     ['NDA_PROBES', 0]]),
+    'tcmsg': sample(tcmsg, RTM_NEWQDISC,
+                    {'index': 2, 'handle': 0x10000, 'parent': 0xffffffff},
+                    [['TCA_KIND', 'sfq']])}
+
+
+def decode(data, count):
+    marshal = MarshalRtnl()
+    for _ in range(count):
+        for msg in marshal.parse(data):
+            # decode all the NLA as well
+            for nla in msg['attrs']:
+                nla[1]
+
+
+def run(jit, count):
+    config.nlm_jit = jit
+    cache_jit.clear()
+    ret = {}
+    for name, data in samples.items():
+        data = data * 32
+        decode(data, 1)
+        t = time.time()
+        decode(data, count)
+        ret[name] = time.time() - t
+    return ret
+
+
+def main(count):
+    generic = run(False, count)
+    jit = run(True, count)
+    print('%-10s %10s %10s %8s' % ('class', 'generic, s', 'jit, s', 'gain'))
+    for name in sorted(samples):
+        print('%-10s %10.3f %10.3f %7.1f%%' %
+              (name,
+               generic[name],
+               jit[name],
+               (generic[name] - jit[name]) / generic[name] * 100))
+
+
+main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,264 @@
+'''
+Decode and encode throughput of the netlink message classes,
+import and startup time.
+
+The samples are binary fixtures, recorded or encoded once, in the
+`tests/decoder` format, see `benchmark/data` -- no kernel is used.
+The results can be saved as JSON and compared between commits.
+
+Usage::
+
+    python benchmark/parse.py [-n iterations] [-o result.json]
+    python benchmark/parse.py -c base.json [-t threshold]
+
+E.g., to compare two commits::
+
+    git checkout base
+    python benchmark/parse.py -o /tmp/base.json
+    git checkout new
+    python benchmark/parse.py -c /tmp/base.json
+
+With `-c` the script exits with 1 if any value regressed more
+than `threshold` percent, 10 by default.
+'''
+import os
+import sys
+import json
+import time
+import struct
+import argparse
+import platform
+import tracemalloc
+import subprocess
+from pyroute2 import config
+from pyroute2.common import load_dump
+from pyroute2.netlink.nlsocket import Marshal
+from pyroute2.netlink.rtnl.marshal import MarshalRtnl
+from pyroute2.netlink.rtnl.rtmsg import rtmsg
+from pyroute2.netlink.rtnl.ndmsg import ndmsg
+from pyroute2.netlink.rtnl.tcmsg import tcmsg
+from pyroute2.netlink.rtnl.ifinfmsg import ifinfmsg
+from pyroute2.netlink.nfnetlink.nfctsocket import nfct_msg
+from pyroute2.netlink.nfnetlink.ipset import ipset_msg
+from pyroute2.netlink.nfnetlink.nftsocket import nft_rule_msg
+from pyroute2.netlink.diag import inet_diag_msg
+from pyroute2.netlink.nl80211 import nl80211cmd
+
+root = os.path.dirname(os.path.abspath(__file__))
+data = os.path.join(root, 'data')
+decoder = os.path.join(root, '..', 'tests', 'decoder')
+
+# name: (message class, marshal class, fixtures)
+samples = {'rtmsg': (rtmsg, MarshalRtnl, ('rtmsg', )),
+           'ifinfmsg': (ifinfmsg, MarshalRtnl, ('ifinfmsg', )),
+           'ndmsg': (ndmsg, MarshalRtnl, ('ndmsg', )),
+           'tcmsg': (tcmsg, MarshalRtnl, ('tcmsg', )),
+           'nfct_msg': (nfct_msg, Marshal, ('nfct_msg', )),
+           'ipset_msg': (ipset_msg, Marshal, ('ipset_msg', )),
+           'nft_rule_msg': (nft_rule_msg, Marshal, ('nft_rule_msg', )),
+           'inet_diag_msg': (inet_diag_msg, Marshal, ('inet_diag_msg', )),
+           'nl80211': (nl80211cmd, Marshal,
+                       (os.path.join(decoder, 'iw_info_rsp'),
+                        os.path.join(decoder, 'iw_scan_rsp')))}
+
+# name: python code to run in a new interpreter
+startup = {'python': 'pass',
+           'import': 'import pyroute2',
+           'iproute': 'from pyroute2 import IPRoute',
+           'ndb': 'from pyroute2 import NDB',
+           'simulator': 'from pyroute2.iproute.linux import SimIPRoute\n'
+                        'SimIPRoute().close()'}
+
+# the values where the higher is the better
+higher = ('msg_per_sec', 'bytes_per_sec')
+
+
+def load(msg_class, marshal_class, fixtures):
+    buf = b''
+    for name in fixtures:
+        with open(os.path.join(data, name), 'r') as f:
+            buf += load_dump(f)
+    marshal = marshal_class()
+    if marshal_class is Marshal:
+        # a plain marshal: map all the fixture message types
+        offset = 0
+        while offset < len(buf):
+            length, msg_type = struct.unpack_from('IH', buf, offset)
+            marshal.msg_map[msg_type] = msg_class
+            offset += length
+    return buf, marshal
+
+
+def decode(marshal, buf):
+    msgs = marshal.parse(buf)
+    for msg in msgs:
+        if msg['header']['error'] is not None:
+            raise msg['header']['error']
+        # decode all the NLA as well
+        for nla in msg['attrs']:
+            nla[1]
+    return msgs
+
+
+def encode(msg_class, dumps):
+    length = 0
+    for dump in dumps:
+        msg = msg_class()
+        msg.setvalue(dump)
+        msg.encode()
+        length += len(msg.data)
+    return length
+
+
+def measure(func, count, *argv):
+    # returns (seconds per run, last result)
+    ret = func(*argv)
+    start = time.perf_counter()
+    for _ in range(count):
+        func(*argv)
+    return (time.perf_counter() - start) / count, ret
+
+
+def allocations(marshal, buf):
+    tracemalloc.start()
+    msgs = decode(marshal, buf)
+    snapshot = tracemalloc.take_snapshot()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    stats = snapshot.statistics('filename')
+    return {'blocks_per_msg': sum(x.count for x in stats) // len(msgs),
+            'bytes_per_msg': sum(x.size for x in stats) // len(msgs),
+            'peak_bytes': peak}
+
+
+def run_parse(name, count, batch):
+    msg_class, marshal_class, fixtures = samples[name]
+    buf, marshal = load(msg_class, marshal_class, fixtures)
+    # emulate a dump: several messages per buffer
+    buf = buf * batch
+    seconds, msgs = measure(decode, count, marshal, buf)
+    ret = {'decode': {'msg_per_sec': len(msgs) / seconds,
+                      'bytes_per_sec': len(buf) / seconds},
+           'alloc': allocations(marshal, buf)}
+    dumps = [msg.dump() for msg in msgs]
+    try:
+        seconds, length = measure(encode, count, msg_class, dumps)
+        ret['encode'] = {'msg_per_sec': len(dumps) / seconds,
+                         'bytes_per_sec': length / seconds}
+    except Exception as e:
+        # not all the classes can encode the decoded values back
+        ret['encode'] = {'error': repr(e)}
+    return ret
+
+
+def run_startup(name, count):
+    # the best of `count` runs, in a clean interpreter
+    ret = None
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, (os.path.dirname(root),
+                                                      env.get('PYTHONPATH'))))
+    for _ in range(count):
+        start = time.perf_counter()
+        subprocess.check_call([sys.executable, '-c', startup[name]], env=env)
+        seconds = time.perf_counter() - start
+        ret = seconds if ret is None else min(ret, seconds)
+    return {'seconds': ret}
+
+
+def revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                       cwd=root,
+                                       stderr=subprocess.DEVNULL)\
+            .decode('ascii').strip()
+    except Exception:
+        return None
+
+
+def flatten(result, prefix=''):
+    for key, value in sorted(result.items()):
+        if isinstance(value, dict):
+            for item in flatten(value, '%s%s.' % (prefix, key)):
+                yield item
+        elif isinstance(value, (int, float)):
+            yield '%s%s' % (prefix, key), value
+
+
+def compare(base, result, threshold):
+    base = dict(flatten(base['results']))
+    regressions = 0
+    print('%-42s %14s %14s %8s' % ('value', 'base', 'current', 'delta'))
+    for key, value in flatten(result['results']):
+        if key not in base or not base[key]:
+            continue
+        delta = (value - base[key]) / base[key] * 100
+        if key.split('.')[-1] not in higher:
+            delta = -delta
+        mark = ''
+        if delta < -threshold:
+            mark = ' !'
+            regressions += 1
+        print('%-42s %14.6g %14.6g %+7.1f%%%s' %
+              (key, base[key], value, delta, mark))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='netlink parser benchmark')
+    parser.add_argument('-n', '--iterations', type=int, default=200)
+    parser.add_argument('-b', '--batch', type=int, default=32,
+                        help='messages of a class per buffer')
+    parser.add_argument('-s', '--samples', default=','.join(sorted(samples)),
+                        help='comma separated list of the samples')
+    parser.add_argument('-r', '--startup', type=int, default=5,
+                        help='interpreter runs for the startup time, '
+                             '0 to skip')
+    parser.add_argument('-o', '--output', help='save the result as JSON')
+    parser.add_argument('-c', '--compare', help='JSON to compare with')
+    parser.add_argument('-t', '--threshold', type=float, default=10.0,
+                        help='regression threshold, percent')
+    args = parser.parse_args()
+
+    result = {'revision': revision(),
+              'time': time.time(),
+              'python': platform.python_version(),
+              'nlm_jit': getattr(config, 'nlm_jit', None),
+              'iterations': args.iterations,
+              'batch': args.batch,
+              'results': {'parse': {}, 'startup': {}}}
+    for name in args.samples.split(','):
+        result['results']['parse'][name] = run_parse(name,
+                                                     args.iterations,
+                                                     args.batch)
+    if args.startup:
+        for name in sorted(startup):
+            result['results']['startup'][name] = run_startup(name,
+                                                             args.startup)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=4, sort_keys=True)
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            base = json.load(f)
+        print('base: %s' % base.get('revision'))
+        if compare(base, result, args.threshold):
+            sys.exit(1)
+    else:
+        print('%-14s %12s %12s %12s %8s %10s' % ('class', 'decode, m/s',
+                                                 'MB/s', 'encode, m/s',
+                                                 'blocks', 'bytes'))
+        for name, ret in sorted(result['results']['parse'].items()):
+            print('%-14s %12.0f %12.2f %12s %8i %10i' %
+                  (name,
+                   ret['decode']['msg_per_sec'],
+                   ret['decode']['bytes_per_sec'] / 1048576,
+                   '%.0f' % ret['encode']['msg_per_sec']
+                   if 'msg_per_sec' in ret['encode'] else 'n/a',
+                   ret['alloc']['blocks_per_msg'],
+                   ret['alloc']['bytes_per_msg']))
+        for name, ret in sorted(result['results']['startup'].items()):
+            print('%-14s %10.3f s' % (name, ret['seconds']))
+
+
+main()
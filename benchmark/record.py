@@ -0,0 +1,84 @@
+'''
+Memory used by dumped routes: messages vs compact records.
+
+Usage::
+
+    python benchmark/record.py [routes]
+'''
+import gc
+import sys
+import tracemalloc
+from pyroute2.netlink.rtnl import RTM_NEWROUTE
+from pyroute2.netlink.rtnl.rtmsg import rtmsg
+from pyroute2.netlink.rtnl.iprsocket import MarshalRtnl
+
+
+def dump(count):
+    # emulate a table dump: several messages per buffer,
+    # as they're received from the socket
+    ret = []
+    chunk = bytearray()
+    for i in range(count):
+        msg = rtmsg()
+        msg['family'] = 2
+        msg['dst_len'] = 24
+        msg['table'] = 254
+        msg['proto'] = 4
+        msg['type'] = 1
+        msg['attrs'] = [['RTA_TABLE', 254],
+                        ['RTA_DST', '10.%i.%i.0' % (i >> 8 & 0xff,
+                                                    i & 0xff)],
+                        ['RTA_GATEWAY', '172.16.0.1'],
+                        ['RTA_OIF', 2],
+                        ['RTA_PRIORITY', 100],
+                        ['RTA_METRICS', {'attrs': [['RTAX_MTU', 1400]]}]]
+        msg['header']['type'] = RTM_NEWROUTE
+        msg.encode()
+        chunk.extend(msg.data)
+        if len(chunk) > 16384:
+            ret.append(bytes(chunk))
+            chunk = bytearray()
+    ret.append(bytes(chunk))
+    return ret
+
+
+def measure(chunks, convert):
+    marshal = MarshalRtnl()
+    gc.collect()
+    tracemalloc.start()
+    routes = []
+    for chunk in chunks:
+        routes.extend(convert(marshal.parse(chunk)))
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size, routes
+
+
+def messages(msgs):
+    return msgs
+
+
+def messages_decoded(msgs):
+    # as after the first access to all the NLAs
+    for msg in msgs:
+        for nla in msg['attrs']:
+            nla[1]
+    return msgs
+
+
+def records(msgs):
+    return [x.record() for x in msgs]
+
+
+def main(count):
+    chunks = dump(count)
+    for name, convert in (('messages', messages),
+                          ('messages, decoded', messages_decoded),
+                          ('records', records)):
+        size, routes = measure(chunks, convert)
+        assert len(routes) == count
+        print('%-20s %10i bytes per route' % (name, size // count))
+
+
+main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -13,6 +13,7 @@ import struct
 import socket
 import logging
 import threading
+import collections
 
 log = logging.getLogger(__name__)
 
@@ -373,8 +374,18 @@ def load_dump(f, meta=None):
 class AddrPool(object):
     '''
     Address pool
+
+    Free addresses are allocated from a FIFO free list, and
+    addresses that were never used -- from the cursor, so
+    `alloc()` and `free()` don't scan the pool. The bitmap
+    `addr_map` keeps the state of every address.
+
+    Banned addresses are kept in a time wheel, where the time
+    is the `alloc()` calls counter: an address freed with
+    `ban=N` becomes available after N+1 allocations.
     '''
     cell = 0xffffffffffffffff
+    wheel_size = 256
 
     def __init__(self,
                  minaddr=0xf,
@@ -388,7 +399,9 @@ class AddrPool(object):
         self.allocated = 0
         if self.release and not isinstance(self.release, int):
             raise TypeError()
-        self.ban = []
+        # the time wheel: [[(expire, addr), ...], ...]
+        self.ban = [[] for _ in range(self.wheel_size)]
+        self.tick = 0
         while mx:
             mx >>= 8
             self.cell_size += 1
@@ -397,55 +410,56 @@ class AddrPool(object):
         self.cells = int((maxaddr - minaddr) / self.cell_size + 1)
         # initial array
         self.addr_map = [self.cell]
+        # free addresses, as offsets from the pool start
+        self.free_list = collections.deque()
+        self.cursor = 0
         self.minaddr = minaddr
         self.maxaddr = maxaddr
         self.lock = threading.RLock()
 
     def alloc(self):
         with self.lock:
-            # gc self.ban:
-            for item in tuple(self.ban):
-                if item['counter'] == 0:
-                    self.free(item['addr'])
-                    self.ban.remove(item)
+            # release expired bans
+            self.tick += 1
+            slot = self.ban[self.tick % self.wheel_size]
+            if slot:
+                self._expire(slot)
+
+            while True:
+                if self.free_list:
+                    offset = self.free_list.popleft()
+                elif self.cursor <= self.maxaddr - self.minaddr:
+                    offset = self.cursor
+                    self.cursor += 1
                 else:
-                    item['counter'] -= 1
-
-            # iterate through addr_map
-            base = 0
-            for cell in self.addr_map:
-                if cell:
-                    # not allocated addr
-                    bit = 0
-                    while True:
-                        if (1 << bit) & self.addr_map[base]:
-                            self.addr_map[base] ^= 1 << bit
-                            break
-                        bit += 1
-                    ret = (base * self.cell_size + bit)
-
-                    if self.reverse:
-                        ret = self.maxaddr - ret
-                    else:
-                        ret = ret + self.minaddr
-
-                    if self.minaddr <= ret <= self.maxaddr:
-                        if self.release:
-                            self.free(ret, ban=self.release)
-                        self.allocated += 1
-                        return ret
-                    else:
-                        self.free(ret)
-                        raise KeyError('no free address available')
-
-                base += 1
-            # no free address available
-            if len(self.addr_map) < self.cells:
-                # create new cell to allocate address from
-                self.addr_map.append(self.cell)
-                return self.alloc()
+                    raise KeyError('no free address available')
+                base, bit = divmod(offset, self.cell_size)
+                if base >= len(self.addr_map):
+                    # create new cell to allocate address from
+                    self.addr_map.append(self.cell)
+                # skip addresses allocated with setaddr()
+                if self.addr_map[base] & (1 << bit):
+                    self.addr_map[base] ^= 1 << bit
+                    break
+
+            if self.reverse:
+                ret = self.maxaddr - offset
             else:
-                raise KeyError('no free address available')
+                ret = offset + self.minaddr
+            if self.release:
+                self.free(ret, ban=self.release)
+            self.allocated += 1
+            return ret
+
+    def _expire(self, slot):
+        pending = []
+        for item in slot:
+            if item[0] <= self.tick:
+                self.free(item[1])
+            else:
+                # bans longer than the wheel
+                pending.append(item)
+        slot[:] = pending
 
     def locate(self, addr):
         if self.reverse:
@@ -465,9 +479,12 @@ class AddrPool(object):
             raise TypeError()
         with self.lock:
             base, bit, is_allocated = self.locate(addr)
+            while len(self.addr_map) <= base:
+                self.addr_map.append(self.cell)
             if value == 'free' and is_allocated:
                 self.allocated -= 1
                 self.addr_map[base] |= 1 << bit
+                self.free_list.append(base * self.cell_size + bit)
             elif value == 'allocated' and not is_allocated:
                 self.allocated += 1
                 self.addr_map[base] &= ~(1 << bit)
@@ -475,8 +492,8 @@ class AddrPool(object):
     def free(self, addr, ban=0):
         with self.lock:
             if ban != 0:
-                self.ban.append({'addr': addr,
-                                 'counter': ban})
+                expire = self.tick + ban + 1
+                self.ban[expire % self.wheel_size].append((expire, addr))
             else:
                 base, bit, is_allocated = self.locate(addr)
                 if len(self.addr_map) <= base:
@@ -485,6 +502,7 @@ class AddrPool(object):
                     raise KeyError('address is not allocated')
                 self.allocated -= 1
                 self.addr_map[base] ^= 1 << bit
+                self.free_list.append(base * self.cell_size + bit)
 
 
 def _fnv1_python2(data):
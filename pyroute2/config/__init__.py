@@ -9,6 +9,7 @@ MpQueue = multiprocessing.Queue
 MpProcess = multiprocessing.Process
 ipdb_nl_async = True
 nlm_generator = False
+nlm_jit = True
 
 commit_barrier = 0
 gc_timeout = 60
@@ -807,7 +807,8 @@ class IPDB(object):
                  sndbuf=1048576, rcvbuf=1048576,
                  nl_bind_groups=RTMGRP_DEFAULTS,
                  ignore_rtables=None, callbacks=None,
-                 sort_addresses=False, plugins=None):
+                 sort_addresses=False, plugins=None, nl_stats=False,
+                 nl_resync=False):
         plugins = plugins or ['interfaces', 'routes', 'rules']
         pmap = {'interfaces': interfaces,
                 'routes': routes,
@@ -827,6 +828,8 @@ class IPDB(object):
         self.nl = nl
         self._sndbuf = sndbuf
         self._rcvbuf = rcvbuf
+        self._nl_stats = nl_stats
+        self._nl_resync = nl_resync
         self.nl_bind_groups = nl_bind_groups
         self._plugins = [pmap[x] for x in plugins if x in pmap]
         if isinstance(ignore_rtables, int):
@@ -947,9 +950,13 @@ class IPDB(object):
                 self._flush_mnl()
                 self.mnl.close()
             self.mnl = self.nl.clone()
+            if self._nl_stats:
+                self.nl.enable_stats()
+                self.mnl.enable_stats()
             try:
                 self.mnl.bind(groups=self.nl_bind_groups,
-                              async_cache=self._nl_async)
+                              async_cache=self._nl_async,
+                              resync=self._nl_resync)
             except:
                 self.mnl.close()
                 if self._nl_own is None:
@@ -1113,6 +1120,16 @@ class IPDB(object):
             for msg in evq:
                 yield msg
 
+    def stats(self):
+        '''
+        Return the instrumentation data of the command and the
+        monitoring sockets, see `NetlinkMixin.stats()`. Requires
+        `IPDB(nl_stats=True)`.
+        '''
+        return {'nl': self.nl.stats(),
+                'mnl': self.mnl.stats(),
+                'cbq_drop': self._cbq_drop}
+
     def release(self):
         '''
         Shutdown IPDB instance and sync the state. Since
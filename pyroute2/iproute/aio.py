@@ -0,0 +1,202 @@
+'''
+Asyncio RTNL API
+================
+
+`AsyncIPRoute` provides all the `RTNL_API` methods on top of
+`AsyncNetlinkSocket`. Every method returns an awaitable object,
+that is also an async iterator::
+
+    import asyncio
+    from pyroute2.iproute.aio import AsyncIPRoute
+
+    async def main():
+        ipr = AsyncIPRoute()
+        # get the whole response
+        lo = await ipr.link_lookup(ifname='lo')
+        await ipr.addr('add', index=lo[0], address='10.0.0.1', mask=24)
+        # or iterate a dump as it arrives
+        async for route in ipr.get_routes(table=254):
+            print(route.get_attr('RTA_DST'))
+        ipr.close()
+
+    asyncio.run(main())
+
+The methods are the regular synchronous `RTNL_API` code, run
+against the responses collected so far: when a method sends a
+request, the call is suspended until the response arrives, and
+then the method runs again from the beginning with the response
+available. So any number of calls can run concurrently on one
+socket w/o threads.
+
+Dumps are streamed when the dump is the first request of the
+method, e.g. `get_routes()`, `get_addr()`, `link_lookup()` or
+`flush_routes()`: the method runs for every batch of received
+messages. Other methods are iterated over the complete result.
+
+Unlike `IPRoute`, `AsyncIPRoute` doesn't use the netlink proxy,
+see `RawIPRoute`. The module requires Python 3.6+.
+'''
+import types
+from pyroute2.netlink import NLM_F_DUMP
+from pyroute2.netlink import NLM_F_REQUEST
+from pyroute2.netlink.rtnl.riprsocket import RawIPRSocket
+from pyroute2.netlink.asyncsocket import AsyncNetlinkSocket
+from pyroute2.iproute.linux import RTNL_API
+
+
+class Pending(Exception):
+    '''
+    A request that has no response yet
+    '''
+
+    def __init__(self, argv, kwarg):
+        super(Pending, self).__init__()
+        self.argv = argv
+        self.kwarg = kwarg
+
+
+class RTNL_Replay(RTNL_API):
+    '''
+    Run `RTNL_API` methods, replaying the responses collected
+    by an `AsyncCall`. On the first request w/o a response the
+    run stops with `Pending`.
+    '''
+
+    def __init__(self, call):
+        super(RTNL_Replay, self).__init__()
+        self.call = call
+        self.index = 0
+        self.puts = 0
+
+    def nlm_request(self, msg, msg_type,
+                    msg_flags=NLM_F_REQUEST | NLM_F_DUMP,
+                    terminate=None,
+                    callback=None,
+                    attrs=None,
+                    record=False,
+                    columns=None,
+                    strict=False,
+                    prefilter=None):
+        answers = self.call.answers
+        if self.index < len(answers):
+            ret = answers[self.index]
+            self.index += 1
+            if isinstance(ret, Exception):
+                raise ret
+            return ret
+        # columns are not passed: every run creates a new
+        # Columns object, so let the method feed it from
+        # the returned messages
+        raise Pending((msg, msg_type, msg_flags),
+                      {'terminate': terminate,
+                       'callback': callback,
+                       'attrs': attrs,
+                       'record': record,
+                       'strict': strict,
+                       'prefilter': prefilter})
+
+    def put(self, msg, msg_type,
+            msg_flags=NLM_F_REQUEST,
+            addr=(0, 0),
+            msg_seq=0,
+            msg_pid=None,
+            strict=False):
+        # send only the messages, not sent by previous runs
+        self.puts += 1
+        if self.puts > self.call.puts:
+            self.call.puts += 1
+            self.call.ipr.put(msg, msg_type, msg_flags, addr,
+                              msg_seq, msg_pid, strict)
+
+
+class AsyncCall(object):
+    '''
+    A call of an `RTNL_API` method. Await it to get the result,
+    or iterate it with `async for`.
+    '''
+
+    def __init__(self, ipr, method, argv, kwarg):
+        self.ipr = ipr
+        self.method = method
+        self.argv = argv
+        self.kwarg = kwarg
+        self.answers = []
+        self.puts = 0
+
+    def run(self):
+        ret = self.method(RTNL_Replay(self), *self.argv, **self.kwarg)
+        if isinstance(ret, types.GeneratorType):
+            ret = tuple(ret)
+        return ret
+
+    async def collect(self):
+        while True:
+            try:
+                return self.run()
+            except Pending as e:
+                pending = e
+            try:
+                ret = await self.ipr.nlm_request(*pending.argv,
+                                                 **pending.kwarg)
+            except Exception as error:
+                ret = error
+            self.answers.append(ret)
+
+    def __await__(self):
+        return self.collect().__await__()
+
+    def __aiter__(self):
+        return self.stream()
+
+    async def stream(self):
+        try:
+            ret = self.run()
+            pending = None
+        except Pending as e:
+            pending = e
+        if pending is not None and pending.argv[2] & NLM_F_DUMP:
+            request = self.ipr.nlm_request(*pending.argv, **pending.kwarg)
+            while True:
+                batch = await request.fetch()
+                if not batch:
+                    return
+                # run the method for every batch
+                self.answers = [batch]
+                self.puts = 0
+                for item in self.run():
+                    yield item
+        elif pending is not None:
+            ret = await self.collect()
+        for item in ret:
+            yield item
+
+
+def _method(name):
+    method = getattr(RTNL_API, name)
+
+    def wrapper(self, *argv, **kwarg):
+        return AsyncCall(self, method, argv, kwarg)
+
+    wrapper.__name__ = name
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+
+class AsyncIPRoute(AsyncNetlinkSocket):
+    '''
+    Asyncio RTNL API, see the module docs.
+
+    * loop -- the event loop, the running loop by default
+    '''
+
+    def __init__(self, loop=None):
+        super(AsyncIPRoute, self).__init__(RawIPRSocket(), loop)
+
+
+# pipelines are synchronous, and requests run concurrently anyways
+for name in dir(RTNL_API):
+    if not name.startswith('_') and \
+            name != 'pipeline' and \
+            callable(getattr(RTNL_API, name)) and \
+            not hasattr(AsyncIPRoute, name):
+        setattr(AsyncIPRoute, name, _method(name))
@@ -1,11 +1,15 @@
 # -*- coding: utf-8 -*-
+import copy
 import types
+import errno
 import logging
 from socket import AF_INET
 from socket import AF_INET6
 from socket import AF_UNSPEC
 from pyroute2 import config
 from pyroute2.config import AF_BRIDGE
+from pyroute2.netlink import nlmsg
+from pyroute2.netlink import nlmsg_record
 from pyroute2.netlink import NLMSG_ERROR
 from pyroute2.netlink import NLM_F_ATOMIC
 from pyroute2.netlink import NLM_F_ROOT
@@ -16,6 +20,7 @@ from pyroute2.netlink import NLM_F_DUMP
 from pyroute2.netlink import NLM_F_CREATE
 from pyroute2.netlink import NLM_F_EXCL
 from pyroute2.netlink import NLM_F_APPEND
+from pyroute2.netlink.exceptions import NetlinkError
 from pyroute2.netlink.rtnl import RTM_NEWADDR
 from pyroute2.netlink.rtnl import RTM_GETADDR
 from pyroute2.netlink.rtnl import RTM_DELADDR
@@ -61,8 +66,13 @@ from pyroute2.netlink.rtnl.ifinfmsg import ifinfmsg
 from pyroute2.netlink.rtnl.ifinfmsg import IFF_NOARP
 from pyroute2.netlink.rtnl.ifaddrmsg import ifaddrmsg
 from pyroute2.netlink.rtnl.iprsocket import IPRSocket
+from pyroute2.netlink.columns import Columns
 from pyroute2.netlink.rtnl.iprsocket import IPBatchSocket
 from pyroute2.netlink.rtnl.riprsocket import RawIPRSocket
+from pyroute2.netlink.nlsocket import NetlinkPipeline
+from pyroute2.netlink.nlsocket import NetlinkBulk
+from pyroute2.netlink.capture import ReplayMixin
+from pyroute2.netlink.rtnl.simulator import SimulatorMixin
 
 from pyroute2.common import AF_MPLS
 from pyroute2.common import basestring
@@ -71,6 +81,219 @@ from pyroute2.common import getbroadcast
 DEFAULT_TABLE = 254
 log = logging.getLogger(__name__)
 
+# kernel side dump filters, see RTNL_API._dump_filter(): header
+# fields and NLA, that are accepted in strict dump requests
+strict_filters = {rtmsg: (('proto', 'type'), ('RTA_TABLE', 'RTA_OIF')),
+                  ifaddrmsg: (('index', ), ()),
+                  ndmsg.ndmsg: ((), ('NDA_IFINDEX', 'NDA_MASTER'))}
+
+
+# route NLA, that make the route key, see route_key()
+route_key_nla = ('RTA_DST', 'RTA_TABLE', 'RTA_PRIORITY')
+RTM_F_CLONED = 0x200
+IP6_RT_PRIO_USER = 1024
+
+
+def route_key(msg):
+    '''
+    Route key in a table, like `pyroute2.ipdb.routes.Route.make_key()`:
+    `(dst, table, family, priority, tos)`. The kernel default metric
+    is used for routes w/o RTA_PRIORITY. Works both with messages
+    and records.
+    '''
+    family = msg['family']
+    dst = msg.get_attr('RTA_DST')
+    priority = msg.get_attr('RTA_PRIORITY')
+    if priority is None:
+        priority = IP6_RT_PRIO_USER if family == AF_INET6 else 0
+    return ('%s/%s' % (dst, msg['dst_len']) if dst is not None else 'default',
+            msg.get_attr('RTA_TABLE') or msg['table'],
+            family,
+            priority,
+            msg['tos'] if family == AF_INET else None)
+
+
+def route_value(value):
+    '''
+    Hashable and order independent representation of a route
+    NLA value: nested NLA become sets of `(name, value)`, and
+    RTA_MULTIPATH becomes the set of next hops, w/o the next hop
+    flags, that are set by the kernel
+    '''
+    if isinstance(value, dict):
+        ret = [(x[0], route_value(x[1])) for x in value.items()
+               if x[0] not in ('attrs', 'header', 'flags')]
+        ret.extend([(x[0], route_value(x[1]))
+                    for x in value.get('attrs', ())])
+        return frozenset(ret)
+    elif isinstance(value, (list, tuple)):
+        return frozenset([route_value(x) for x in value])
+    return value
+
+
+def route_hop(hop, fields=('hops', 'oif')):
+    '''
+    Hashable representation of an ECMP next hop: the `fields`,
+    that are present in the hop, and the NLA
+    '''
+    ret = [(x, hop[x]) for x in fields if x in hop]
+    ret.extend([(x[0], route_value(x[1])) for x in hop.get('attrs', ())])
+    return frozenset(ret)
+
+
+def route_hops_match(hops, want):
+    '''
+    Check if the next hops `hops` match the desired ones; every
+    desired hop, see `route_hop()`, must match a different hop
+    '''
+    hops = [route_hop(x) for x in hops or ()]
+    if len(hops) != len(want):
+        return False
+
+    def match(position, used):
+        if position == len(want):
+            return True
+        for (index, hop) in enumerate(hops):
+            if index not in used and \
+                    want[position] <= hop and \
+                    match(position + 1, used | set((index, ))):
+                return True
+        return False
+
+    return match(0, frozenset())
+
+
+# compiled match functions, see compile_match()
+match_plans = {}
+# message keys, that are not fields, but may be matched
+match_keys = ('attrs', 'header', 'event', 'value')
+
+
+def match_plan(msg_class, shape):
+    '''
+    Generate the match function factory for a message class and
+    a match spec shape, `((key, kind), ...)`, where the kind is
+    'function', 'none' or 'value'. The factory takes the spec
+    values and returns the predicate.
+
+    Every key is resolved once: a field, an NLA or both, so the
+    predicate does not translate names and does not look up NLA,
+    that the class has not.
+    '''
+    record = issubclass(msg_class, nlmsg_record)
+    if record:
+        msg_class = msg_class.msg_class
+    fields = set([x[0] for x in msg_class.fields])
+    nlas = set([x[0] if isinstance(x[0], basestring) else x[1]
+                for x in msg_class.nla_map])
+    code = ['def factory(%s):' % ', '.join(['v%i' % x for x in
+                                            range(len(shape))] + ['']),
+            '    def predicate(msg):',
+            '        get = msg.get',
+            '        get_attr = msg.get_attr']
+    for (index, (key, kind)) in enumerate(shape):
+        name = msg_class.name2nla(key)
+        value = 'v%i' % index
+        field = key in fields or key in match_keys
+        nla = name in nlas
+        # msg.get(key) returns None for other keys
+        get = 'get(%r)' % key if field else 'None'
+        if kind == 'function':
+            code.append('        value = %s' % get)
+            if nla:
+                code.extend(['        if value is None:',
+                             '            value = get_attr(%r)' % name])
+            code.extend(['        if value is None or not %s(value):'
+                         % value,
+                         '            return False'])
+            continue
+        if kind == 'none' and not (field and nla):
+            # the missing field or NLA is None, always True
+            continue
+        checks = []
+        if field:
+            checks.append('%s == %s' % (get, value))
+        if nla:
+            checks.append('get_attr(%r) == %s' % (name, value))
+        if not checks:
+            checks.append('False')
+        code.extend(['        if not (%s):' % ' or '.join(checks),
+                     '            return False'])
+    code.extend(['        return True',
+                 '    return predicate'])
+    namespace = {}
+    exec(compile('\n'.join(code),
+                 '<match %s>' % msg_class.__name__,
+                 'exec'), namespace)
+    return namespace['factory']
+
+
+def compile_match(match):
+    '''
+    Compile a match dict, see `RTNL_API._match()`, into a predicate.
+    Keys are NLA names or fields, values are values to compare
+    with, or functions to call with the value::
+
+        predicate = compile_match({'table': 254,
+                                   'dst_len': lambda x: x > 16})
+
+    The functions are compiled for every message class on the first
+    message and cached by the spec shape, see `match_plan()`.
+    '''
+    shape = []
+    values = []
+    for (key, value) in match.items():
+        if isinstance(value, types.FunctionType):
+            kind = 'function'
+        elif value is None:
+            kind = 'none'
+        else:
+            kind = 'value'
+        shape.append((key, kind))
+        values.append(value)
+    shape = tuple(shape)
+    predicates = {}
+
+    def predicate(msg):
+        msg_class = type(msg)
+        check = predicates.get(msg_class)
+        if check is None:
+            factory = match_plans.get((msg_class, shape))
+            if factory is None:
+                factory = match_plan(msg_class, shape)
+                if len(match_plans) > 1024:
+                    match_plans.clear()
+                match_plans[(msg_class, shape)] = factory
+            check = predicates[msg_class] = factory(*values)
+        return check(msg)
+
+    return predicate
+
+
+def match_prefilter(msg_class, match):
+    '''
+    Header-only part of a match dict: integer header fields, that
+    have no NLA twins, see `Marshal.compile_prefilter()`. `table`
+    is accepted, since the prefilter handles RTA_TABLE. Return a
+    dict or None.
+    '''
+    if not isinstance(match, dict):
+        return None
+    header = [x[0] for x in nlmsg.header]
+    fields = [x[0] for x in msg_class.fields]
+    nlas = set([x[0] if isinstance(x[0], basestring) else x[1]
+                for x in msg_class.nla_map])
+    ret = {}
+    for (key, value) in match.items():
+        if not isinstance(value, int) or isinstance(value, bool):
+            continue
+        if key not in fields or key in header:
+            continue
+        if key != 'table' and msg_class.name2nla(key) in nlas:
+            continue
+        ret[key] = value
+    return ret or None
+
 
 def transform_handle(handle):
     if isinstance(handle, basestring):
@@ -129,27 +352,82 @@ class RTNL_API(object):
 
     def _match(self, match, msgs):
         # filtered results, the generator version
+        if hasattr(match, '__call__'):
+            predicate = match
+        elif isinstance(match, dict):
+            # see compile_match()
+            predicate = compile_match(match)
+        else:
+            return
         for msg in msgs:
-            if hasattr(match, '__call__'):
-                if match(msg):
-                    yield msg
-            elif isinstance(match, dict):
-                matches = []
-                for key in match:
-                    KEY = msg.name2nla(key)
-                    if isinstance(match[key], types.FunctionType):
-                        if msg.get(key) is not None:
-                            matches.append(match[key](msg.get(key)))
-                        elif msg.get_attr(KEY) is not None:
-                            matches.append(match[key](msg.get_attr(KEY)))
-                        else:
-                            matches.append(False)
-                    else:
-                        matches.append(msg.get(key) == match[key] or
-                                       msg.get_attr(KEY) ==
-                                       match[key])
-                if all(matches):
-                    yield msg
+            if predicate(msg):
+                yield msg
+
+    def _dump_filter(self, msg, match):
+        # move integer values from the match dict to the dump
+        # request, so the kernel can filter the dump; return
+        # True if there is something to filter
+        #
+        # the results are filtered with _match() anyways
+        if not isinstance(match, dict):
+            return False
+        (fields, nla) = strict_filters[type(msg)]
+        ret = False
+        for (key, value) in match.items():
+            if not isinstance(value, int) or isinstance(value, bool):
+                continue
+            name = msg.name2nla(key)
+            if name in nla:
+                msg['attrs'].append([name, value])
+            elif key in fields:
+                msg[key] = value
+            else:
+                continue
+            ret = True
+        return ret
+
+    def _dump_request(self, msg, msg_type, match, **kwarg):
+        # request a dump, filtered by the kernel if possible, see
+        # NetlinkMixin.set_strict_check(); the msg must contain
+        # no other header fields and NLA
+        strict = self._dump_filter(msg, match)
+        # drop not matching messages before decoding; the results
+        # are filtered with _match() anyways
+        prefilter = match_prefilter(type(msg), match)
+        try:
+            ret = self.nlm_request(msg, msg_type,
+                                   strict=strict,
+                                   prefilter=prefilter,
+                                   **kwarg)
+        except NetlinkError as e:
+            if strict and e.code in (errno.ENOENT, errno.ENODEV):
+                return ()
+            raise
+        if strict:
+            ret = self._strict_errors(ret)
+        return ret
+
+    def _strict_errors(self, ret):
+        # strict dumps fail for missing tables and interfaces,
+        # while the regular ones return nothing
+        try:
+            for msg in ret:
+                yield msg
+        except NetlinkError as e:
+            if e.code not in (errno.ENOENT, errno.ENODEV):
+                raise
+
+    def _nla_filter(self, msg_class, attrs, match):
+        # NLA projection for dumps: translate NLA names, like
+        # `dst` -> `RTA_DST`, and add NLAs used in the match
+        # dict, so the filter will get the data it needs
+        if attrs is None:
+            return None
+        ret = set([msg_class.name2nla(x) for x in attrs])
+        if isinstance(match, dict):
+            for key in match:
+                ret.add(msg_class.name2nla(key))
+        return frozenset(ret)
 
     # 8<---------------------------------------------------------------
     #
@@ -222,6 +500,16 @@ class RTNL_API(object):
 
             interfaces = [1, 2, 3]
             ip.get_links(*interfaces)
+
+        To decode only some NLAs, use the `attrs` parameter. Other
+        NLAs, including nested ones, are skipped by the parser::
+
+            ip.get_links(attrs=['ifname', 'address'])
+
+        With `record=True` the method returns compact read-only
+        records instead of messages, see `get_routes()`::
+
+            ip.get_links(record=True)
         '''
         result = []
         links = argv or [0]
@@ -238,7 +526,8 @@ class RTNL_API(object):
             result.extend(self.link(cmd, **kwarg))
         return result
 
-    def get_neighbours(self, family=AF_UNSPEC, match=None, **kwarg):
+    def get_neighbours(self, family=AF_UNSPEC, match=None, attrs=None,
+                       record=False, **kwarg):
         '''
         Dump ARP cache records.
 
@@ -248,7 +537,9 @@ class RTNL_API(object):
 
         If other keyword arguments not empty, they are used as
         filter. Also, one can explicitly set filter as a function
-        with the `match` parameter.
+        with the `match` parameter. The `ifindex` and `master`
+        filters are sent to the kernel, if it supports strict dump
+        requests, see `get_routes()`.
 
         Examples::
 
@@ -263,8 +554,18 @@ class RTNL_API(object):
 
             # and filter them by a function:
             ip.get_neighbours(AF_BRIDGE, match=lambda x: x['state'] == 2)
+
+            # decode only NDA_DST and NDA_LLADDR:
+            ip.get_neighbours(attrs=['dst', 'lladdr'])
+
+            # compact read-only records, see get_routes():
+            ip.get_neighbours(record=True)
         '''
-        return self.neigh('dump', family=family, match=match or kwarg)
+        return self.neigh('dump',
+                          family=family,
+                          match=match or kwarg,
+                          attrs=attrs,
+                          record=record)
 
     def get_ntables(self, family=AF_UNSPEC):
         '''
@@ -274,7 +575,8 @@ class RTNL_API(object):
         msg['family'] = family
         return self.nlm_request(msg, RTM_GETNEIGHTBL)
 
-    def get_addr(self, family=AF_UNSPEC, match=None, **kwarg):
+    def get_addr(self, family=AF_UNSPEC, match=None, record=False,
+                 **kwarg):
         '''
         Dump addresses.
 
@@ -289,6 +591,9 @@ class RTNL_API(object):
             # get addresses for the 2nd interface
             ip.get_addr(index=2)
 
+        The `index` filter is sent to the kernel, if it supports
+        strict dump requests, see `get_routes()`.
+
             # get addresses with IFA_LABEL == 'eth0'
             ip.get_addr(label='eth0')
 
@@ -300,8 +605,16 @@ class RTNL_API(object):
         A custom predicate can be used as a filter::
 
             ip.get_addr(match=lambda x: x['index'] == 1)
+
+        With `record=True` compact read-only records are returned,
+        see `get_routes()`::
+
+            ip.get_addr(record=True)
         '''
-        return self.addr('dump', family=family, match=match or kwarg)
+        return self.addr('dump',
+                         family=family,
+                         match=match or kwarg,
+                         record=record)
 
     def get_rules(self, family=AF_UNSPEC, match=None, **kwarg):
         '''
@@ -317,19 +630,43 @@ class RTNL_API(object):
                          family=family,
                          match=match or kwarg)
 
-    def get_routes(self, family=255, match=None, **kwarg):
+    def get_routes(self, family=255, match=None, attrs=None, record=False,
+                   **kwarg):
         '''
         Get all routes. You can specify the table. There
         are 255 routing classes (tables), and the kernel
         returns all the routes on each request. So the
         routine filters routes from full output.
 
+        Kernels 4.20+ support strict dump requests, see
+        `NETLINK_GET_STRICT_CHK`: there the integer `table`,
+        `oif`, `proto` and `type` filters are sent to the
+        kernel, so only matching routes are dumped. All the
+        other filters are applied to the results.
+
         Example::
 
             ip.get_routes()  # get all the routes for all families
             ip.get_routes(family=AF_INET6)  # get only IPv6 routes
             ip.get_routes(table=254)  # get routes from 254 table
 
+        The `attrs` parameter limits the NLAs to decode. All other
+        NLAs, and the nested ones like RTA_METRICS or RTA_MULTIPATH,
+        are skipped by the parser, unless they're explicitly listed.
+        NLAs used in the filter are decoded anyways::
+
+            # decode only RTA_DST, RTA_GATEWAY and RTA_OIF
+            ip.get_routes(attrs=['dst', 'gateway'], oif=2)
+
+        With `record=True` the method returns compact read-only
+        records, see `pyroute2.netlink.nlmsg_record`, instead of
+        messages. Records take several times less memory, that
+        matters for big tables. NLAs are available by name, nested
+        NLAs are decoded on access::
+
+            for route in ip.get_routes(table=254, record=True):
+                print(route.dst, route['dst_len'], route.gateway)
+
         The default family=255 is a hack. Despite the specs,
         the kernel returns only IPv4 routes for AF_UNSPEC family.
         But it returns all the routes for all the families if one
@@ -338,11 +675,234 @@ class RTNL_API(object):
         '''
         # get a particular route?
         if isinstance(kwarg.get('dst'), basestring):
-            return self.route('get', dst=kwarg['dst'])
+            return self.route('get',
+                              dst=kwarg['dst'],
+                              attrs=attrs,
+                              record=record)
         else:
             return self.route('dump',
                               family=family,
-                              match=match or kwarg)
+                              match=match or kwarg,
+                              attrs=attrs,
+                              record=record)
+
+    def dump_columns(self, kind, columns, family=None):
+        '''
+        Dump objects into columns, see `pyroute2.netlink.columns`.
+        Messages are decoded directly into `array.array` and list
+        columns, without creating message objects::
+
+            routes = ip.dump_columns('routes', ['dst', 'dst_len',
+                                                'oif', 'gateway',
+                                                'table'])
+            # filter and aggregate columns
+            main = [x for x in zip(routes['dst'], routes['table'])
+                    if x[1] == 254]
+
+            # with NumPy installed
+            routes = routes.to_numpy()
+
+        * kind -- 'links', 'addr', 'neighbours' or 'routes'
+        * columns -- the list of fields and NLA names
+        * family -- the dump family, all the families by default
+        '''
+        (msg_class, get_type, new_type, default) = {
+            'links': (ifinfmsg, RTM_GETLINK, RTM_NEWLINK, AF_UNSPEC),
+            'addr': (ifaddrmsg, RTM_GETADDR, RTM_NEWADDR, AF_UNSPEC),
+            'neighbours': (ndmsg.ndmsg, RTM_GETNEIGH, RTM_NEWNEIGH,
+                           AF_UNSPEC),
+            'routes': (rtmsg, RTM_GETROUTE, RTM_NEWROUTE, 255)}[kind]
+        ret = Columns(msg_class, new_type, columns)
+        msg = msg_class()
+        msg['family'] = default if family is None else family
+        for msg in self.nlm_request(msg,
+                                    msg_type=get_type,
+                                    msg_flags=NLM_F_REQUEST | NLM_F_DUMP,
+                                    columns=ret):
+            # messages parsed by another thread, see `Marshal.parse()`
+            if msg['header']['type'] == new_type:
+                ret.feed(msg.data, msg.offset)
+        return ret
+
+    def pipeline(self, chunk=32768):
+        '''
+        Pipelined requests, see `IPPipeline`::
+
+            with ip.pipeline() as pipe:
+                for i in range(1000):
+                    pipe.route('add', dst='10.0.%i.0/24' % (i % 256),
+                               table=100 + i // 256,
+                               gateway='10.1.0.1')
+            errors = [x for x in pipe.results
+                      if isinstance(x, Exception)]
+        '''
+        return IPPipeline(self, chunk)
+
+    def route_bulk(self, command, routes, chunk=32768, ack=True):
+        '''
+        Bulk route programming. `routes` is an iterable of dicts
+        with the same keywords as for `route()`; the requests are
+        encoded and sent in chunks of `chunk` bytes while the
+        iterable is consumed, see `IPBulk`::
+
+            routes = ({'dst': '10.%i.%i.0/24' % (i >> 8, i & 0xff),
+                       'gateway': '172.16.0.1'} for i in range(65536))
+            result = ip.route_bulk('add', routes)
+            for (index, error) in result.errors.items():
+                ...
+
+        Return `pyroute2.netlink.nlsocket.BulkResult`. Indices
+        in `result.errors` are positions in `routes`.
+
+        With `ack=False` the kernel sends only errors, but not
+        ACKs, that saves the traffic and parsing; errors are
+        collected anyway.
+        '''
+        bulk = IPBulk(self, chunk, ack)
+        try:
+            for spec in routes:
+                bulk.route(command, **spec)
+        except Exception:
+            bulk.reset()
+            raise
+        return bulk.commit()
+
+    def sync_routes(self, desired, table=DEFAULT_TABLE, family=255,
+                    proto='static', dry_run=False, chunk=32768):
+        '''
+        Make the routing table look like the `desired` list of
+        routes: add missing routes, replace changed ones and delete
+        routes, that are not in the list. Routes that are already
+        as desired are not touched, so the cost depends on the
+        number of changes, not on the size of the table::
+
+            desired = [{'dst': '10.0.0.0/24', 'gateway': '10.1.0.1'},
+                       {'dst': '10.0.1.0/24',
+                        'multipath': [{'gateway': '10.1.0.1'},
+                                      {'gateway': '10.1.0.2'}]}]
+            ret = ip.sync_routes(desired, table=100, proto='zebra')
+
+        Parameters:
+
+        * desired -- an iterable of dicts with the same keywords
+          as for `route()`; `table` and `proto` of the specs are
+          set from the method arguments
+        * table -- the table to sync
+        * family -- the address family to sync, all by default
+        * proto -- sync only the routes of this protocol, other
+          routes in the table are not deleted; `None` to sync all
+          the routes of the table
+        * dry_run -- only compute the changes
+        * chunk -- see `route_bulk()`
+
+        Routes are matched by the key `(dst, table, family, priority,
+        tos)`, see `route_key()`; a route is replaced if any of the
+        desired NLA differs, ECMP next hops are compared as sets.
+        NLA and next hop fields, like `oif`, that are not in the spec,
+        are not compared. With `family` set, all the specs must be
+        of this family, otherwise `ValueError` is raised. The current
+        table is streamed from a filtered dump, only the index of
+        the desired routes is kept in memory. The changes are sent
+        with `IPBulk`.
+
+        Return a dict::
+
+            {'add': [spec, ...],
+             'replace': [spec, ...],
+             'delete': [spec, ...],
+             'unchanged': count,
+             'errors': [(command, spec, exception), ...]}
+        '''
+        # index the desired routes: compile the specs and decode
+        # them back, so they are normalized like the dump messages
+        index = {}
+        compiler = IPBatch()
+        for spec in desired:
+            spec = dict(spec, table=table)
+            if proto is not None:
+                spec['proto'] = proto
+            # route() changes nested dicts, like multipath hops
+            compiler.route('replace', **copy.deepcopy(spec))
+            msg = rtmsg(compiler.batch)
+            msg.decode()
+            compiler.reset()
+            if family not in (255, AF_UNSPEC) and msg['family'] != family:
+                compiler.close()
+                raise ValueError('route family mismatch: %s' % (spec, ))
+            value = [(x, msg[x]) for x in ('type', 'scope', 'proto')
+                     if x != 'proto' or 'proto' in spec]
+            for (name, attr) in msg['attrs']:
+                if name == 'RTA_MULTIPATH':
+                    # compare only the hop fields, set in the spec
+                    attr = tuple([route_hop(x, [y for y in ('hops', 'oif')
+                                                if y in hop])
+                                  for (x, hop) in zip(attr,
+                                                      spec['multipath'])])
+                elif name not in route_key_nla:
+                    attr = route_value(attr)
+                else:
+                    continue
+                value.append((name, attr))
+            index[route_key(msg)] = (spec, value)
+        compiler.close()
+
+        ret = {'add': [],
+               'replace': [],
+               'delete': [],
+               'unchanged': 0,
+               'errors': []}
+        match = {'table': table}
+        if proto is not None:
+            match['proto'] = rt_proto[proto] \
+                if isinstance(proto, basestring) else proto
+        seen = set()
+        for route in self.get_routes(family=family, record=True, **match):
+            if route['flags'] & RTM_F_CLONED:
+                continue
+            key = route_key(route)
+            if key not in index:
+                spec = {'table': table,
+                        'family': key[2],
+                        'dst_len': route['dst_len'],
+                        'proto': route['proto'],
+                        'type': route['type']}
+                for (name, value) in (('dst', route.get_attr('RTA_DST')),
+                                      ('priority',
+                                       route.get_attr('RTA_PRIORITY')),
+                                      ('tos', route['tos'])):
+                    if value:
+                        spec[name] = value
+                ret['delete'].append(spec)
+                continue
+            seen.add(key)
+            spec, value = index[key]
+            for (name, want) in value:
+                if name == 'RTA_MULTIPATH':
+                    if route_hops_match(route.get_attr(name), want):
+                        continue
+                    have = None
+                elif name[:4] == 'RTA_':
+                    have = route_value(route.get_attr(name))
+                else:
+                    have = route[name]
+                if have != want:
+                    ret['replace'].append(spec)
+                    break
+            else:
+                ret['unchanged'] += 1
+        ret['add'] = [x[0] for (key, x) in index.items() if key not in seen]
+
+        if not dry_run:
+            ops = [('del', x) for x in ret['delete']]
+            ops.extend([('replace', x) for x in ret['replace']])
+            ops.extend([('replace', x) for x in ret['add']])
+            bulk = IPBulk(self, chunk)
+            for (command, spec) in ops:
+                bulk.route(command, **copy.deepcopy(spec))
+            result = bulk.commit()
+            ret['errors'] = [ops[x] + (result.errors[x], )
+                             for x in sorted(result.errors)]
+        return ret
     # 8<---------------------------------------------------------------
 
     # 8<---------------------------------------------------------------
@@ -371,6 +931,14 @@ class RTNL_API(object):
 
         Please note, that link_lookup() returns list, not one
         value.
+
+        Names, `ifname` and `alt_ifname`, are resolved with one
+        RTM_GETLINK request. Other keys require a dump of all the
+        links, unless the socket keeps the link index, see
+        `pyroute2.netlink.rtnl.linkindex`::
+
+            ip.bind(link_index=True)
+            ip.link_lookup(kind="vlan")
         '''
         name = tuple(kwarg.keys())[0]
         value = kwarg[name]
@@ -379,22 +947,122 @@ class RTNL_API(object):
         if not name.startswith('IFLA_'):
             name = 'IFLA_%s' % (name)
 
-        return [k['index'] for k in
-                [i for i in self.get_links() if 'attrs' in i] if
-                [l for l in k['attrs'] if l[0] == name and l[1] == value]]
+        if name in ('IFLA_IFNAME', 'IFLA_ALT_IFNAME'):
+            try:
+                return [x['index'] for x in
+                        self.link('get', attrs=(), **{name: value})]
+            except NetlinkError as e:
+                # ENODEV: no such link; EINVAL, ERANGE: the name
+                # is not valid, or IFLA_ALT_IFNAME is not supported
+                if e.code not in (errno.ENODEV, errno.EINVAL, errno.ERANGE):
+                    raise
+                return []
+
+        if self.link_index is not None and name in self.link_index.keys:
+            return self.link_index.lookup(name, value)
+
+        if name == 'IFLA_KIND':
+            return [x['index'] for x in self.get_links(attrs=('linkinfo', ))
+                    if x.get_nested('IFLA_LINKINFO',
+                                    'IFLA_INFO_KIND') == value]
+        return [x['index'] for x in self.get_links(attrs=(name, ))
+                if x.get_attr(name) == value]
     # 8<---------------------------------------------------------------
 
     # 8<---------------------------------------------------------------
     #
     # Shortcuts to flush RTNL objects
     #
+    def _flush(self, msg_class, family, match, get_type, del_type,
+               flags, chunk):
+        # streaming flush: the objects are deleted from the dump
+        # callback, that drops the messages, while the dump goes on;
+        # the socket can not be read there, so IPBulk doesn't wait
+        # for ACKs, see NetlinkBulk
+        new_type = del_type - 1
+        if isinstance(match, dict):
+            predicate = compile_match(match)
+            attrs = self._nla_filter(msg_class, (), match)
+        else:
+            predicate = match
+            attrs = None
+        bulk = IPBulk(self, chunk, False, False)
+
+        def callback(msg):
+            if msg['header']['type'] != new_type:
+                return False
+            if predicate(msg):
+                # like iproute2, send back the dumped message
+                bulk.nlm_request(msg.data[msg.offset:
+                                          msg.offset + msg.length],
+                                 msg_type=del_type,
+                                 msg_flags=flags)
+            return True
+
+        try:
+            # objects, deleted during a dump, may shift other
+            # objects, so repeat the dump like `ip route flush`
+            for _ in range(10):
+                success = bulk.result.success
+                msg = msg_class()
+                msg['family'] = family
+                msg['attrs'] = []
+                strict = False
+                if msg_class in strict_filters:
+                    strict = self._dump_filter(msg, match)
+                try:
+                    tuple(self.nlm_request(msg,
+                                           get_type,
+                                           NLM_F_REQUEST | NLM_F_DUMP,
+                                           callback=callback,
+                                           attrs=attrs,
+                                           strict=strict,
+                                           prefilter=match_prefilter(
+                                               msg_class, match)))
+                except NetlinkError as e:
+                    if not strict or e.code not in (errno.ENOENT,
+                                                    errno.ENODEV):
+                        raise
+                bulk.commit()
+                if bulk.result.success == success:
+                    break
+        except Exception:
+            bulk.reset()
+            raise
+        return bulk.result
+
     def flush_routes(self, *argv, **kwarg):
         '''
         Flush routes -- purge route records from a table.
         Arguments are the same as for `get_routes()`
         routine. Actually, this routine implements a pipe from
         `get_routes()` to `nlm_request()`.
+
+        With `bulk=True` the routes are deleted while the dump
+        goes on: the routes are not kept, the delete requests are
+        sent in chunks of `chunk` bytes, see `IPBulk`, and the
+        method returns `BulkResult` instead of the list of routes::
+
+            ret = ip.flush_routes(table=100, bulk=True)
+            print(ret.success, ret.codes())
+            for (index, error) in ret.errors.items():
+                print(error, ret.requests.get(index))
+
+        Integer `table`, `oif`, `proto` and `type` are sent to
+        the kernel, if it supports strict dumps, see `get_routes()`.
+        The dump is repeated while it finds something to delete,
+        up to 10 rounds, like `ip route flush` does: the kernel
+        may skip objects in a dump, if other objects are deleted
+        meanwhile. So routes, that can not be deleted, may be
+        reported once per round.
         '''
+        if kwarg.pop('bulk', False):
+            chunk = kwarg.pop('chunk', 32768)
+            family = argv[0] if argv else kwarg.pop('family', 255)
+            match = kwarg.pop('match', None) or kwarg
+            return self._flush(rtmsg, family, match,
+                               RTM_GETROUTE, RTM_DELROUTE,
+                               NLM_F_REQUEST, chunk)
         ret = []
         for route in self.get_routes(*argv, **kwarg):
             self.put(route, msg_type=RTM_DELROUTE, msg_flags=NLM_F_REQUEST)
@@ -412,8 +1080,18 @@ class RTNL_API(object):
 
             # flush all addresses with IFA_LABEL='eth0':
             ipr.flush_addr(label='eth0')
+
+        With `bulk=True` the addresses are deleted while the dump
+        goes on, and `BulkResult` is returned, see `flush_routes()`.
         '''
         flags = NLM_F_CREATE | NLM_F_EXCL | NLM_F_REQUEST
+        if kwarg.pop('bulk', False):
+            chunk = kwarg.pop('chunk', 32768)
+            family = argv[0] if argv else kwarg.pop('family', AF_UNSPEC)
+            match = kwarg.pop('match', None) or kwarg
+            return self._flush(ifaddrmsg, family, match,
+                               RTM_GETADDR, RTM_DELADDR,
+                               flags, chunk)
         ret = []
         for addr in self.get_addr(*argv, **kwarg):
             self.put(addr, msg_type=RTM_DELADDR, msg_flags=flags)
@@ -433,8 +1111,18 @@ class RTNL_API(object):
 
             # flush all IPv6 rules that point to table 250:
             ipr.flush_rules(family=socket.AF_INET6, table=250)
+
+        With `bulk=True` the rules are deleted while the dump goes
+        on, and `BulkResult` is returned, see `flush_routes()`.
         '''
         flags = NLM_F_CREATE | NLM_F_EXCL | NLM_F_REQUEST
+        if kwarg.pop('bulk', False):
+            chunk = kwarg.pop('chunk', 32768)
+            family = argv[0] if argv else kwarg.pop('family', AF_UNSPEC)
+            match = kwarg.pop('match', None) or kwarg
+            return self._flush(fibmsg, family, match,
+                               RTM_GETRULE, RTM_DELRULE,
+                               flags, chunk)
         ret = []
         for rule in self.get_rules(*argv, **kwarg):
             self.put(rule, msg_type=RTM_DELRULE, msg_flags=flags)
@@ -762,11 +1450,23 @@ class RTNL_API(object):
         Dump all the records in the NDB::
 
             ip.neigh('dump')
+
+        Dump only some NLAs of the records::
+
+            ip.neigh('dump', attrs=['dst', 'lladdr'])
+
+        Dump the records as compact read-only objects, see
+        `pyroute2.netlink.nlmsg_record`::
+
+            ip.neigh('dump', record=True)
         '''
+        attrs = kwarg.pop('attrs', None) if command == 'dump' else None
+        record = kwarg.pop('record', False) if command == 'dump' else False
         if (command == 'dump') and ('match' not in kwarg):
             match = kwarg
         else:
             match = kwarg.pop('match', None)
+        attrs = self._nla_filter(ndmsg.ndmsg, attrs, match)
 
         flags_dump = NLM_F_REQUEST | NLM_F_DUMP
         flags_base = NLM_F_REQUEST | NLM_F_ACK
@@ -802,9 +1502,24 @@ class RTNL_API(object):
             if kwarg[key] is not None:
                 msg['attrs'].append([nla, kwarg[key]])
 
-        ret = self.nlm_request(msg,
-                               msg_type=command,
-                               msg_flags=flags)
+        if command == RTM_GETNEIGH:
+            # a clean dump request, see _dump_request()
+            dump = ndmsg.ndmsg()
+            dump['family'] = msg['family']
+            dump['flags'] = msg['flags']
+            dump['attrs'] = []
+            ret = self._dump_request(dump,
+                                     command,
+                                     match,
+                                     msg_flags=flags,
+                                     attrs=attrs,
+                                     record=record)
+        else:
+            ret = self.nlm_request(msg,
+                                   msg_type=command,
+                                   msg_flags=flags,
+                                   attrs=attrs,
+                                   record=record)
         if match is not None:
             ret = self._match(match, ret)
 
@@ -1093,11 +1808,26 @@ class RTNL_API(object):
         Get extended attributes like SR-IOV setup::
 
             ip.link("get", index=3, ext_mask=1)
+
+        Decode only some NLAs, skipping all the rest::
+
+            ip.link("dump", attrs=["ifname", "mtu"])
+
+        Return compact read-only records, see
+        `pyroute2.netlink.nlmsg_record`::
+
+            ip.link("dump", record=True)
         '''
+        attrs = None
+        record = False
+        if command in ('dump', 'get'):
+            attrs = kwarg.pop('attrs', None)
+            record = kwarg.pop('record', False)
         if (command == 'dump') and ('match' not in kwarg):
             match = kwarg
         else:
             match = kwarg.pop('match', None)
+        attrs = self._nla_filter(ifinfmsg, attrs, match)
 
         if command[:4] == 'vlan':
             log.warning('vlan filters are managed via `vlan_filter()`')
@@ -1162,7 +1892,9 @@ class RTNL_API(object):
 
         ret = self.nlm_request(msg,
                                msg_type=command,
-                               msg_flags=msg_flags)
+                               msg_flags=msg_flags,
+                               attrs=attrs,
+                               record=record)
         if match is not None:
             ret = self._match(match, ret)
 
@@ -1219,7 +1951,13 @@ class RTNL_API(object):
                     address='10.1.1.2',
                     mask=24,
                     local='10.1.1.1')
+
+        Dump addresses as compact read-only records, see
+        `pyroute2.netlink.nlmsg_record`::
+
+            ip.addr('dump', record=True)
         '''
+        record = kwarg.pop('record', False) if command == 'dump' else False
         flags_dump = NLM_F_REQUEST | NLM_F_DUMP
         flags_create = NLM_F_REQUEST | NLM_F_ACK | NLM_F_CREATE | NLM_F_EXCL
         commands = {'add': (RTM_NEWADDR, flags_create),
@@ -1272,11 +2010,23 @@ class RTNL_API(object):
             if kwarg[key] not in (None, ''):
                 msg['attrs'].append([nla, kwarg[key]])
 
-        ret = self.nlm_request(msg,
-                               msg_type=command,
-                               msg_flags=flags,
-                               terminate=lambda x: x['header']['type'] ==
-                               NLMSG_ERROR)
+        if command == RTM_GETADDR:
+            # a clean dump request, see _dump_request()
+            dump = ifaddrmsg()
+            dump['family'] = msg['family']
+            dump['attrs'] = []
+            ret = self._dump_request(dump,
+                                     command,
+                                     match,
+                                     msg_flags=flags,
+                                     record=record)
+        else:
+            ret = self.nlm_request(msg,
+                                   msg_type=command,
+                                   msg_flags=flags,
+                                   terminate=lambda x:
+                                   x['header']['type'] == NLMSG_ERROR,
+                                   record=record)
         if match:
             ret = self._match(match, ret)
 
@@ -1611,12 +2361,18 @@ class RTNL_API(object):
         if command in ('add', 'set', 'replace', 'change'):
             kwarg['proto'] = kwarg.get('proto', 'static') or 'static'
             kwarg['type'] = kwarg.get('type', 'unicast') or 'unicast'
+        attrs = None
+        record = False
+        if command in ('dump', 'show', 'get'):
+            attrs = kwarg.pop('attrs', None)
+            record = kwarg.pop('record', False)
         kwarg = IPRouteRequest(kwarg)
         if 'match' not in kwarg and command in ('dump', 'show'):
             match = kwarg
         else:
             match = kwarg.pop('match', None)
         callback = kwarg.pop('callback', None)
+        attrs = self._nla_filter(rtmsg, attrs, match)
 
         commands = {'add': (RTM_NEWROUTE, flags_make),
                     'set': (RTM_NEWROUTE, flags_replace),
@@ -1670,10 +2426,26 @@ class RTNL_API(object):
                                     attr[1].find(':') >= 0 else AF_INET
                                 break
 
-        ret = self.nlm_request(msg,
-                               msg_type=command,
-                               msg_flags=flags,
-                               callback=callback)
+        if flags == flags_dump:
+            # a clean dump request, see _dump_request()
+            dump = rtmsg()
+            dump['family'] = msg['family']
+            dump['flags'] = msg['flags']
+            dump['attrs'] = []
+            ret = self._dump_request(dump,
+                                     command,
+                                     match,
+                                     msg_flags=flags,
+                                     callback=callback,
+                                     attrs=attrs,
+                                     record=record)
+        else:
+            ret = self.nlm_request(msg,
+                                   msg_type=command,
+                                   msg_flags=flags,
+                                   callback=callback,
+                                   attrs=attrs,
+                                   record=record)
         if match:
             ret = self._match(match, ret)
 
@@ -1830,6 +2602,53 @@ class IPBatch(RTNL_API, IPBatchSocket):
     pass
 
 
+class IPPipeline(RTNL_API, NetlinkPipeline):
+    '''
+    Pipelined RTNL requests on an `IPRoute` socket. Provides the
+    same API as `IPRoute`, but the methods only encode requests,
+    like `IPBatch`; requests are sent and the responses are
+    collected in `commit()`, or upon exit from the `with`
+    block. The results, in the order of requests, are stored in
+    `results`, see `pyroute2.netlink.nlsocket.NetlinkPipeline`::
+
+        with IPRoute() as ipr:
+            with ipr.pipeline() as pipe:
+                pipe.link('set', index=2, state='up')
+                pipe.addr('add', index=2, address='10.0.0.2', mask=24)
+                pipe.route('add', dst='10.1.0.0/24', gateway='10.0.0.1')
+            for result in pipe.results:
+                if isinstance(result, Exception):
+                    ...
+
+    Methods, that use the response of the previous request, like
+    `link_lookup()` or `flush_routes()`, can not be pipelined.
+    '''
+    pass
+
+
+class IPBulk(RTNL_API, NetlinkBulk):
+    '''
+    Bulk RTNL requests on an `IPRoute` socket. Like `IPPipeline`,
+    the methods only encode requests, but the responses are not
+    kept: requests are sent as soon as `chunk` bytes are encoded,
+    and only the errors are collected, so millions of requests
+    can be sent w/o keeping them in memory, see
+    `pyroute2.netlink.nlsocket.NetlinkBulk`::
+
+        with IPRoute() as ipr:
+            bulk = IPBulk(ipr, ack=False)
+            for i in range(100000):
+                bulk.route('add', dst='10.%i.%i.0/24' % (i >> 8 & 0xff,
+                                                         i & 0xff),
+                           table=100 + (i >> 16), gateway='10.0.0.1')
+            result = bulk.commit()
+
+    Dump requests, and methods, that use the response of the
+    previous request, can not be used.
+    '''
+    pass
+
+
 class IPRoute(RTNL_API, IPRSocket):
     '''
     Regular ordinary utility class, see RTNL API for the list of methods.
@@ -1843,3 +2662,24 @@ class RawIPRoute(RTNL_API, RawIPRSocket):
     Thus it can not manage e.g. tun/tap interfaces.
     '''
     pass
+
+
+class ReplayIPRoute(ReplayMixin, IPRoute):
+    '''
+    The same as `IPRoute`, but replays a recorded traffic instead
+    of using the kernel, see `pyroute2.netlink.capture`::
+
+        ipr = ReplayIPRoute(replay='storm.pcap', pacing=False)
+    '''
+    pass
+
+
+class SimIPRoute(SimulatorMixin, RawIPRoute):
+    '''
+    The same as `RawIPRoute`, but works with an in-memory RTNL
+    model instead of the kernel, see
+    `pyroute2.netlink.rtnl.simulator`::
+
+        ipr = SimIPRoute(kernel=Kernel())
+    '''
+    pass
@@ -430,6 +430,8 @@ class Source(object):
     def __init__(self, evq, target, source,
                  event=None,
                  persistent=True,
+                 nl_stats=False,
+                 resync=False,
                  **nl_kwarg):
         self.th = None
         self.nl = None
@@ -447,6 +449,8 @@ class Source(object):
         self.lock = threading.Lock()
         self.started.clear()
         self.persistent = persistent
+        self.nl_stats = nl_stats
+        self.resync = resync
         self.state = 'init'
 
     def __repr__(self):
@@ -481,9 +485,13 @@ class Source(object):
                         self.nl = self.nl_prime(**self.nl_kwarg)
                     else:
                         raise TypeError('source channel not supported')
+                    if self.nl_stats:
+                        self.nl.enable_stats()
                     self.state = 'loading'
                     #
-                    self.nl.bind(async_cache=True, clone_socket=True)
+                    self.nl.bind(async_cache=True,
+                                 clone_socket=True,
+                                 resync=self.resync)
                     #
                     # Initial load -- enqueue the data
                     #
@@ -543,6 +551,15 @@ class Source(object):
                                name='NDB event source: %s' % (self.target)))
             self.th.start()
 
+    def stats(self):
+        '''
+        Return the source socket instrumentation data, see
+        `NetlinkMixin.stats()`
+        '''
+        if self.nl is None:
+            return {}
+        return self.nl.stats()
+
     def close(self):
         with self.lock:
             if self.nl is not None:
@@ -566,7 +583,9 @@ class NDB(object):
                  sources=None,
                  db_provider='sqlite3',
                  db_spec=':memory:',
-                 rtnl_log=False):
+                 rtnl_log=False,
+                 nl_stats=False,
+                 resync=False):
 
         self.ctime = self.gctime = time.time()
         self.schema = None
@@ -590,6 +609,8 @@ class NDB(object):
         self._db_provider = db_provider
         self._db_spec = db_spec
         self._db_rtnl_log = rtnl_log
+        self._nl_stats = nl_stats
+        self._resync = resync
         atexit.register(self.close)
         self._rtnl_objects = set()
         self._dbm_ready.clear()
@@ -654,6 +675,14 @@ class NDB(object):
     def execute(self, *argv, **kwarg):
         return self.schema.execute(*argv, **kwarg)
 
+    def stats(self):
+        '''
+        Return the instrumentation data of the sources sockets,
+        `{target: stats}`, see `NetlinkMixin.stats()`. Requires
+        `NDB(nl_stats=True)`.
+        '''
+        return dict((x, y.stats()) for (x, y) in self.sources.items())
+
     def wait(self, spec):
         '''
         Example::
@@ -822,13 +851,18 @@ class NDB(object):
         try:
             if isinstance(source, NetlinkMixin):
                 self.sources[target] = Source(self._event_queue,
-                                              target, source, event)
+                                              target, source, event,
+                                              nl_stats=self._nl_stats,
+                                              resync=self._resync)
             elif isinstance(source, dict):
                 iclass = source.pop('class')
                 persistent = source.pop('persistent', False)
                 self.sources[target] = Source(self._event_queue,
                                               target, iclass, event,
-                                              persistent, **source)
+                                              persistent,
+                                              self._nl_stats,
+                                              self._resync,
+                                              **source)
             elif isinstance(source, Source):
                 self.sources[target] = Source
             else:
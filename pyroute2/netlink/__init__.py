@@ -327,6 +327,24 @@ If the `fields` attribute is an empty list, the step 2 will be skipped.
 The step 3 will be skipped in the case of the empty `nla_map`. If both
 attributes are empty lists, only the header will be encoded/decoded.
 
+When it is possible, the header and the fields of a class are
+compiled into one `struct.Struct` object on the first use, see
+`compile_struct()`. Then the steps 1 and 2 are performed with one
+`unpack_from()` call on decode and with one `pack_into()` call on
+encode. Classes that can not be represented with one struct --
+variable length strings, mixed byte order, `pack = 'struct'` --
+use the generic per-field code.
+
+Simple NLA -- integers, strings, IP and MAC addresses -- are encoded
+without creating NLA objects, see `compile_encoder()`: the header and
+the payload are written to the buffer at once.
+
+For the compiled classes a specialised decoder is generated as well,
+see `compile_jit()`: the header, the fields and the NLA chain loop
+with the NLA types dispatch are unrolled into one function. To use
+only the generic code, set `pyroute2.config.nlm_jit = False` before
+the first message of a class is created.
+
 create and send messages
 ~~~~~~~~~~~~~~~~~~~~~~~~
 
@@ -401,6 +419,7 @@ from socket import inet_ntop
 from socket import AF_INET
 from socket import AF_INET6
 from socket import AF_UNSPEC
+from pyroute2 import config
 from pyroute2.common import AF_MPLS
 from pyroute2.common import hexdump
 from pyroute2.common import basestring
@@ -565,6 +584,10 @@ NETLINK_RX_RING = 6
 NETLINK_TX_RING = 7
 
 NETLINK_LISTEN_ALL_NSID = 8
+NETLINK_LIST_MEMBERSHIPS = 9
+NETLINK_CAP_ACK = 10
+NETLINK_EXT_ACK = 11
+NETLINK_GET_STRICT_CHK = 12
 
 clean_cbs = threading.local()
 
@@ -573,6 +596,175 @@ clean_cbs = threading.local()
 cache_fmt = {}
 cache_hdr = {}
 cache_jit = {}
+cache_record = {}
+
+##
+# Struct codes, that have different sizes in the native and in the
+# standard modes, and their standard replacements by the native size
+_fmt_token = re.compile('([0-9]*)([xcbB?hHiIlLqQnNefdspP])')
+_fmt_native = {'l': {4: 'i', 8: 'q'},
+               'L': {4: 'I', 8: 'Q'},
+               'n': {4: 'i', 8: 'q'},
+               'N': {4: 'I', 8: 'Q'},
+               'P': {4: 'I', 8: 'Q'}}
+_fmt_order = {'@': '=', '=': '=', '<': '<', '>': '>', '!': '>'}
+_fmt_any_order = set('xcbB?sp')
+_fmt_host_order = '<' if sys.byteorder == 'little' else '>'
+_nla_header = struct.Struct('HH')
+
+
+def compile_struct(spec):
+    '''
+    Compile a `fields`-like spec, `((name, fmt), ...)`, into one
+    `struct.Struct` object. Every field is still decoded as if
+    it were unpacked separately: native fields are converted to
+    the standard sizes, without implicit alignment.
+
+    Return `(struct.Struct, layout)`, where layout is a tuple of
+    `(name, index, count)` -- the position of the field values in
+    the unpacked tuple. If the spec can not be represented with
+    one struct (variable length strings, mixed byte order etc.),
+    return `None`.
+    '''
+    order = None
+    fmt = ''
+    index = 0
+    layout = []
+    for name, field in spec:
+        if field in ('s', 'z'):
+            # variable length strings
+            return None
+        if field[:1] in _fmt_order:
+            forder = _fmt_order[field[0]]
+            body = field[1:]
+        else:
+            forder = '='
+            body = field
+        if forder == '=':
+            forder = _fmt_host_order
+        tokens = _fmt_token.findall(body)
+        if ''.join([''.join(x) for x in tokens]) != body or not tokens:
+            # whitespaces and other unsupported formats
+            return None
+        count = 0
+        codes = ''
+        for (repeat, code) in tokens:
+            if code not in _fmt_any_order:
+                if order is None:
+                    order = forder
+                elif order != forder:
+                    return None
+            if field[:1] not in ('=', '<', '>', '!') and code in _fmt_native:
+                code = _fmt_native[code][struct.calcsize(code)]
+            codes += repeat + code
+            if code == 'x':
+                continue
+            elif code in 'sp':
+                count += 1
+            else:
+                count += int(repeat or 1)
+        # native formats may contain implicit alignment inside
+        if struct.calcsize(field) != struct.calcsize('=' + codes):
+            return None
+        fmt += codes
+        layout.append((name, index, count))
+        index += count
+    return (struct.Struct((order or '=') + fmt), tuple(layout))
+
+
+def _encode_root_family(msg):
+    while msg.parent is not None:
+        msg = msg.parent
+    return msg.get('family', AF_UNSPEC)
+
+
+def compile_encoder(nla_class):
+    '''
+    Compile a function `encoder(parent, value)`, that returns
+    the payload of a simple NLA -- integers, strings, addresses --
+    without creating the NLA object. The function returns `None`,
+    if it can not encode the value, e.g. dicts or lists; then the
+    NLA object should be used.
+
+    Return `None`, if the class can not be encoded this way:
+    custom encoding, nested NLA, value maps etc.
+    '''
+    if not issubclass(nla_class, nla_base) or \
+            nla_class.nla_map or \
+            nla_class.value_map or \
+            tuple(nla_class.header or ()) != nla_base.header or \
+            nla_class.setvalue != nlmsg_base.setvalue or \
+            len(nla_class.fields) != 1 or \
+            nla_class.fields[0][0] != 'value':
+        return None
+    fmt = nla_class.fields[0][1]
+    method = nla_class.encode
+    atoms = nlmsg_atoms
+    if method == nlmsg_base.encode or method == atoms.string.encode:
+        # string.encode() converts the value before the length
+        # is calculated, nlmsg_base.encode() -- after
+        strict = method == nlmsg_base.encode
+        if fmt in ('s', 'z'):
+            tail = b'\0' if fmt == 'z' else b''
+
+            def encoder(parent, value):
+                if isinstance(value, unicode):
+                    data = value.encode('utf-8')
+                    if strict and len(data) != len(value):
+                        return None
+                    return data + tail
+                elif isinstance(value, bytes):
+                    return value + tail
+
+            return encoder
+        compiled = compile_struct(nla_class.fields)
+        if compiled is None or fmt[-1] not in 'bBhHiIlLqQnN':
+            return None
+        pack = compiled[0].pack
+
+        def encoder(parent, value):
+            if type(value) in (int, bool):
+                return pack(value)
+            elif type(value) is float:
+                return pack(int(value))
+
+        return encoder
+    elif method == atoms.ipaddr.encode:
+
+        def encoder(parent, value):
+            if isinstance(value, str):
+                if value.find(':') > -1:
+                    return inet_pton(AF_INET6, value)
+                return inet_pton(AF_INET, value)
+
+        return encoder
+    elif method == atoms.ipXaddr.encode:
+        family = nla_class.family
+
+        def encoder(parent, value):
+            if isinstance(value, str):
+                return inet_pton(family, value)
+
+        return encoder
+    elif method == atoms.target.encode:
+        family = nla_class.family
+
+        def encoder(parent, value):
+            if isinstance(value, str):
+                target = family or _encode_root_family(parent)
+                if target in (AF_INET, AF_INET6):
+                    return inet_pton(target, value)
+
+        return encoder
+    elif method == atoms.l2addr.encode:
+
+        def encoder(parent, value):
+            if isinstance(value, str):
+                return struct.pack('BBBBBB',
+                                   *[int(i, 16) for i in value.split(':')])
+
+        return encoder
+    return None
 
 
 class nlmsg_base(dict):
@@ -617,8 +809,12 @@ class nlmsg_base(dict):
         "_nla_init",
         "_nla_array",
         "_nla_flags",
+        "_nla_filter",
         "value",
         "_ft_decode",
+        "_ft_struct",
+        "_ft_jit",
+        "_attrs_index",
         "_r_value_map",
         "__weakref__"
     )
@@ -650,7 +846,9 @@ class nlmsg_base(dict):
         self._nla_init = init
         self._nla_array = False
         self._nla_flags = self.nla_flags
+        self._nla_filter = None
         self['attrs'] = []
+        self._attrs_index = None
         self['value'] = NotInitialized
         self.value = NotInitialized
         # work only on non-empty mappings
@@ -658,7 +856,10 @@ class nlmsg_base(dict):
             self.compile_nla()
         # compile fast-track for particular types
         if id(self.__class__) in cache_jit:
-            self._ft_decode = cache_jit[id(self.__class__)]['ft_decode']
+            jit = cache_jit[id(self.__class__)]
+            self._ft_decode = jit['ft_decode']
+            self._ft_struct = jit['ft_struct']
+            self._ft_jit = jit['ft_jit']
         else:
             self.compile_ft()
         self._r_value_map = dict([
@@ -725,6 +926,100 @@ class nlmsg_base(dict):
         self.offset = 0
         self.decoded = False
 
+    def release(self):
+        '''
+        Detach the message from the receive buffer.
+
+        Messages and NLAs keep a reference to the datagram they
+        were received in, so the datagram is pinned while any message
+        references it, see also `nlsocket.BufferPool`. In the
+        zero-copy mode, see `Marshal.zerocopy`, it is a `memoryview`
+        of the buffer, and binary NLA values are returned as views
+        as well.
+
+        The call copies the message data into a private buffer and
+        turns all the decoded views into `bytes`; the message stays
+        usable. For messages that own their data it is a no-op.
+        '''
+        if isinstance(self.data, memoryview) or \
+                (self.data is not None and
+                 (self.offset or len(self.data) != self.length)):
+            base = self.offset
+            self._rebase(bytearray(self.data[base:base + self.length]),
+                         base,
+                         self.data)
+        return self
+
+    def _rebase(self, data, base, source):
+        if self.data is not source:
+            return
+        self.data = data
+        self.offset -= base
+        for (key, value) in tuple(self.items()):
+            if isinstance(value, memoryview):
+                self[key] = value.tobytes()
+        if isinstance(self.value, memoryview):
+            self.value = self.value.tobytes()
+        elif isinstance(self.value, list):
+            # NLA arrays
+            for cell in self.value:
+                if isinstance(cell, nlmsg_base):
+                    cell._rebase(data, base, source)
+        if not self.is_nla and \
+                isinstance(self.get('header', {}).get('errmsg'), nlmsg_base):
+            self['header']['errmsg']._rebase(data, base, source)
+        for cell in self.get('attrs', ()):
+            if isinstance(cell, nla_slot_encoded) and cell.init is not None:
+                # the plain value, nothing to rebase
+                continue
+            if isinstance(cell, nla_slot):
+                cell.cell[1]._rebase(data, base, source)
+
+    def record(self):
+        '''
+        Return a compact read-only copy of the message, see
+        `nlmsg_record`. The record doesn't reference the receive
+        buffer: scalar NLA are stored decoded, nested NLA -- as
+        `bytes` to be decoded on access.
+        '''
+        global cache_record
+        cls = cache_record.get(id(type(self)), None)
+        if cls is None:
+            cls = cache_record[id(type(self))] = nlmsg_record.build(type(self))
+        specs = cls.specs
+        attrs = []
+        for cell in self.get('attrs', ()):
+            if not isinstance(cell, nla_slot):
+                attrs.append((cell[0], cell[1]))
+                continue
+            if isinstance(cell, nla_slot_encoded):
+                cell.try_to_decode()
+            name, nla = cell.cell
+            if nla.nla_map or \
+                    nla._nla_array or \
+                    len(nla.fields) != 1 or \
+                    nla.fields[0][0] != 'value':
+                # nested or compound NLA: keep the binary
+                key = (type(nla), nla._nla_init, nla._nla_array,
+                       nla._nla_flags)
+                spec = specs.get(key, None) or \
+                    specs.__setitem__(key, key) or \
+                    specs[key]
+                attrs.append((name,
+                              bytes(nla.data[nla.offset:
+                                             nla.offset + nla.length]),
+                              spec))
+            else:
+                value = cell.get_value()
+                if isinstance(value, (memoryview, bytearray)):
+                    value = bytes(value)
+                attrs.append((name, value))
+        header = self.get('header', {})
+        return cls(self.get('event', None),
+                   tuple([header.get(x, None) for x in cls.header_names]),
+                   tuple([self.get(x, None) for x in cls.field_names]),
+                   tuple(attrs))
+
     def register_clean_cb(self, cb):
         global clean_cbs
         if self.parent is not None:
@@ -756,6 +1051,7 @@ class nlmsg_base(dict):
         for i in tuple(self['attrs']):
             if i[0] == name:
                 self['attrs'].remove(i)
+        self._attrs_index = None
         return self
 
     def strip(self, attrs):
@@ -919,65 +1215,79 @@ class nlmsg_base(dict):
         offset = self.offset
         global cache_hdr
         global clean_cbs
-        # Decode the header
-        if self.header is not None:
-            ##
-            # ~~ self['header'][name] = struct.unpack_from(...)
-            #
-            # Instead of `struct.unpack()` all the NLA headers, it is
-            # much cheaper to cache decoded values. The resulting dict
-            # will be not much bigger than some hundreds ov values.
-            #
-            # The code might look ugly, but line_profiler shows here
-            # a notable performance gain.
-            #
-            # The chain is:
-            # dict.get(key, None) or dict.set(unpack(key, ...)) or dict[key]
-            #
-            # If there is no such key in the dict, get() returns None, and
-            # Python executes __setitem__(), which always return None, and
-            # then dict[key] is returned.
-            #
-            # If the key exists, the statement after the first `or` is not
-            # executed.
-            if self.is_nla:
-                key = tuple(self.data[offset:offset + 4])
-                self['header'] = cache_hdr.get(key, None) or \
-                    (cache_hdr
-                     .__setitem__(key,
-                                  dict(zip(('length', 'type'),
-                                           struct.unpack_from('HH',
-                                                              self.data,
-                                                              offset))))) or \
-                    cache_hdr[key]
-                ##
-                offset += 4
-                self.length = self['header']['length']
+        self._attrs_index = None
+        if self._ft_struct is not None and \
+                self.header is type(self).header and \
+                not self._nla_array:
+            # Fast track: the header and the fields are decoded
+            # with one precompiled struct, see `compile_ft()`
+            if self._ft_jit is not None:
+                self._ft_jit(self, offset)
             else:
-                for name, fmt in self.header:
-                    self['header'][name] = struct.unpack_from(fmt,
-                                                              self.data,
-                                                              offset)[0]
-                    offset += struct.calcsize(fmt)
-                # update length from header
-                # it can not be less than 4
-                if 'header' in self:
-                    self.length = max(self['header']['length'], 4)
-        # handle the array case
-        if self._nla_array:
-            self.setvalue([])
-            while offset < self.offset + self.length:
-                cell = type(self)(data=self.data,
-                                  offset=offset,
-                                  parent=self)
-                cell._nla_array = False
-                if cell.cell_header is not None:
-                    cell.header = cell.cell_header
-                cell.decode()
-                self.value.append(cell)
-                offset += (cell.length + 4 - 1) & ~ (4 - 1)
+                self._ft_decode_struct(offset)
         else:
-            self._ft_decode(self, offset)
+            # Decode the header
+            if self.header is not None:
+                ##
+                # ~~ self['header'][name] = struct.unpack_from(...)
+                #
+                # Instead of `struct.unpack()` all the NLA headers, it is
+                # much cheaper to cache decoded values. The resulting dict
+                # will be not much bigger than some hundreds ov values.
+                #
+                # The code might look ugly, but line_profiler shows here
+                # a notable performance gain.
+                #
+                # The chain is:
+                # dict.get(key, None) or
+                #     dict.set(unpack(key, ...)) or
+                #     dict[key]
+                #
+                # If there is no such key in the dict, get() returns None, and
+                # Python executes __setitem__(), which always return None, and
+                # then dict[key] is returned.
+                #
+                # If the key exists, the statement after the first `or` is not
+                # executed.
+                if self.is_nla:
+                    key = tuple(self.data[offset:offset + 4])
+                    self['header'] = cache_hdr.get(key, None) or \
+                        (cache_hdr
+                         .__setitem__(key,
+                                      dict(zip(('length', 'type'),
+                                               struct.unpack_from('HH',
+                                                                  self.data,
+                                                                  offset)))
+                                      )) or \
+                        cache_hdr[key]
+                    ##
+                    offset += 4
+                    self.length = self['header']['length']
+                else:
+                    for name, fmt in self.header:
+                        self['header'][name] = struct.unpack_from(fmt,
+                                                                  self.data,
+                                                                  offset)[0]
+                        offset += struct.calcsize(fmt)
+                    # update length from header
+                    # it can not be less than 4
+                    if 'header' in self:
+                        self.length = max(self['header']['length'], 4)
+            # handle the array case
+            if self._nla_array:
+                self.setvalue([])
+                while offset < self.offset + self.length:
+                    cell = type(self)(data=self.data,
+                                      offset=offset,
+                                      parent=self)
+                    cell._nla_array = False
+                    if cell.cell_header is not None:
+                        cell.header = cell.cell_header
+                    cell.decode()
+                    self.value.append(cell)
+                    offset += (cell.length + 4 - 1) & ~ (4 - 1)
+            else:
+                self._ft_decode(self, offset)
 
         if clean_cbs.__dict__:
             self.unregister_clean_cb()
@@ -999,12 +1309,24 @@ class nlmsg_base(dict):
                     ...  # do some custom data tuning
                     nlmsg.encode(self)
         '''
+        if self._ft_struct is not None and \
+                self.header is type(self).header and \
+                not self._nla_array and \
+                ('header' in self or not self.header) and \
+                self.getvalue() is not None:
+            # Fast track: the header and the fields are encoded
+            # with one precompiled struct, see `compile_ft()`
+            self._ft_encode_struct()
+            return
         offset = self.offset
         diff = 0
         # reserve space for the header
         if self.header is not None:
-            hsize = struct.calcsize(''.join([x[1] for x in self.header]))
-            self.data.extend([0] * hsize)
+            hfmt = ''.join([x[1] for x in self.header])
+            hsize = cache_fmt.get(hfmt, None) or \
+                cache_fmt.__setitem__(hfmt, struct.calcsize(hfmt)) or \
+                cache_fmt[hfmt]
+            self.data.extend(bytearray(hsize))
             offset += hsize
 
         # handle the array case
@@ -1034,20 +1356,18 @@ class nlmsg_base(dict):
                     length = len(value) + 1
                     efmt = '%is' % (length)
                 else:
-                    length = struct.calcsize(fmt)
+                    length = cache_fmt.get(fmt, None) or \
+                        cache_fmt.__setitem__(fmt, struct.calcsize(fmt)) or \
+                        cache_fmt[fmt]
                     efmt = fmt
 
-                self.data.extend([0] * length)
+                self.data.extend(bytearray(length))
 
-                # in python3 we should force it
-                if sys.version[0] == '3':
-                    if isinstance(value, str):
-                        value = bytes(value, 'utf-8')
-                    elif isinstance(value, float):
-                        value = int(value)
-                elif sys.version[0] == '2':
-                    if isinstance(value, unicode):
-                        value = value.encode('utf-8')
+                # `unicode` is `str` in Python 3
+                if isinstance(value, unicode):
+                    value = value.encode('utf-8')
+                elif isinstance(value, float):
+                    value = int(value)
 
                 try:
                     if fmt[-1] == 'x':
@@ -1067,7 +1387,7 @@ class nlmsg_base(dict):
 
             diff = ((offset + 4 - 1) & ~ (4 - 1)) - offset
             offset += diff
-            self.data.extend([0] * diff)
+            self.data.extend(bytearray(diff))
         # write NLA chain
         if self.nla_map:
             offset = self.encode_nlas(offset)
@@ -1084,6 +1404,43 @@ class nlmsg_base(dict):
                                  self['header'].get(name, 0))
                 offset += struct.calcsize(fmt)
 
+    def _ft_encode_struct(self):
+        codec, hlayout, flayout = self._ft_struct
+        offset = self.offset + codec.size
+        diff = ((offset + 4 - 1) & ~ (4 - 1)) - offset
+        # reserve space for the header, fields and the padding at once
+        self.data.extend(bytearray(codec.size + diff))
+        offset += diff
+        # write NLA chain
+        if self.nla_map:
+            offset = self.encode_nlas(offset)
+        # collect the values
+        values = []
+        if hlayout:
+            header = self['header']
+            self.length = header['length'] = offset - self.offset - diff
+            for name, index, count in hlayout:
+                values.append(header.get(name, 0))
+        for name, index, count in flayout:
+            if not count:
+                continue
+            value = self[name]
+            if type(value) in (list, tuple, set):
+                values.extend(value)
+                continue
+            elif isinstance(value, unicode):
+                value = value.encode('utf-8')
+            elif isinstance(value, float):
+                value = int(value)
+            values.append(value)
+        try:
+            codec.pack_into(self.data, self.offset, *values)
+        except struct.error:
+            log.error(''.join(traceback.format_stack()))
+            log.error(traceback.format_exc())
+            log.error("error pack: %s %s" % (codec.format, values))
+            raise
+
     def setvalue(self, value):
         if isinstance(value, dict):
             self.update(value)
@@ -1106,9 +1463,42 @@ class nlmsg_base(dict):
         '''
         Return the first encoded NLA by name
         '''
-        cells = [i[1] for i in self['attrs'] if i[0] == attr]
+        cells = self.get_attrs_index().get(attr)
         if cells:
-            return cells[0]
+            return cells[0][1]
+
+    def get_attrs_index(self):
+        '''
+        Return the NLA index, `{name: [cell, ...]}`, where cells
+        are the items of the attrs chain in the original order.
+
+        The index is built on the first lookup and is dropped as
+        soon as the attrs list is replaced or changes its length,
+        and on `encode()` and `decode()`. If cells are replaced in
+        place w/o changing the length, the index is stale until one
+        of these calls or `reset_attrs_index()`.
+        '''
+        attrs = self['attrs']
+        cache = self._attrs_index
+        if cache is not None and \
+                cache[0] is attrs and \
+                cache[1] == len(attrs):
+            return cache[2]
+        index = {}
+        for cell in attrs:
+            name = cell[0]
+            if name in index:
+                index[name].append(cell)
+            else:
+                index[name] = [cell]
+        self._attrs_index = (attrs, len(attrs), index)
+        return index
+
+    def reset_attrs_index(self):
+        '''
+        Drop the NLA index, see `get_attrs_index()`
+        '''
+        self._attrs_index = None
 
     def get_nested(self, *attrs):
         '''
@@ -1124,13 +1514,18 @@ class nlmsg_base(dict):
     def get_attr(self, attr, default=None):
         '''
         Return the first NLA with that name or None
+
+        The lookup uses the NLA index, see `get_attrs_index()`.
+        If `msg['attrs']` cells are replaced in place, the index
+        is rebuilt only by `encode()`, `decode()` or an explicit
+        `reset_attrs_index()`.
         '''
         try:
-            attrs = self.get_attrs(attr)
+            cells = self.get_attrs_index().get(attr)
         except KeyError:
             return default
-        if attrs:
-            return attrs[0]
+        if cells:
+            return cells[0][1]
         else:
             return default
 
@@ -1138,7 +1533,7 @@ class nlmsg_base(dict):
         '''
         Return attrs by name or an empty list
         '''
-        return [i[1] for i in self['attrs'] if i[0] == attr]
+        return [i[1] for i in self.get_attrs_index().get(attr, ())]
 
     def __setstate__(self, state):
         return self.load(state)
@@ -1188,6 +1583,8 @@ class nlmsg_base(dict):
                             attrs.append([i[0], i[1].dump()])
                         elif isinstance(i[1], set):
                             attrs.append([i[0], tuple(i[1])])
+                        elif isinstance(i[1], memoryview):
+                            attrs.append([i[0], i[1].tobytes()])
                         else:
                             attrs.append([i[0], i[1]])
                 else:
@@ -1220,9 +1617,13 @@ class nlmsg_base(dict):
 
     @staticmethod
     def _ft_decode_string(self, offset):
-        self['value'], = struct.unpack_from('%is' % (self.length - 4),
-                                            self.data,
-                                            offset)
+        if type(self.data) is memoryview:
+            # zero-copy mode, keep a view of the receive buffer
+            self['value'] = self.data[offset:offset + self.length - 4]
+        else:
+            self['value'], = struct.unpack_from('%is' % (self.length - 4),
+                                                self.data,
+                                                offset)
 
     @staticmethod
     def _ft_decode_packed(self, offset):
@@ -1236,18 +1637,7 @@ class nlmsg_base(dict):
         for name in names:
             if name[0] != '_':
                 self[name] = values.pop(0)
-        # read NLA chain
-        if self.nla_map:
-            offset = (offset + 4 - 1) & ~ (4 - 1)
-            try:
-                self.decode_nlas(offset)
-            except Exception as e:
-                log.warning(traceback.format_exc())
-                raise NetlinkNLADecodeError(e)
-        else:
-            del self['attrs']
-        if self['value'] is NotInitialized:
-            del self['value']
+        self._ft_decode_tail(offset)
 
     @staticmethod
     def _ft_decode_generic(self, offset):
@@ -1269,6 +1659,35 @@ class nlmsg_base(dict):
                 self[name] = value[0]
             else:
                 self[name] = value
+        self._ft_decode_tail(offset)
+
+    def _ft_decode_struct(self, offset):
+        global cache_hdr
+        codec, hlayout, flayout = self._ft_struct
+        values = codec.unpack_from(self.data, offset)
+        if hlayout:
+            if self.is_nla:
+                # NLA headers are shared, see `decode()`
+                key = values[:2]
+                self['header'] = cache_hdr.get(key, None) or \
+                    (cache_hdr
+                     .__setitem__(key, {'length': key[0],
+                                        'type': key[1]})) or \
+                    cache_hdr[key]
+                self.length = key[0]
+            else:
+                header = self['header']
+                for name, index, count in hlayout:
+                    header[name] = values[index]
+                self.length = max(header['length'], 4)
+        for name, index, count in flayout:
+            if count == 1:
+                self[name] = values[index]
+            else:
+                self[name] = values[index:index + count]
+        self._ft_decode_tail(offset + codec.size)
+
+    def _ft_decode_tail(self, offset):
         # read NLA chain
         if self.nla_map:
             offset = (offset + 4 - 1) & ~ (4 - 1)
@@ -1292,7 +1711,136 @@ class nlmsg_base(dict):
             self._ft_decode = self._ft_decode_packed
         else:
             self._ft_decode = self._ft_decode_generic
-        cache_jit[id(self.__class__)] = {'ft_decode': self._ft_decode}
+        # Precompile one struct for the header and the fields, so
+        # the fixed part of the message is decoded with one call to
+        # `unpack_from()` and encoded with one call to `pack_into()`
+        self._ft_struct = None
+        if self._ft_decode == self._ft_decode_generic:
+            header = tuple(type(self).header or tuple())
+            compiled = compile_struct(header + tuple(self.fields))
+            if compiled is not None:
+                codec, layout = compiled
+                self._ft_struct = (codec,
+                                   layout[:len(header)],
+                                   layout[len(header):])
+        self._ft_jit = None
+        if self._ft_struct is not None and config.nlm_jit:
+            try:
+                self._ft_jit = self.compile_jit()
+            except Exception:
+                log.warning('JIT failed for %s, use the generic decoder'
+                            % (self.__class__.__name__, ))
+                log.debug(traceback.format_exc())
+        cache_jit[id(self.__class__)] = {'ft_decode': self._ft_decode,
+                                         'ft_struct': self._ft_struct,
+                                         'ft_jit': self._ft_jit}
+
+    def compile_jit(self):
+        '''
+        Generate a decoder specialised for the class: the same
+        steps as in `_ft_decode_struct()` and `decode_nlas()`,
+        but with the header and the fields layout unrolled into
+        straight-line assignments, and with the NLA types mapped
+        to constructors in one dict.
+
+        Return the compiled function `decoder(self, offset)`.
+        '''
+        codec, hlayout, flayout = self._ft_struct
+        code = ['def decoder(self, offset):',
+                '    values = unpack_from(self.data, offset)']
+        # the header
+        if hlayout:
+            if self.is_nla:
+                code.extend(['    key = values[:2]',
+                             '    self[\'header\'] = cache_hdr.get(key)'
+                             ' or (cache_hdr.__setitem__(key, '
+                             '{\'length\': key[0], \'type\': key[1]})'
+                             ') or cache_hdr[key]',
+                             '    self.length = key[0]'])
+            else:
+                code.append('    header = self[\'header\']')
+                for name, index, count in hlayout:
+                    code.append('    header[%r] = values[%i]' % (name,
+                                                                 index))
+                code.append('    self.length = max(header[\'length\'], 4)')
+        # the fields
+        for name, index, count in flayout:
+            if count == 1:
+                code.append('    self[%r] = values[%i]' % (name, index))
+            else:
+                code.append('    self[%r] = values[%i:%i]' % (name,
+                                                              index,
+                                                              index + count))
+        code.append('    offset += %i' % codec.size)
+        # the NLA chain
+        dispatch = {}
+        if not self.nla_map:
+            code.append('    del self[\'attrs\']')
+        elif type(self).decode_nlas is not nlmsg_base.decode_nlas:
+            # customized NLA decoder, just call it
+            code.extend(['    offset = (offset + 4 - 1) & ~ (4 - 1)',
+                         '    try:',
+                         '        self.decode_nlas(offset)',
+                         '    except Exception as e:',
+                         '        log.warning(format_exc())',
+                         '        raise NetlinkNLADecodeError(e)'])
+        else:
+            for key, prime in self.__class__.__t_nla_map.items():
+                dispatch[key] = (prime['name'],
+                                 prime['class'],
+                                 isinstance(prime['class'],
+                                            types.FunctionType),
+                                 prime['init'],
+                                 prime['nla_array'])
+            code.extend([
+                '    offset = (offset + 4 - 1) & ~ (4 - 1)',
+                '    data = self.data',
+                '    end = self.offset + self.length',
+                '    attrs = self[\'attrs\']',
+                '    nla_filter = self._nla_filter',
+                '    try:',
+                '        while offset <= end - 4:',
+                '            length, base_type = nla_header(data, offset)',
+                '            length = min(max(length, 4), end - offset)',
+                '            prime = dispatch.get(base_type & %i)'
+                % (~(NLA_F_NESTED | NLA_F_NET_BYTEORDER) & 0xffff),
+                '            if prime is None:',
+                '                if nla_filter is None:',
+                '                    attrs.append(nla_slot(\'UNKNOWN\','
+                ' nla_base(data=data, offset=offset, length=length)))',
+                '            else:',
+                '                (name, nla_class,'
+                ' factory, init, array) = prime',
+                '                if nla_filter is None or name in nla_filter:',
+                '                    if factory:',
+                '                        nla_class = nla_class(self,'
+                ' data=data, offset=offset)',
+                '                    nla = nla_class(data=data,'
+                ' offset=offset, parent=self, length=length, init=init)',
+                '                    nla._nla_array = array',
+                '                    nla._nla_flags = base_type & %i'
+                % (NLA_F_NESTED | NLA_F_NET_BYTEORDER),
+                '                    attrs.append(nla_slot(name, nla))',
+                '            offset += (length + 4 - 1) & ~ (4 - 1)',
+                '    except Exception as e:',
+                '        log.warning(format_exc())',
+                '        raise NetlinkNLADecodeError(e)'])
+        code.extend(['    if self[\'value\'] is NotInitialized:',
+                     '        del self[\'value\']'])
+        namespace = {'unpack_from': codec.unpack_from,
+                     'nla_header': _nla_header.unpack_from,
+                     'cache_hdr': cache_hdr,
+                     'dispatch': dispatch,
+                     'nla_slot': nla_slot,
+                     'nla_base': nla_base,
+                     'log': log,
+                     'format_exc': traceback.format_exc,
+                     'NetlinkNLADecodeError': NetlinkNLADecodeError,
+                     'NotInitialized': NotInitialized}
+        exec(compile('\n'.join(code),
+                     '<jit %s>' % self.__class__.__name__,
+                     'exec'), namespace)
+        return namespace['decoder']
 
     def compile_nla(self):
         # clean up NLA mappings
@@ -1340,12 +1888,19 @@ class nlmsg_base(dict):
             else:
                 nla_class = getattr(self, nla_class)
             # update mappings
+            # simple NLA can be encoded w/o objects
+            if nla_array or init is not None or \
+                    isinstance(nla_class, types.FunctionType):
+                encoder = None
+            else:
+                encoder = compile_encoder(nla_class)
             prime = {'class': nla_class,
                      'type': key,
                      'name': name,
                      'nla_flags': nla_flags,
                      'nla_array': nla_array,
-                     'init': init}
+                     'init': init,
+                     'encoder': encoder}
             t_nla_map[key] = r_nla_map[name] = prime
 
         self.__class__.__t_nla_map = t_nla_map
@@ -1363,6 +1918,29 @@ class nlmsg_base(dict):
             if cell[0] in r_nla_map:
                 prime = r_nla_map[cell[0]]
                 msg_class = prime['class']
+                # simple NLA: write the header and the payload at once,
+                # the cell is left as is
+                if prime['encoder'] is not None:
+                    payload = prime['encoder'](self, cell[1])
+                    if payload is not None:
+                        flags = msg_class.nla_flags | prime['nla_flags']
+                        if isinstance(cell, tuple) and len(cell) > 2:
+                            flags |= cell[2]
+                        length = len(payload) + 4
+                        self.data.extend(_nla_header.pack(length,
+                                                          prime['type'] |
+                                                          flags))
+                        self.data.extend(payload)
+                        self.data.extend(bytearray(((length + 4 - 1) &
+                                                    ~ (4 - 1)) - length))
+                        self['attrs'][i] = nla_slot_encoded(self,
+                                                            prime,
+                                                            offset,
+                                                            length,
+                                                            cell[1],
+                                                            flags)
+                        offset += (length + 4 - 1) & ~ (4 - 1)
+                        continue
                 # is it a class or a function?
                 if isinstance(msg_class, types.FunctionType):
                     # if it is a function -- use it to get the class
@@ -1386,6 +1964,8 @@ class nlmsg_base(dict):
                     nla.decoded = True
                     self['attrs'][i] = nla_slot(prime['name'], nla)
                 offset += (nla.length + 4 - 1) & ~ (4 - 1)
+        # cells are replaced in place, drop the index
+        self._attrs_index = None
         return offset
 
     def decode_nlas(self, offset):
@@ -1394,15 +1974,22 @@ class nlmsg_base(dict):
         it is called from `decode()` routine.
         '''
         t_nla_map = self.__class__.__t_nla_map
+        nla_filter = self._nla_filter
         while offset - self.offset <= self.length - 4:
             nla = None
             # pick the length and the type
-            (length, base_msg_type) = struct.unpack_from('HH', self.data,
-                                                         offset)
+            (length, base_msg_type) = _nla_header.unpack_from(self.data,
+                                                              offset)
             # first two bits of msg_type are flags:
             msg_type = base_msg_type & ~(NLA_F_NESTED | NLA_F_NET_BYTEORDER)
             # rewind to the beginning
             length = min(max(length, 4), (self.length - offset + self.offset))
+            # projection: skip not requested NLAs w/o creating objects
+            if nla_filter is not None and \
+                    (msg_type not in t_nla_map or
+                     t_nla_map[msg_type]['name'] not in nla_filter):
+                offset += (length + 4 - 1) & ~ (4 - 1)
+                continue
             # we have a mapping for this NLA
             if msg_type in t_nla_map:
 
@@ -1486,6 +2073,241 @@ class nla_slot(object):
         return repr((self.cell[0], self.get_value()))
 
 
+class nla_slot_encoded(nla_slot):
+    '''
+    The slot of a simple NLA, encoded w/o the NLA object, see
+    `compile_encoder()`. The slot keeps the plain value, so the
+    message can be encoded again after `reset()`; the object is
+    created only when it is requested, e.g. for the flags, so
+    encoded messages look the same in both cases.
+    '''
+
+    __slots__ = (
+        "init",
+    )
+
+    def __init__(self, parent, prime, offset, length, value, flags):
+        self.cell = (prime['name'], value)
+        self.init = (parent, prime, offset, length, flags)
+
+    def try_to_decode(self):
+        if self.init is not None:
+            parent, prime, offset, length, flags = self.init
+            nla = prime['class'](data=parent.data,
+                                 offset=offset,
+                                 parent=parent,
+                                 init=prime['init'])
+            nla._nla_flags = flags
+            nla['header']['type'] = prime['type'] | flags
+            nla['header']['length'] = nla.length = length
+            nla.setvalue(self.cell[1])
+            nla.decoded = True
+            self.cell = (self.cell[0], nla)
+            self.init = None
+        return nla_slot.try_to_decode(self)
+
+    def get_value(self):
+        if self.init is not None:
+            return self.cell[1]
+        return nla_slot.get_value(self)
+
+    def get_flags(self):
+        if self.init is not None:
+            return self.init[4]
+        return nla_slot.get_flags(self)
+
+
+class nlmsg_record(object):
+    '''
+    Compact read-only message representation, returned e.g. by
+    `IPRoute.get_routes(record=True)`. Use `nlmsg_base.record()`
+    to convert a message.
+
+    Records are much smaller than the message objects: the header,
+    the fields and the NLA chain are stored as tuples, nested NLA
+    are decoded only on access. The API is a read-only subset of
+    the message API::
+
+        route['dst_len']                # a field
+        route.get_attr('RTA_DST')       # an NLA
+        route.dst                       # an NLA by the short name,
+                                        # None if there is no such NLA
+        route.table                     # ... or a field
+        route['header']['type']         # the header, as a new dict
+        route.get_attr('RTA_METRICS')   # a nested NLA, decoded now
+
+    A record class is created for every message class on the
+    first use.
+    '''
+
+    __slots__ = (
+        "event",
+        "_header",
+        "_values",
+        "_attrs",
+    )
+
+    msg_class = None
+    header_names = ()
+    field_names = ()
+    field_index = {}
+    nla_names = frozenset()
+    specs = None
+
+    def __init__(self, event, header, values, attrs):
+        object.__setattr__(self, 'event', event)
+        object.__setattr__(self, '_header', header)
+        object.__setattr__(self, '_values', values)
+        object.__setattr__(self, '_attrs', attrs)
+
+    @classmethod
+    def build(cls, msg_class):
+        names = tuple([x[0] for x in msg_class.fields if x[0][0] != '_'])
+        nla_names = [x[0] if isinstance(x[0], basestring) else x[1]
+                     for x in msg_class.nla_map]
+        return type('%s_record' % msg_class.__name__,
+                    (cls, ),
+                    {'__slots__': (),
+                     'msg_class': msg_class,
+                     'header_names': tuple([x[0] for x in
+                                            msg_class.header or ()]),
+                     'field_names': names,
+                     'field_index': dict([(x[1], x[0]) for x in
+                                          enumerate(names)]),
+                     'nla_names': frozenset(nla_names),
+                     'specs': {}})
+
+    def __setattr__(self, key, value):
+        raise AttributeError('records are read-only')
+
+    def __delattr__(self, key):
+        raise AttributeError('records are read-only')
+
+    def __getattr__(self, key):
+        if key[:1] == '_':
+            raise AttributeError(key)
+        if key in self.field_index:
+            return self._values[self.field_index[key]]
+        name = self.msg_class.name2nla(key)
+        for cell in self._attrs:
+            if cell[0] == name:
+                return self._value(cell)
+        if name in self.nla_names:
+            return None
+        raise AttributeError(key)
+
+    def __getitem__(self, key):
+        if key in self.field_index:
+            return self._values[self.field_index[key]]
+        elif key == 'attrs':
+            return [(x[0], self._value(x)) for x in self._attrs]
+        elif key == 'header':
+            return dict(zip(self.header_names, self._header))
+        elif key == 'event' and self.event is not None:
+            return self.event
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def __reduce__(self):
+        # record classes are created in runtime, so pickle
+        # the message class instead
+        return (_restore_record, (self.msg_class,
+                                  self.event,
+                                  self._header,
+                                  self._values,
+                                  self._attrs))
+
+    def _value(self, cell):
+        if len(cell) == 2:
+            return cell[1]
+        (nla_class, init, array, flags) = cell[2]
+        # nested NLA may need the message fields, e.g. the family
+        parent = self.msg_class()
+        parent.update(zip(self.field_names, self._values))
+        nla = nla_class(data=cell[1],
+                        offset=0,
+                        length=len(cell[1]),
+                        parent=parent,
+                        init=init)
+        # keep the parent while the NLA is used
+        nla.parent = parent
+        nla._nla_array = array
+        nla._nla_flags = flags
+        ret = nla_slot(cell[0], nla).get_value()
+        if array and isinstance(ret, list):
+            # array items, like RTA_MULTIPATH next hops, reference
+            # the container only weakly, so decode them now, while
+            # the container and the parent are alive
+            for item in ret:
+                if isinstance(item, nlmsg_base):
+                    item.dump()
+        return ret
+
+    @classmethod
+    def name2nla(cls, name):
+        return cls.msg_class.name2nla(name)
+
+    def keys(self):
+        ret = list(self.field_names)
+        if self.msg_class.nla_map or self._attrs:
+            ret.append('attrs')
+        if self.header_names:
+            ret.append('header')
+        if self.event is not None:
+            ret.append('event')
+        return ret
+
+    def items(self):
+        return [(x, self[x]) for x in self.keys()]
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def get_attr(self, attr, default=None):
+        for cell in self._attrs:
+            if cell[0] == attr:
+                return self._value(cell)
+        return default
+
+    def get_attrs(self, attr):
+        return [self._value(x) for x in self._attrs if x[0] == attr]
+
+    def dump(self):
+        '''
+        Dump the record as a dict
+        '''
+        ret = dict(self.items())
+        if 'attrs' in ret:
+            ret['attrs'] = attrs = []
+            for name, value in self['attrs']:
+                if isinstance(value, nlmsg_base):
+                    value = value.dump()
+                attrs.append([name, value])
+        return ret
+
+
+def _restore_record(msg_class, *argv):
+    global cache_record
+    cls = cache_record.get(id(msg_class), None)
+    if cls is None:
+        cls = cache_record[id(msg_class)] = nlmsg_record.build(msg_class)
+    return cls(*argv)
+
+
 class nla_base(nlmsg_base):
     '''
     The NLA base class. Use `nla_header` class as the header.
@@ -1856,6 +2678,9 @@ class nlmsg_atoms(nlmsg_base):
 
         def decode(self):
             nla_base.decode(self)
+            if isinstance(self['value'], memoryview):
+                # zero-copy mode: strings are decoded anyways
+                self['value'] = self['value'].tobytes()
             self.value = self['value']
             if sys.version_info[0] >= 3:
                 try:
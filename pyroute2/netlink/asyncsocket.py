@@ -0,0 +1,307 @@
+'''
+Asyncio netlink socket
+======================
+
+`AsyncNetlinkSocket` runs netlink requests on an asyncio event
+loop, w/o threads and w/o locks. It wraps a regular netlink
+socket, e.g. `NetlinkSocket` or `RawIPRSocket`, that is used
+to encode and send requests; the socket is read with
+`loop.add_reader()`, and parsed messages are dispatched to the
+requests by the sequence number::
+
+    from pyroute2.netlink import NLM_F_REQUEST, NLM_F_DUMP
+    from pyroute2.netlink.rtnl import RTM_GETLINK
+    from pyroute2.netlink.rtnl.ifinfmsg import ifinfmsg
+    from pyroute2.netlink.rtnl.riprsocket import RawIPRSocket
+    from pyroute2.netlink.asyncsocket import AsyncNetlinkSocket
+
+    async def main():
+        sock = AsyncNetlinkSocket(RawIPRSocket())
+        # collect the whole response
+        links = await sock.nlm_request(ifinfmsg(), RTM_GETLINK)
+        # or iterate the messages as they arrive
+        async for msg in sock.nlm_request(ifinfmsg(), RTM_GETLINK):
+            ...
+        sock.close()
+
+Requests run concurrently; the kernel supports only one dump
+at a time on a socket, so dump requests wait for each other.
+
+Broadcast messages, when the socket is bound to some multicast
+groups, are available with `get()`.
+
+The module requires Python 3.5+.
+'''
+import asyncio
+import collections
+import errno
+import struct
+from pyroute2.netlink import nlmsg
+from pyroute2.netlink import NLMSG_DONE
+from pyroute2.netlink import NLMSG_ERROR
+from pyroute2.netlink import NLM_F_DUMP
+from pyroute2.netlink import NLM_F_MULTI
+from pyroute2.netlink import NLM_F_REQUEST
+
+
+class AsyncRequest(object):
+    '''
+    One request in progress. The object is awaitable, returning
+    the tuple of response messages, and it is an async iterator
+    over the messages as they arrive. Iterate it only once.
+    '''
+
+    def __init__(self, sock, msg, msg_type, msg_flags,
+                 terminate, callback, attrs, record, columns, strict,
+                 prefilter):
+        self.sock = sock
+        self.loop = sock.loop
+        self.args = (msg, msg_type, msg_flags)
+        self.msg_seq = None
+        self.terminate = terminate
+        self.callback = callback
+        self.attrs = attrs
+        self.record = record
+        self.columns = columns
+        self.strict = strict
+        self.prefilter = None
+        if prefilter is not None:
+            self.prefilter = sock.marshal.compile_prefilter(prefilter)
+        self.queue = collections.deque()
+        self.ready = collections.deque()
+        self.future = None
+        self.done = False
+        self.error = None
+        self.started = False
+        self.lock = None
+
+    async def start(self):
+        if self.started:
+            return
+        self.started = True
+        (msg, msg_type, msg_flags) = self.args
+        if msg_flags & NLM_F_DUMP:
+            # one dump at a time, see the module docs
+            await self.sock.dump_lock.acquire()
+            self.lock = self.sock.dump_lock
+        try:
+            self.msg_seq = self.sock.addr_pool.alloc()
+            self.sock.requests[self.msg_seq] = self
+            self.sock.put(msg, msg_type, msg_flags,
+                          msg_seq=self.msg_seq,
+                          strict=self.strict)
+        except Exception:
+            self.finish()
+            raise
+
+    def finish(self, error=None):
+        if self.done:
+            return
+        self.done = True
+        self.error = error
+        if self.sock.requests.get(self.msg_seq) is self:
+            del self.sock.requests[self.msg_seq]
+        if self.msg_seq is not None:
+            # see NetlinkMixin.nlm_request()
+            self.sock.addr_pool.free(self.msg_seq, ban=0xff)
+        if self.lock is not None:
+            self.lock.release()
+            self.lock = None
+        self.wakeup()
+
+    def wakeup(self):
+        if self.future is not None and not self.future.done():
+            self.future.set_result(None)
+
+    def feed(self, msg):
+        '''
+        Put a response message, the same logic as in
+        `NetlinkMixin.get()`
+        '''
+        if self.done:
+            return
+        error = msg['header'].get('error', None)
+        if error is not None:
+            self.finish(error)
+            return
+        tmsg = None
+        if self.terminate is not None:
+            tmsg = self.terminate(msg)
+            if isinstance(tmsg, nlmsg):
+                self.queue.append(msg)
+        if msg['header']['type'] == NLMSG_DONE or tmsg:
+            self.finish()
+            return
+        self.queue.append(msg)
+        if not msg['header']['flags'] & NLM_F_MULTI:
+            self.finish()
+        else:
+            self.wakeup()
+
+    async def fetch(self):
+        '''
+        Wait for the response messages. Return all the messages
+        received so far, or an empty tuple when the response is over.
+        '''
+        await self.start()
+        while not self.queue:
+            if self.done:
+                if self.error is not None:
+                    error, self.error = self.error, None
+                    raise error
+                return ()
+            self.future = self.loop.create_future()
+            await self.future
+            self.future = None
+        ret = tuple(self.queue)
+        self.queue.clear()
+        if self.record:
+            ret = tuple([x.record() for x in ret])
+        return ret
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.ready:
+            batch = await self.fetch()
+            if not batch:
+                raise StopAsyncIteration
+            self.ready.extend(batch)
+        return self.ready.popleft()
+
+    async def collect(self):
+        ret = []
+        while True:
+            batch = await self.fetch()
+            if not batch:
+                return tuple(ret)
+            ret.extend(batch)
+
+    def __await__(self):
+        return self.collect().__await__()
+
+
+class AsyncNetlinkSocket(object):
+    '''
+    Asyncio netlink socket on top of a regular netlink socket
+    object. All the calls must be done from the event loop thread.
+
+    * sock -- the netlink socket, e.g. `RawIPRSocket()`
+    * loop -- the event loop, the running loop by default
+    '''
+
+    def __init__(self, sock, loop=None):
+        self.socket = sock
+        self.marshal = sock.marshal
+        self.addr_pool = sock.addr_pool
+        self.loop = loop or asyncio.get_event_loop()
+        self.requests = {}              # {msg_seq: AsyncRequest()}
+        self.broadcast = collections.deque()
+        self.broadcast_future = None
+        self.dump_lock = asyncio.Lock()
+        self.bufsize = sock.buffer_pool.size
+        self.closed = False
+        sock.setblocking(False)
+        self.loop.add_reader(sock.fileno(), self.on_read)
+
+    def bind(self, *argv, **kwarg):
+        '''
+        Bind the socket, see `NetlinkSocket.bind()`; the async cache
+        is not used.
+        '''
+        kwarg.pop('async_cache', None)
+        return self.socket.bind(*argv, **kwarg)
+
+    def put(self, *argv, **kwarg):
+        return self.socket.put(*argv, **kwarg)
+
+    def nlm_request(self, msg, msg_type,
+                    msg_flags=NLM_F_REQUEST | NLM_F_DUMP,
+                    terminate=None,
+                    callback=None,
+                    attrs=None,
+                    record=False,
+                    columns=None,
+                    strict=False,
+                    prefilter=None):
+        '''
+        Send a request. Returns an `AsyncRequest` object, that can
+        be awaited to get all the response messages, or used as an
+        async iterator. The parameters are the same as for
+        `NetlinkMixin.nlm_request()`.
+        '''
+        return AsyncRequest(self, msg, msg_type, msg_flags,
+                            terminate, callback, attrs, record, columns,
+                            strict, prefilter)
+
+    async def get(self):
+        '''
+        Wait for broadcast messages, return the list of all the
+        messages received so far.
+        '''
+        while not self.broadcast:
+            if self.closed:
+                return []
+            self.broadcast_future = self.loop.create_future()
+            await self.broadcast_future
+            self.broadcast_future = None
+        ret = list(self.broadcast)
+        self.broadcast.clear()
+        return ret
+
+    def on_read(self):
+        # read all the datagrams available
+        for _ in range(64):
+            try:
+                data = self.socket.recv_ft(self.bufsize)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                if e.errno == errno.EAGAIN:
+                    return
+                for request in tuple(self.requests.values()):
+                    request.finish(e)
+                return
+            self.dispatch(data)
+
+    def dispatch(self, data):
+        '''
+        Parse the data and dispatch messages to the requests
+        '''
+        request = None
+        if len(data) >= 16:
+            msg_seq = struct.unpack_from('I', data, 8)[0]
+            request = self.requests.get(msg_seq)
+        if request is not None:
+            msgs = self.marshal.parse(data,
+                                      request.msg_seq,
+                                      request.callback,
+                                      request.attrs,
+                                      request.columns,
+                                      request.prefilter)
+        else:
+            msgs = self.marshal.parse(data)
+        for msg in msgs:
+            request = self.requests.get(msg['header']['sequence_number'])
+            if request is not None:
+                request.feed(msg)
+            elif msg['header']['type'] != NLMSG_ERROR:
+                # drop orphaned NLMSG_ERROR, see NetlinkMixin.get()
+                self.broadcast.append(msg)
+                if self.broadcast_future is not None and \
+                        not self.broadcast_future.done():
+                    self.broadcast_future.set_result(None)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.loop.remove_reader(self.socket.fileno())
+        error = OSError(errno.ECONNRESET, 'socket closed')
+        for request in tuple(self.requests.values()):
+            request.finish(error)
+        if self.broadcast_future is not None and \
+                not self.broadcast_future.done():
+            self.broadcast_future.set_result(None)
+        self.socket.close()
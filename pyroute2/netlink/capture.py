@@ -0,0 +1,406 @@
+'''
+Capture and replay
+------------------
+
+Netlink sockets can record all the sent and received datagrams
+into a file in the nlmon pcap format, the same as `tcpdump -i
+nlmon0` writes, so the recordings can be inspected with Wireshark::
+
+    from pyroute2 import IPRoute
+
+    with IPRoute() as ipr:
+        ipr.start_capture('storm.pcap')
+        ipr.bind()
+        for _ in range(1000):
+            ipr.get()
+        ipr.stop_capture()
+
+A recording can be replayed w/o root and w/o a kernel, e.g. to
+measure the parser or the database throughput. The replay socket
+class feeds the received datagrams back to `get()`, so they pass
+`Marshal.parse()`, callbacks etc.::
+
+    from pyroute2.iproute.linux import ReplayIPRoute
+
+    with ReplayIPRoute(replay='storm.pcap') as ipr:
+        ipr.bind()
+        while ...:
+            ipr.get()
+
+The replay socket works also as a source for IPDB and NDB::
+
+    ndb = NDB(sources={'localhost': {'class': ReplayIPRoute,
+                                     'replay': 'storm.pcap'}})
+
+Datagrams are replayed as fast as possible, or with the original
+pacing, if `pacing=True`. The application requests are matched
+to the recorded requests by the message type, in order; then the
+recorded responses are replayed with the sequence numbers of the
+application requests. Responses to recorded requests that were
+not matched are dropped; application requests that have no
+recorded match get an empty response, as if there were no such
+objects. When the recording is over, the socket blocks in
+`recv()`, like an idle kernel socket, see `ReplayMixin.wait()`.
+
+To inspect a recording, use `load_pcap()`, or decode it with
+`tests/decoder/decoder.py`.
+'''
+import time
+import errno
+import struct
+import threading
+import collections
+from socket import MSG_PEEK
+from socket import MSG_TRUNC
+from socket import SOL_SOCKET
+from socket import SO_RCVBUF
+from socket import SO_SNDBUF
+from pyroute2.common import basestring
+from pyroute2.netlink import NLM_F_DUMP
+from pyroute2.netlink import NLMSG_DONE
+from pyroute2.netlink import NLMSG_ERROR
+
+LINKTYPE_NETLINK = 253
+LINKTYPE_LINUX_SLL = 113
+ARPHRD_NETLINK = 824
+PACKET_HOST = 0
+PACKET_OUTGOING = 4
+PCAP_MAGIC = 0xa1b2c3d4
+PCAP_MAGIC_NSEC = 0xa1b23c4d
+
+
+class PcapWriter(object):
+    '''
+    Write datagrams into a pcap file with the netlink link type.
+
+    * f -- a file name or a file object, opened in the binary mode
+    '''
+
+    def __init__(self, f):
+        if isinstance(f, basestring):
+            self.f = open(f, 'wb')
+            self.own = True
+        else:
+            self.f = f
+            self.own = False
+        self.lock = threading.Lock()
+        self.f.write(struct.pack('IHHiIII', PCAP_MAGIC, 2, 4, 0, 0,
+                                 262144, LINKTYPE_NETLINK))
+
+    def write(self, data, family, outgoing=False, ts=None):
+        '''
+        Write one datagram with the nlmon header
+        '''
+        ts = time.time() if ts is None else ts
+        length = len(data) + 16
+        header = struct.pack('IIII', int(ts), int(ts % 1 * 1000000),
+                             length, length)
+        cooked = struct.pack('>HHH8xH',
+                             PACKET_OUTGOING if outgoing else PACKET_HOST,
+                             ARPHRD_NETLINK, 0, family)
+        with self.lock:
+            self.f.write(header + cooked + bytes(data))
+
+    def close(self):
+        with self.lock:
+            if self.own:
+                self.f.close()
+            else:
+                self.f.flush()
+
+
+def load_pcap(f):
+    '''
+    Load a pcap recording, written by `PcapWriter` or by tcpdump
+    on a nlmon interface. Return a list of tuples
+    `(timestamp, outgoing, family, data)`.
+
+    * f -- a file name or a file object, opened in the binary mode
+    '''
+    if isinstance(f, basestring):
+        with open(f, 'rb') as fd:
+            data = fd.read()
+    else:
+        data = f.read()
+    order = '<'
+    magic, = struct.unpack_from('<I', data, 0)
+    if magic not in (PCAP_MAGIC, PCAP_MAGIC_NSEC):
+        order = '>'
+        magic, = struct.unpack_from('>I', data, 0)
+        if magic not in (PCAP_MAGIC, PCAP_MAGIC_NSEC):
+            raise ValueError('not a pcap file')
+    scale = 1000000000.0 if magic == PCAP_MAGIC_NSEC else 1000000.0
+    linktype, = struct.unpack_from(order + 'I', data, 20)
+    if linktype not in (LINKTYPE_NETLINK, LINKTYPE_LINUX_SLL):
+        raise ValueError('unsupported link type %i' % linktype)
+    ret = []
+    offset = 24
+    while offset + 16 <= len(data):
+        sec, frac, length, _ = struct.unpack_from(order + 'IIII',
+                                                  data,
+                                                  offset)
+        offset += 16
+        packet = data[offset:offset + length]
+        offset += length
+        if len(packet) < 16:
+            continue
+        pkttype, hatype, _, family = struct.unpack_from('>HHH8xH',
+                                                        packet,
+                                                        0)
+        if hatype != ARPHRD_NETLINK:
+            continue
+        ret.append((sec + frac / scale,
+                    pkttype == PACKET_OUTGOING,
+                    family,
+                    packet[16:]))
+    return ret
+
+
+class CaptureSocket(object):
+    '''
+    A wrapper around the system socket, that writes all the sent
+    and received datagrams, see `NetlinkSocket.start_capture()`
+    '''
+
+    def __init__(self, sock, writer, family):
+        self.sock = sock
+        self.writer = writer
+        self.family = family
+
+    def __getattr__(self, attr):
+        return getattr(self.sock, attr)
+
+    def sendto(self, data, *argv):
+        ret = self.sock.sendto(data, *argv)
+        self.writer.write(data, self.family, outgoing=True)
+        return ret
+
+    def send(self, data, *argv):
+        ret = self.sock.send(data, *argv)
+        self.writer.write(data, self.family, outgoing=True)
+        return ret
+
+    def recv(self, bufsize, flags=0):
+        data = self.sock.recv(bufsize, flags)
+        if not flags & MSG_PEEK:
+            self.writer.write(data, self.family)
+        return data
+
+    def recv_into(self, buf, nbytes=0, flags=0):
+        length = self.sock.recv_into(buf, nbytes, flags)
+        if not flags & MSG_PEEK:
+            size = min(length, nbytes or len(buf))
+            self.writer.write(memoryview(buf)[:size], self.family)
+        return length
+
+
+class Replay(object):
+    '''
+    A stand-in for the system socket, that replays a recording,
+    see the module docs.
+
+    * records -- `load_pcap()` result
+    * family -- netlink family to replay, `None` for all
+    * pacing -- reproduce the original timing
+    '''
+
+    def __init__(self, records, family=None, pacing=False):
+        self.records = [x for x in records
+                        if family is None or x[2] == family]
+        self.pacing = pacing
+        self.position = 0
+        self.start = None
+        self.closed = False
+        self.done = threading.Event()
+        self.wakeup = threading.Event()
+        self.lock = threading.Lock()
+        self.addr = (0, 0)
+        self.options = {}
+        self.queue = []         # responses to unmatched requests
+        self.seq_map = {}       # {recorded seq: application seq}
+        self.requests = {}      # {msg type: [(index, recorded seq), ...]}
+        for (index, record) in enumerate(self.records):
+            if record[1] and len(record[3]) >= 16:
+                msg_type, = struct.unpack_from('H', record[3], 4)
+                seq, = struct.unpack_from('I', record[3], 8)
+                if msg_type not in self.requests:
+                    self.requests[msg_type] = collections.deque()
+                self.requests[msg_type].append((index, seq))
+        if not self.records:
+            self.done.set()
+
+    def sendto(self, data, addr=None):
+        data = bytes(data)
+        offset = 0
+        with self.lock:
+            while offset + 16 <= len(data):
+                length, msg_type, flags, seq, pid = \
+                    struct.unpack_from('IHHII', data, offset)
+                if length < 16:
+                    break
+                offset += length
+                requests = self.requests.get(msg_type)
+                # skip the recorded requests, that are replayed already
+                while requests and requests[0][0] < self.position:
+                    requests.popleft()
+                if requests:
+                    self.seq_map[requests.popleft()[1]] = seq
+                else:
+                    # nothing recorded: an empty response
+                    if flags & NLM_F_DUMP:
+                        self.queue.append(struct.pack('IHHIIi', 20,
+                                                      NLMSG_DONE, 2,
+                                                      seq, pid, 0))
+                    else:
+                        self.queue.append(struct.pack('IHHIIi', 36,
+                                                      NLMSG_ERROR, 0,
+                                                      seq, pid, 0) +
+                                          data[offset - length:
+                                               offset - length + 16])
+        self.wakeup.set()
+        return len(data)
+
+    send = sendto
+
+    def next(self, peek=False):
+        with self.lock:
+            if self.queue:
+                return self.queue[0] if peek else self.queue.pop(0)
+            while self.position < len(self.records):
+                ts, outgoing, _, data = self.records[self.position]
+                if outgoing or len(data) < 16:
+                    self.position += 1
+                    continue
+                seq, = struct.unpack_from('I', data, 8)
+                if seq != 0 and seq not in self.seq_map:
+                    # the recorded request was not sent
+                    self.position += 1
+                    continue
+                if not peek:
+                    self.position += 1
+                    if self.position == len(self.records):
+                        self.done.set()
+                break
+            else:
+                self.done.set()
+                return None
+        if seq != 0:
+            data = self.remap(data)
+        if self.pacing and not peek:
+            if self.start is None:
+                self.start = (time.time(), ts)
+            delay = ts - self.start[1] - time.time() + self.start[0]
+            if delay > 0:
+                time.sleep(delay)
+        return data
+
+    def remap(self, data):
+        data = bytearray(data)
+        offset = 0
+        while offset + 16 <= len(data):
+            length, = struct.unpack_from('I', data, offset)
+            seq, = struct.unpack_from('I', data, offset + 8)
+            if seq in self.seq_map:
+                struct.pack_into('I', data, offset + 8, self.seq_map[seq])
+            if length < 16:
+                break
+            offset += length
+        return bytes(data)
+
+    def recv(self, bufsize, flags=0):
+        while True:
+            if self.closed:
+                raise OSError(errno.EBADF, 'socket closed')
+            self.wakeup.clear()
+            data = self.next(flags & MSG_PEEK)
+            if data is not None:
+                return data[:bufsize]
+            # the recording is over, block like an idle socket
+            # until a new request or close()
+            self.wakeup.wait()
+
+    def recv_into(self, buf, nbytes=0, flags=0):
+        nbytes = nbytes or len(buf)
+        data = self.recv(1 << 30, flags)
+        size = min(len(data), nbytes)
+        buf[:size] = data[:size]
+        if flags & MSG_TRUNC:
+            return len(data)
+        return size
+
+    def bind(self, addr):
+        self.addr = addr
+
+    def getsockname(self):
+        return self.addr
+
+    def setsockopt(self, level, option, value):
+        self.options[(level, option)] = value
+
+    def getsockopt(self, level, option, *argv):
+        return self.options.get((level, option), 0) * 2
+
+    def fileno(self):
+        return -1
+
+    def setblocking(self, *argv):
+        pass
+
+    def settimeout(self, *argv):
+        pass
+
+    def gettimeout(self):
+        return None
+
+    def close(self):
+        self.closed = True
+        self.done.set()
+        self.wakeup.set()
+
+
+class ReplayMixin(object):
+    '''
+    Replay socket mixin, must precede the socket class::
+
+        class ReplayIPRoute(ReplayMixin, IPRoute):
+            pass
+
+    Parameters:
+
+    * replay -- a recording: a file name, a file object or a
+      `load_pcap()` result
+    * pacing -- reproduce the original timing
+    '''
+
+    def __init__(self, *argv, **kwarg):
+        replay = kwarg.pop('replay')
+        if not isinstance(replay, (list, tuple)):
+            replay = load_pcap(replay)
+        self.replay_records = replay
+        self.replay_pacing = kwarg.pop('pacing', False)
+        super(ReplayMixin, self).__init__(*argv, **kwarg)
+
+    def post_init(self):
+        with self.sys_lock:
+            self._sock = Replay(self.replay_records,
+                                self.family,
+                                self.replay_pacing)
+            self.sendto_gate = self._gate
+            self.setsockopt(SOL_SOCKET, SO_SNDBUF, self._sndbuf)
+            self.setsockopt(SOL_SOCKET, SO_RCVBUF, self._rcvbuf)
+
+    def clone(self):
+        return type(self)(replay=self.replay_records,
+                          pacing=self.replay_pacing)
+
+    def bind(self, *argv, **kwarg):
+        # no threads to poll the replay
+        kwarg['async_cache'] = False
+        kwarg.pop('async', None)
+        return super(ReplayMixin, self).bind(*argv, **kwarg)
+
+    def wait(self, timeout=None):
+        '''
+        Wait until the whole recording is replayed
+        '''
+        return self._sock.done.wait(timeout)
@@ -0,0 +1,292 @@
+'''
+Columnar decoding
+-----------------
+
+Decode dumps directly into columns, without creating a message
+object for every netlink message. Integer fields and NLA go into
+`array.array` objects, addresses and strings -- into lists::
+
+    from pyroute2 import IPRoute
+
+    with IPRoute() as ipr:
+        routes = ipr.dump_columns('routes', ['dst', 'dst_len',
+                                             'oif', 'gateway',
+                                             'table'])
+        routes['dst_len']  # array('B', [...])
+        routes['gateway']  # ['10.0.0.1', None, ...]
+
+The column types are taken from the message class, see
+`nlmsg_base.sql_schema()`: fields and INTEGER NLA are stored in
+arrays of the struct type of the field or of the NLA, all the
+rest -- in lists. Missing integer NLA are stored as 0, other
+missing NLA -- as None.
+
+If a field and an NLA have the same name, e.g. the route `table`,
+the NLA value is used when the NLA is present.
+
+When NumPy is installed, columns can be exported as a structured
+array with `Columns.to_numpy()`. NumPy is an optional dependency,
+install it with `pip install pyroute2[numpy]`.
+'''
+import array
+import struct
+from socket import inet_ntop
+from socket import AF_INET
+from socket import AF_INET6
+from pyroute2.common import basestring
+from pyroute2.netlink import nlmsg
+from pyroute2.netlink import nla_base
+from pyroute2.netlink import nlmsg_base
+from pyroute2.netlink import nlmsg_atoms
+from pyroute2.netlink import compile_struct
+from pyroute2.netlink import NLA_F_NESTED
+from pyroute2.netlink import NLA_F_NET_BYTEORDER
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+_nla_header = struct.Struct('HH')
+_nla_type_mask = ~(NLA_F_NESTED | NLA_F_NET_BYTEORDER) & 0xffff
+# struct codes -> array typecodes
+_typecodes = {'b': 'b', 'B': 'B',
+              'h': 'h', 'H': 'H',
+              'i': 'i', 'I': 'I',
+              'l': 'l', 'L': 'L',
+              'q': 'q', 'Q': 'Q'}
+
+
+def _decode_int(nla_class):
+    fmt = nla_class.fields[0][1]
+    compiled = compile_struct(nla_class.fields)
+    if compiled is None or fmt[-1] not in _typecodes:
+        return None
+    unpack = compiled[0].unpack_from
+    size = compiled[0].size
+
+    def decoder(data, offset, length):
+        if length < size:
+            return 0
+        return unpack(data, offset)[0]
+
+    return (_typecodes[fmt[-1]], decoder)
+
+
+def _decode_addr(data, offset, length):
+    if length == 4:
+        return inet_ntop(AF_INET, bytes(data[offset:offset + 4]))
+    elif length == 16:
+        return inet_ntop(AF_INET6, bytes(data[offset:offset + 16]))
+
+
+def _decode_l2addr(data, offset, length):
+    return ':'.join(['%02x' % x for x in
+                     bytearray(data[offset:offset + length])])
+
+
+def _decode_string(data, offset, length):
+    value = bytes(data[offset:offset + length])
+    try:
+        return value.decode('utf-8')
+    except UnicodeDecodeError:
+        return value
+
+
+def _decode_asciiz(data, offset, length):
+    value = bytes(data[offset:offset + length]).strip(b'\0')
+    try:
+        return value.decode('utf-8')
+    except UnicodeDecodeError:
+        return value
+
+
+def compile_decoder(nla_class):
+    '''
+    Return `(typecode, decoder)` for an NLA class, where typecode
+    is an `array.array` typecode or None for Python objects, and
+    the decoder is a function `decoder(data, offset, length)`,
+    that takes the NLA payload position.
+    '''
+    atoms = nlmsg_atoms
+    method = getattr(nla_class, 'decode', None)
+    simple = issubclass(nla_class, nla_base) and \
+        not nla_class.nla_map and \
+        not nla_class.value_map and \
+        len(nla_class.fields) == 1 and \
+        nla_class.fields[0][0] == 'value'
+    if simple:
+        if method == nlmsg_base.decode and nla_class.fields[0][1] != 's':
+            ret = _decode_int(nla_class)
+            if ret is not None:
+                return ret
+        elif method == atoms.string.decode:
+            if nla_class.fields[0][1] == 'z':
+                return (None, _decode_asciiz)
+            return (None, _decode_string)
+        elif method in (atoms.ipaddr.decode,
+                        atoms.ipXaddr.decode,
+                        atoms.target.decode):
+            return (None, _decode_addr)
+        elif method == atoms.l2addr.decode:
+            return (None, _decode_l2addr)
+
+    # generic case: decode the NLA object
+    def decoder(data, offset, length):
+        nla = nla_class(data, offset=offset - 4, length=length + 4)
+        nla.decode()
+        value = nla.getvalue()
+        if isinstance(value, nlmsg_base):
+            # don't keep references to the receive buffer
+            value = value.dump()
+        return value
+
+    return (None, decoder)
+
+
+class Columns(object):
+    '''
+    Columns storage and decoder for one message class.
+
+    * msg_class -- the message class, e.g. `rtmsg`
+    * msg_type -- the message type to decode, e.g. `RTM_NEWROUTE`
+    * columns -- the list of field and NLA names, e.g. `['dst',
+      'dst_len']`; NLA may be set also with full names, `RTA_DST`
+    '''
+
+    def __init__(self, msg_class, msg_type, columns):
+        self.msg_class = msg_class
+        self.msg_type = msg_type
+        self.names = tuple(columns)
+        self.count = 0
+        self.columns = {}
+        schema = dict([(x[0][0], x[1].split()[0])
+                       for x in msg_class.sql_schema()])
+        header = tuple(msg_class.header or nlmsg.header)
+        compiled = compile_struct(header + tuple(msg_class.fields))
+        if compiled is None:
+            raise TypeError('%s is not supported' % msg_class.__name__)
+        self.codec, layout = compiled
+        layout = dict([(x[0], x[1]) for x in layout[len(header):]])
+        fields = dict(msg_class.fields)
+        nla_map = self._nla_map(msg_class)
+        # the plan: (column index, fields values index, NLA type)
+        self.fields = []
+        self.nla = {}
+        self.defaults = []
+        for (index, name) in enumerate(self.names):
+            nla_name = msg_class.name2nla(name)
+            typecode = None
+            if nla_name in nla_map:
+                (nla_type, nla_class) = nla_map[nla_name]
+                (typecode, decoder) = compile_decoder(nla_class)
+                if schema.get(nla_name) not in ('INTEGER', 'BIGINT'):
+                    typecode = None
+                self.nla[nla_type] = (index, decoder)
+            if name in fields:
+                if nla_name not in nla_map:
+                    typecode = _typecodes.get(fields[name][-1], None)
+                self.fields.append((index, layout[name]))
+            elif nla_name not in nla_map:
+                raise KeyError('%s has no field or NLA %s' %
+                               (msg_class.__name__, name))
+            if typecode is not None:
+                self.columns[name] = array.array(typecode)
+                self.defaults.append(0)
+            else:
+                self.columns[name] = []
+                self.defaults.append(None)
+        self.order = [self.columns[x] for x in self.names]
+
+    @staticmethod
+    def _nla_map(msg_class):
+        # NLA name -> (type, class), see `nlmsg_base.compile_nla()`
+        ret = {}
+        for (index, item) in enumerate(msg_class.nla_map):
+            if isinstance(item[0], basestring):
+                (key, name, spec) = (index, item[0], item[1])
+            else:
+                (key, name, spec) = item[:3]
+            if spec[0] == '*' or spec.find('(') > -1:
+                # arrays and parametrized NLA are not supported
+                continue
+            if spec == 'recursive':
+                continue
+            nla_class = getattr(msg_class, spec, None)
+            if isinstance(nla_class, type):
+                ret[name] = (key, nla_class)
+        return ret
+
+    def feed(self, data, offset):
+        '''
+        Decode one message at the offset into the columns
+        '''
+        codec = self.codec
+        values = codec.unpack_from(data, offset)
+        row = list(self.defaults)
+        for (index, position) in self.fields:
+            row[index] = values[position]
+        # read NLA chain
+        if self.nla:
+            seen = set()
+            nla = self.nla
+            end = offset + values[0]
+            offset = (offset + codec.size + 4 - 1) & ~ (4 - 1)
+            while offset <= end - 4:
+                (length, nla_type) = _nla_header.unpack_from(data, offset)
+                nla_type &= _nla_type_mask
+                if nla_type in nla and nla_type not in seen:
+                    seen.add(nla_type)
+                    (index, decoder) = nla[nla_type]
+                    value = decoder(data, offset + 4, length - 4)
+                    if value is not None:
+                        row[index] = value
+                offset += (max(length, 4) + 4 - 1) & ~ (4 - 1)
+        for (column, value) in zip(self.order, row):
+            column.append(value)
+        self.count += 1
+
+    def __getitem__(self, key):
+        return self.columns[key]
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def keys(self):
+        return list(self.names)
+
+    def items(self):
+        return [(x, self.columns[x]) for x in self.names]
+
+    def to_numpy(self):
+        '''
+        Return the columns as a NumPy structured array. Integer
+        columns keep their types, strings are stored as unicode
+        with the max length in the column, other objects -- as
+        Python objects.
+        '''
+        if numpy is None:
+            raise ImportError('NumPy is not installed')
+        dtype = []
+        for name in self.names:
+            column = self.columns[name]
+            if isinstance(column, array.array):
+                dtype.append((name, column.typecode))
+            elif all([isinstance(x, basestring) or x is None
+                      for x in column]):
+                size = max([len(x) for x in column if x] or [1])
+                dtype.append((name, 'U%i' % size))
+            else:
+                dtype.append((name, 'O'))
+        ret = numpy.zeros(self.count, dtype=dtype)
+        for name in self.names:
+            column = self.columns[name]
+            if isinstance(column, array.array):
+                ret[name] = numpy.frombuffer(column, dtype=column.typecode)
+            elif ret.dtype[name].kind == 'U':
+                ret[name] = [x or '' for x in column]
+            else:
+                ret[name] = column
+        return ret
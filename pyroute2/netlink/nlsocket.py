@@ -76,6 +76,49 @@ but it doesn't help much. So keep it in mind, and if you
 expect massive broadcast Netlink storms, perform stress
 testing prior to deploy a solution in the production.
 
+zero-copy decoding
+------------------
+
+By default every message keeps a reference to the receive
+buffer, and binary NLA values are copied out of it as `bytes`.
+With `Marshal.zerocopy` set, the buffer is wrapped into one
+`memoryview`, messages and NLAs reference the view, and binary
+NLAs (`cdata`, `hex` source etc.) are returned as views of the
+buffer, without copying::
+
+    ipr = IPRoute()
+    ipr.marshal.zerocopy = True
+    for msg in ipr.get_routes():
+        ...
+        # copy the message data and drop the buffer reference
+        msg.release()
+
+The datagram is pinned until all the messages that were
+parsed from it are released or garbage collected. Views are not
+picklable and can not be re-encoded, so call `release()` for
+messages that outlive the dump processing.
+
+receive buffers
+---------------
+
+Netlink sockets receive data into reusable buffers, see
+`BufferPool`, and copy every datagram out into an exact size
+buffer. The copy is made for every datagram, the pool saves
+only the allocation of the full receive size per `recv()`.
+Messages reference the datagram they were parsed from,
+so a retained message keeps the whole datagram; to keep messages
+from big dumps for a long time, use `nlmsg.release()`.
+
+instrumentation
+---------------
+
+Sockets can collect counters and time histograms: sent and
+received data, parse time per message class, request latency,
+backlog depth, ENOBUFS errors, callbacks and lock wait time.
+The instrumentation is disabled by default, enable it per
+socket with `enable_stats()` and read with `stats()`. IPDB and
+NDB enable it for their sockets with `nl_stats=True`.
+
 classes
 -------
 '''
@@ -93,6 +136,7 @@ import collections
 
 from socket import SOCK_DGRAM
 from socket import MSG_PEEK
+from socket import MSG_TRUNC
 from socket import SOL_SOCKET
 from socket import SO_RCVBUF
 from socket import SO_SNDBUF
@@ -103,16 +147,22 @@ from pyroute2.common import AddrPool
 from pyroute2.common import DEFAULT_RCVBUF
 from pyroute2.netlink import nlmsg
 from pyroute2.netlink import mtypes
+from pyroute2.netlink import compile_struct
 from pyroute2.netlink import NLMSG_ERROR
 from pyroute2.netlink import NLMSG_DONE
+from pyroute2.netlink import NLMSG_MIN_TYPE
 from pyroute2.netlink import NETLINK_ADD_MEMBERSHIP
 from pyroute2.netlink import NETLINK_DROP_MEMBERSHIP
 from pyroute2.netlink import NETLINK_GENERIC
+from pyroute2.netlink import NETLINK_GET_STRICT_CHK
 from pyroute2.netlink import NETLINK_LISTEN_ALL_NSID
+from pyroute2.netlink import NLM_F_ACK
 from pyroute2.netlink import NLM_F_DUMP
 from pyroute2.netlink import NLM_F_MULTI
 from pyroute2.netlink import NLM_F_REQUEST
 from pyroute2.netlink import SOL_NETLINK
+from pyroute2.netlink.capture import PcapWriter
+from pyroute2.netlink.capture import CaptureSocket
 from pyroute2.netlink.exceptions import NetlinkError
 from pyroute2.netlink.exceptions import NetlinkDecodeError
 from pyroute2.netlink.exceptions import NetlinkHeaderDecodeError
@@ -123,7 +173,14 @@ except ImportError:
     from queue import Queue
 
 log = logging.getLogger(__name__)
+clock = getattr(time, 'perf_counter', time.time)
+SO_RCVBUFFORCE = 33
 Stats = collections.namedtuple('Stats', ('qsize', 'delta', 'delay'))
+# prefilter keys, that have different names in different messages
+prefilter_aliases = {'ifindex': ('ifindex', 'index'),
+                     'index': ('index', 'ifindex')}
+# rtmsg / fibmsg: the real table id is in the NLA
+RT_TABLE_COMPAT = 252
 
 
 class Marshal(object):
@@ -136,6 +193,8 @@ class Marshal(object):
     type_format = 'H'
     error_type = NLMSG_ERROR
     debug = False
+    zerocopy = False
+    stats = None
 
     def __init__(self):
         self.lock = threading.Lock()
@@ -144,16 +203,116 @@ class Marshal(object):
         self.msg_map = self.msg_map or {}
         self.defragmentation = {}
 
-    def parse(self, data, seq=None, callback=None):
+    def compile_prefilter(self, spec):
+        '''
+        Compile a header-only prefilter. The spec is a dict, where
+        keys are header or fixed fields names, and values are one
+        value or a list/set of allowed values::
+
+            {'type': RTM_NEWNEIGH, 'ifindex': 2}
+            {'type': (RTM_NEWROUTE, RTM_DELROUTE), 'table': 254}
+
+        `type` is the message type: the header names take precedence
+        over the fields names. `ifindex` and `index` are aliases.
+
+        Return a function `prefilter(data, offset, msg_type)`, that
+        checks the message with one `unpack_from()` w/o creating any
+        objects. Control messages, like NLMSG_ERROR and NLMSG_DONE,
+        are never rejected; messages of classes, that have no such
+        field, are always rejected.
+
+        If the spec is callable, it is returned as is.
+        '''
+        if callable(spec):
+            return spec
+        allowed = {}
+        for (key, value) in spec.items():
+            if isinstance(value, (list, tuple, set, frozenset)):
+                allowed[key] = frozenset(value)
+            else:
+                allowed[key] = frozenset((value, ))
+        types = allowed.pop('type', None)
+        plans = {}
+
+        def compile_plan(msg_type):
+            msg_class = self.msg_map.get(msg_type, nlmsg)
+            header = tuple(msg_class.header or nlmsg.header)
+            names = [x[0] for x in header]
+            compiled = compile_struct(header + tuple(msg_class.fields))
+            if compiled is None:
+                # can not check it here, let the caller decide
+                return True
+            codec, layout = compiled
+            positions = {}
+            for (name, index, count) in reversed(layout):
+                if count == 1 and (name in names or
+                                   name not in positions):
+                    positions[name] = index
+            checks = []
+            for (key, values) in allowed.items():
+                for name in prefilter_aliases.get(key, (key, )):
+                    if name in positions:
+                        if name == 'table':
+                            # tables > 255 are reported only with NLA
+                            values = values | set((RT_TABLE_COMPAT, ))
+                        checks.append((positions[name], values))
+                        break
+                else:
+                    return False
+            return (codec.unpack_from, codec.size, tuple(checks))
+
+        def prefilter(data, offset, msg_type):
+            if msg_type < NLMSG_MIN_TYPE:
+                return True
+            if types is not None and msg_type not in types:
+                return False
+            if not allowed:
+                return True
+            plan = plans.get(msg_type)
+            if plan is None:
+                plan = plans[msg_type] = compile_plan(msg_type)
+            if plan is True or plan is False:
+                return plan
+            (unpack, size, checks) = plan
+            if len(data) - offset < size:
+                return True
+            values = unpack(data, offset)
+            for (index, check) in checks:
+                if values[index] not in check:
+                    return False
+            return True
+
+        return prefilter
+
+    def parse(self, data, seq=None, callback=None, attrs=None,
+              columns=None, prefilter=None):
         '''
         Parse string data.
 
         At this moment all transport, except of the native
         Netlink is deprecated in this library, so we should
         not support any defragmentation on that level
+
+        If `attrs` is a set of NLA names, messages with the
+        sequence number `seq` get only these NLAs decoded,
+        all other NLAs are skipped w/o creating objects.
+
+        If `columns` is set, see `pyroute2.netlink.columns.Columns`,
+        messages with the sequence number `seq` and the type
+        `columns.msg_type` are decoded directly into the columns,
+        and are not returned.
+
+        If `prefilter` is set, see `Marshal.compile_prefilter()`,
+        messages rejected by the prefilter are skipped before any
+        decoding.
         '''
         offset = 0
+        count = 0
         result = []
+        stats = self.stats
+        if self.zerocopy and not isinstance(data, memoryview):
+            # messages will reference the buffer, see nlmsg.release()
+            data = memoryview(data)
         # there must be at least one header in the buffer,
         # 'IHHII' == 16 bytes
         while offset <= len(data) - 16:
@@ -161,20 +320,41 @@ class Marshal(object):
             length, = struct.unpack_from('I', data, offset)
             if length == 0:
                 break
+            count += 1
             error = None
             msg_type, = struct.unpack_from(self.type_format,
                                            data,
                                            offset + self.type_offset)
+            if columns is not None and \
+                    msg_type == columns.msg_type and \
+                    seq == struct.unpack_from('I', data, offset + 8)[0]:
+                columns.feed(data, offset)
+                offset += length
+                continue
+            if prefilter is not None and \
+                    not prefilter(data, offset, msg_type):
+                offset += length
+                continue
             if msg_type == self.error_type:
                 code = abs(struct.unpack_from('i', data, offset + 16)[0])
                 if code > 0:
                     error = NetlinkError(code)
 
+            if stats is not None:
+                start = clock()
             msg_class = self.msg_map.get(msg_type, nlmsg)
             msg = msg_class(data, offset=offset)
+            if attrs is not None and \
+                    error is None and \
+                    seq == struct.unpack_from('I', data, offset + 8)[0]:
+                msg._nla_filter = attrs
 
             try:
                 msg.decode()
+                if stats is not None:
+                    stats.add(stats.parse,
+                              msg_class.__name__,
+                              clock() - start)
                 msg['header']['error'] = error
                 # try to decode encapsulated error message
                 if error is not None:
@@ -202,6 +382,9 @@ class Marshal(object):
             offset += msg.length
             result.append(msg)
 
+        if stats is not None:
+            stats.bytes_recv += offset
+            stats.msgs_recv += count
         return result
 
     def fix_message(self, msg):
@@ -223,6 +406,153 @@ sockets = AddrPool(minaddr=0x0,
 # 8<-----------------------------------------------------------
 
 
+class BufferPool(object):
+    '''
+    Receive buffers pool.
+
+    Datagrams are received with `recv_into()` into the pool
+    buffers, and copied out into exact size buffers; the pool
+    buffer is returned to the pool at once. Every datagram is
+    still copied, so the pool saves only the allocation of the
+    full receive size per `recv()`; the parsed messages don't pin
+    the pool buffers: a retained message keeps only its own
+    datagram.
+
+    The buffer size grows, when the kernel reports truncated
+    datagrams; up to `count` spare buffers are kept for the
+    concurrent readers.
+    '''
+
+    def __init__(self, size=65536, count=4):
+        self.size = size
+        self.count = count
+        self.free = []
+        self.truncated = 0
+        self.lock = threading.Lock()
+
+    def alloc(self, size=None):
+        '''
+        Get a buffer of at least `size` bytes
+        '''
+        size = size or self.size
+        with self.lock:
+            while self.free:
+                buf = self.free.pop()
+                if len(buf) >= size:
+                    return buf
+        return bytearray(size)
+
+    def release(self, buf):
+        '''
+        Return a buffer to the pool
+        '''
+        with self.lock:
+            if len(self.free) < self.count and len(buf) >= self.size:
+                self.free.append(buf)
+
+    def recv(self, sock, bufsize=None, flags=0):
+        '''
+        Receive one datagram from the socket. Return an exact
+        size bytearray with the data.
+        '''
+        bufsize = bufsize or self.size
+        buf = self.alloc(bufsize)
+        try:
+            length = sock.recv_into(buf, bufsize, flags | MSG_TRUNC)
+            if length > bufsize:
+                # the kernel reports the real datagram length
+                self.truncated += 1
+                log.warning('netlink datagram truncated: %i > %i' %
+                            (length, bufsize))
+                if bufsize >= self.size:
+                    self.size = max(self.size * 2, length)
+                length = bufsize
+            return buf[:length]
+        finally:
+            self.release(buf)
+
+
+class Histogram(object):
+    '''
+    Time histogram with log2 buckets: the bucket `N` counts the
+    intervals shorter than `N` microseconds, but not shorter
+    than `N / 2`.
+    '''
+    __slots__ = ('count', 'total', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * 32
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        self.buckets[min(int(value * 1000000).bit_length(), 31)] += 1
+
+    def dump(self):
+        return {'count': self.count,
+                'total': self.total,
+                'max': self.max,
+                'avg': self.total / self.count if self.count else 0.0,
+                'buckets': dict((1 << x, y) for (x, y)
+                                in enumerate(self.buckets) if y)}
+
+
+class SocketStats(object):
+    '''
+    Socket instrumentation, see `NetlinkMixin.enable_stats()`.
+
+    Counters are updated w/o locks, so under concurrent access
+    they are approximate. Time intervals are in seconds.
+    '''
+
+    def __init__(self):
+        self.ctime = time.time()
+        self.bytes_sent = 0
+        self.msgs_sent = 0
+        self.bytes_recv = 0
+        self.msgs_recv = 0
+        self.enobufs = 0
+        self.backlog = 0
+        self.backlog_max = 0
+        self.parse = {}         # {msg class name: Histogram(), ...}
+        self.request = {}       # {msg type: Histogram(), ...}
+        self.callback = Histogram()
+        self.lock_wait = Histogram()
+
+    @staticmethod
+    def add(table, key, value):
+        hist = table.get(key)
+        if hist is None:
+            hist = table[key] = Histogram()
+        hist.add(value)
+
+    def update_backlog(self, backlog):
+        self.backlog = sum([len(x) for x in backlog.values()])
+        if self.backlog > self.backlog_max:
+            self.backlog_max = self.backlog
+
+    def dump(self):
+        return {'uptime': time.time() - self.ctime,
+                'bytes_sent': self.bytes_sent,
+                'msgs_sent': self.msgs_sent,
+                'bytes_recv': self.bytes_recv,
+                'msgs_recv': self.msgs_recv,
+                'enobufs': self.enobufs,
+                'backlog': self.backlog,
+                'backlog_max': self.backlog_max,
+                'parse': dict((x, y.dump()) for (x, y)
+                              in self.parse.items()),
+                'request': dict((x, y.dump()) for (x, y)
+                                in self.request.items()),
+                'callback': self.callback.dump(),
+                'lock_wait': self.lock_wait.dump()}
+
+
 class LockProxy(object):
 
     def __init__(self, factory, key):
@@ -235,7 +565,9 @@ class LockProxy(object):
     def acquire(self, *argv, **kwarg):
         with self.internal:
             self.refcount += 1
-            return self.lock.acquire()
+        # block w/o the internal lock, or release() of the
+        # current owner would wait for it
+        return self.lock.acquire()
 
     def release(self):
         with self.internal:
@@ -327,13 +659,21 @@ class NetlinkMixin(object):
         self.backlog_lock = threading.Lock()
         self.read_lock = threading.Lock()
         self.sys_lock = threading.RLock()
-        self.change_master = threading.Event()
+        self.send_lock = threading.RLock()
+        self.strict_check = None    # NETLINK_GET_STRICT_CHK support
+        self.waiters = {}       # {msg_seq: [threading.Event(), ...]}
         self.lock = LockFactory()
         self._sock = None
         self._ctrl_read, self._ctrl_write = os.pipe()
         self.buffer_queue = Queue()
+        self.buffer_pool = BufferPool()
         self.qsize = 0
         self.log = []
+        self.rcvbuf_size = None
+        self.rcvbuf_max = 64 * 1024 * 1024
+        self.resync_cache = None
+        self.link_index = None
+        self.instruments = None
         self.get_timeout = 30
         self.get_timeout_exception = None
         self.all_ns = all_ns
@@ -394,8 +734,52 @@ class NetlinkMixin(object):
         log.warning("Use `close()` instead")
         self.close()
 
+    def enable_stats(self, enable=True):
+        '''
+        Enable or disable the socket instrumentation, see `stats()`.
+        Disabling drops the collected data.
+        '''
+        if not enable:
+            self.instruments = None
+        elif self.instruments is None:
+            self.instruments = SocketStats()
+        self.marshal.stats = self.instruments
+
+    def stats(self):
+        '''
+        Return the socket instrumentation data as a dict, or an
+        empty dict if not enabled::
+
+            ipr = IPRoute()
+            ipr.enable_stats()
+            ipr.get_links()
+            stats = ipr.stats()
+            # parse time of ifinfmsg messages
+            stats['parse']['ifinfmsg']['total']
+            # RTM_GETLINK request latency
+            stats['request'][RTM_GETLINK]['max']
+
+        Keys:
+
+            - bytes_sent, msgs_sent -- sent requests
+            - bytes_recv, msgs_recv -- received data, incl. broadcasts
+            - enobufs -- ENOBUFS errors, i.e. receive buffer overflows
+            - backlog, backlog_max -- messages queued in the backlog
+            - parse -- decoding time per message class
+            - request -- `nlm_request()` latency per message type,
+              from sending the request to the last response message
+            - callback -- time spent in the registered callbacks
+            - lock_wait -- lock wait time in `get()`
+
+        Time values are histograms, see `Histogram.dump()`.
+        '''
+        if self.instruments is None:
+            return {}
+        return self.instruments.dump()
+
     def register_callback(self, callback,
-                          predicate=lambda x: True, args=None):
+                          predicate=lambda x: True, args=None,
+                          prefilter=None):
         '''
         Register a callback to run on a message arrival.
 
@@ -425,12 +809,31 @@ class NetlinkMixin(object):
                                   lambda x: x.get('index', None) == 1,
                                   (self, ))
 
+        The `prefilter` is a header-only filter, see
+        `Marshal.compile_prefilter()`. It is checked on the raw message
+        header before the predicate, and it rejects control messages,
+        like NLMSG_DONE::
+
+            ipr.register_callback(cb,
+                                  prefilter={'type': RTM_NEWNEIGH,
+                                             'ifindex': 2})
+
         Please note: you do **not** need to register the default 0 queue
         to invoke callbacks on broadcast messages. Callbacks are
         iterated **before** messages get enqueued.
         '''
         if args is None:
             args = []
+        if prefilter is not None:
+            check = self.marshal.compile_prefilter(prefilter)
+            test = predicate
+
+            def predicate(msg):
+                msg_type = msg['header']['type']
+                return msg_type >= NLMSG_MIN_TYPE and \
+                    check(msg.data, msg.offset, msg_type) and \
+                    test(msg)
+
         self.callbacks.append((predicate, callback, args))
 
     def unregister_callback(self, callback):
@@ -539,8 +942,7 @@ class NetlinkMixin(object):
             for (fd, event) in events:
                 if fd == sockfd:
                     try:
-                        data = bytearray(64000)
-                        self._sock.recv_into(data, 64000)
+                        data = self.buffer_pool.recv(self._sock)
                         self.buffer_queue.put(data)
                     except Exception as e:
                         self.buffer_queue.put(e)
@@ -551,7 +953,8 @@ class NetlinkMixin(object):
             msg_flags=NLM_F_REQUEST,
             addr=(0, 0),
             msg_seq=0,
-            msg_pid=None):
+            msg_pid=None,
+            strict=False):
         '''
         Construct a message from a dictionary and send it to
         the socket. Parameters:
@@ -562,6 +965,8 @@ class NetlinkMixin(object):
             - addr -- `sendto()` addr, default `(0, 0)`
             - msg_seq -- sequence number to use
             - msg_pid -- pid to use, if `None` -- use os.getpid()
+            - strict -- send the request with `NETLINK_GET_STRICT_CHK`
+              enabled, if supported, see `set_strict_check()`
 
         Example::
 
@@ -590,7 +995,18 @@ class NetlinkMixin(object):
             msg['header']['flags'] = msg_flags
             msg['header']['sequence_number'] = msg_seq
             msg['header']['pid'] = msg_pid
-            self.sendto_gate(msg, addr)
+            with self.send_lock:
+                if strict and self.set_strict_check(True):
+                    try:
+                        self.sendto_gate(msg, addr)
+                    finally:
+                        self.set_strict_check(False)
+                else:
+                    self.sendto_gate(msg, addr)
+            if self.instruments is not None:
+                self.instruments.msgs_sent += 1
+                self.instruments.bytes_sent += \
+                    msg['header'].get('length') or 0
         except:
             raise
         finally:
@@ -600,16 +1016,55 @@ class NetlinkMixin(object):
     def sendto_gate(self, msg, addr):
         raise NotImplementedError()
 
+    def set_strict_check(self, value):
+        '''
+        Enable or disable `NETLINK_GET_STRICT_CHK` on the socket.
+        Returns False if it is not supported.
+        '''
+        return False
+
+    def grow_rcvbuf(self):
+        '''
+        Double SO_RCVBUF up to `self.rcvbuf_max`. Returns False
+        if the buffer can not grow.
+        '''
+        return False
+
     def get(self, bufsize=DEFAULT_RCVBUF,
             msg_seq=0,
             terminate=None,
-            callback=None):
+            callback=None,
+            attrs=None,
+            columns=None,
+            prefilter=None):
         '''
         Get parsed messages list. If `msg_seq` is given, return
         only messages with that `msg['header']['sequence_number']`,
         saving all other messages into `self.backlog`.
 
-        The routine is thread-safe.
+        If `attrs` is given, messages with `msg_seq` get only the
+        NLAs from this set decoded, see `Marshal.parse()`. The
+        same for `columns`.
+
+        If `prefilter` is given, messages for `msg_seq` rejected by
+        the prefilter are dropped w/o decoding, see
+        `Marshal.compile_prefilter()`. With `msg_seq == 0` it works
+        for broadcast messages, e.g. to monitor only neighbours on
+        one interface::
+
+            ipr.bind()
+            prefilter = {'type': (RTM_NEWNEIGH, RTM_DELNEIGH),
+                         'ifindex': 2}
+            while True:
+                for msg in ipr.get(prefilter=prefilter):
+                    ...
+
+        The routine is thread-safe. Only one thread at a time reads
+        the socket; it dispatches parsed messages to the backlog and
+        wakes up the threads waiting for these sequence numbers, see
+        `self.waiters`, one event per `get()` call. When the reading
+        thread returns, it wakes up one of the waiting threads to read
+        the socket further.
 
         The `bufsize` parameter can be:
 
@@ -617,27 +1072,67 @@ class NetlinkMixin(object):
                 the network data
             - 0: bufsize will be calculated from SO_RCVBUF sockopt
             - int >= 0: just a bufsize
+
+        If the socket is bound with `resync=True`, overflows are
+        handled by `self.resync_cache`, see
+        `pyroute2.netlink.rtnl.resync`; then `get()` with
+        `msg_seq == 0` returns synthetic events after ENOBUFS.
         '''
         ctime = time.time()
-
+        overflow = False
+        if msg_seq == 0 and self.resync_cache is not None and \
+                self.resync_cache.overflow:
+            # run dumps before taking any locks
+            self.resync_cache.resync()
+        spec = prefilter
+        if prefilter is not None:
+            check = self.marshal.compile_prefilter(prefilter)
+            backlog = self.backlog
+
+            def prefilter(data, offset, msg_type):
+                # filter only messages that go to our queue;
+                # broadcast messages may have any sequence number
+                seq = struct.unpack_from('I', data, offset + 8)[0]
+                if msg_seq == 0:
+                    if seq != 0 and seq in backlog:
+                        return True
+                elif seq != msg_seq:
+                    return True
+                return check(data, offset, msg_type)
+
+        if self.instruments is not None:
+            start = clock()
         with self.lock[msg_seq]:
+            if self.instruments is not None:
+                self.instruments.lock_wait.add(clock() - start)
             if bufsize == -1:
                 # get bufsize from the network data
                 bufsize = struct.unpack("I", self.recv(4, MSG_PEEK))[0]
             elif bufsize == 0:
-                # get bufsize from SO_RCVBUF
-                bufsize = self.getsockopt(SOL_SOCKET, SO_RCVBUF) // 2
+                # get bufsize from SO_RCVBUF, cached until setsockopt()
+                if self.rcvbuf_size is None:
+                    self.rcvbuf_size = self.getsockopt(SOL_SOCKET,
+                                                       SO_RCVBUF) // 2
+                bufsize = self.rcvbuf_size
 
             tmsg = None
             enough = False
+            reader = False
             backlog_acquired = False
+            event = threading.Event()
+            waiters = None
             try:
                 while not enough:
                     # 8<-----------------------------------------------------------
                     #
                     # This stage changes the backlog, so use mutex to
                     # prevent side changes
-                    self.backlog_lock.acquire()
+                    if self.instruments is not None:
+                        start = clock()
+                        self.backlog_lock.acquire()
+                        self.instruments.lock_wait.add(clock() - start)
+                    else:
+                        self.backlog_lock.acquire()
                     backlog_acquired = True
                     ##
                     # Stage 1. BEGIN
@@ -721,6 +1216,12 @@ class NetlinkMixin(object):
                         # Receive the data from the socket and put the messages
                         # into the backlog
                         #
+                        # Register the waiter: the reading thread wakes it
+                        # up when messages for msg_seq arrive
+                        if waiters is None:
+                            waiters = self.waiters.setdefault(msg_seq, [])
+                            waiters.append(event)
+                        event.clear()
                         self.backlog_lock.release()
                         backlog_acquired = False
                         ##
@@ -741,18 +1242,37 @@ class NetlinkMixin(object):
                                 return
                         #
                         if self.read_lock.acquire(False):
+                            reader = True
                             try:
-                                self.change_master.clear()
                                 # If the socket is free to read from, occupy
                                 # it and wait for the data
                                 #
                                 # This is a time consuming process, so all the
                                 # locks, except the read lock must be released
-                                data = self.recv_ft(bufsize)
+                                try:
+                                    data = self.recv_ft(bufsize)
+                                except (IOError, OSError) as e:
+                                    if e.errno == errno.ENOBUFS and \
+                                            self.instruments is not None:
+                                        self.instruments.enobufs += 1
+                                    if e.errno != errno.ENOBUFS or \
+                                            self.resync_cache is None:
+                                        raise
+                                    # messages are lost, schedule resync
+                                    self.resync_cache.overflow = True
+                                    self.grow_rcvbuf()
+                                    if msg_seq == 0:
+                                        # resync on the next get() call
+                                        overflow = True
+                                        break
+                                    continue
                                 # Parse data
                                 msgs = self.marshal.parse(data,
                                                           msg_seq,
-                                                          callback)
+                                                          callback,
+                                                          attrs,
+                                                          columns,
+                                                          prefilter)
                                 # Reset ctime -- timeout should be measured
                                 # for every turn separately
                                 ctime = time.time()
@@ -774,6 +1294,8 @@ class NetlinkMixin(object):
                                 self.qsize = current
 
                                 # We've got the data, lock the backlog again
+                                # and dispatch the messages to the waiters
+                                ready = set()
                                 with self.backlog_lock:
                                     for msg in msgs:
                                         msg['header']['stats'] = Stats(current,
@@ -787,8 +1309,14 @@ class NetlinkMixin(object):
                                                 # messages
                                                 continue
                                             seq = 0
+                                        if seq == 0 and \
+                                                self.resync_cache is not None:
+                                            self.resync_cache.update(msg)
                                         # 8<-----------------------------------
                                         # Callbacks section
+                                        if self.callbacks and \
+                                                self.instruments is not None:
+                                            start = clock()
                                         for cr in self.callbacks:
                                             try:
                                                 if cr[0](msg):
@@ -806,44 +1334,89 @@ class NetlinkMixin(object):
                                                 lw = log.warning
                                                 lw("Callback fail: %s" % (cr))
                                                 lw(traceback.format_exc())
+                                        if self.callbacks and \
+                                                self.instruments is not None:
+                                            self.instruments.callback.add(
+                                                clock() - start)
                                         # 8<-----------------------------------
                                         self.backlog[seq].append(msg)
-
-                                # Now wake up other threads
-                                self.change_master.set()
+                                        ready.add(seq)
+                                    if self.instruments is not None:
+                                        self.instruments.update_backlog(
+                                            self.backlog)
+                                    # Now wake up the waiters
+                                    for seq in ready:
+                                        for waiter in self.waiters.get(seq,
+                                                                       ()):
+                                            waiter.set()
                             finally:
                                 # Finally, release the read lock: all data
                                 # processed
                                 self.read_lock.release()
                         else:
                             # If the socket is occupied and there is still no
-                            # data for us, wait for the next master change or
-                            # for a timeout
-                            self.change_master.wait(1)
+                            # data for us, wait until the reading thread
+                            # dispatches our messages or leaves the socket
+                            event.wait(1)
                         # 8<-------------------------------------------------------
                         #
                         # Stage 2. END
                         #
                         # 8<-------------------------------------------------------
             finally:
-                if backlog_acquired:
-                    self.backlog_lock.release()
+                if not backlog_acquired:
+                    self.backlog_lock.acquire()
+                if waiters is not None:
+                    waiters.remove(event)
+                    if not waiters and \
+                            self.waiters.get(msg_seq) is waiters:
+                        del self.waiters[msg_seq]
+                if reader:
+                    # Leaving the socket: wake up one waiter, that has
+                    # no messages yet, to become the next reader
+                    for (seq, events) in self.waiters.items():
+                        if events and not self.backlog.get(seq):
+                            events[0].set()
+                            break
+                self.backlog_lock.release()
+        if overflow:
+            # messages are lost, return the synthetic events
+            for msg in self.get(bufsize, msg_seq, terminate, callback,
+                                attrs, columns, spec):
+                yield msg
 
     def nlm_request(self, msg, msg_type,
                     msg_flags=NLM_F_REQUEST | NLM_F_DUMP,
                     terminate=None,
-                    callback=None):
+                    callback=None,
+                    attrs=None,
+                    record=False,
+                    columns=None,
+                    strict=False,
+                    prefilter=None):
 
         msg_seq = self.addr_pool.alloc()
         with self.lock[msg_seq]:
             retry_count = 0
             while True:
                 try:
-                    self.put(msg, msg_type, msg_flags, msg_seq=msg_seq)
+                    start = clock()
+                    self.put(msg, msg_type, msg_flags, msg_seq=msg_seq,
+                             strict=strict)
                     for msg in self.get(msg_seq=msg_seq,
                                         terminate=terminate,
-                                        callback=callback):
+                                        callback=callback,
+                                        attrs=attrs,
+                                        columns=columns,
+                                        prefilter=prefilter):
+                        if record:
+                            # compact read-only records, see nlmsg_record
+                            msg = msg.record()
                         yield msg
+                    if self.instruments is not None:
+                        self.instruments.add(self.instruments.request,
+                                             msg_type,
+                                             clock() - start)
                     break
                 except NetlinkError as e:
                     if e.code != 16:
@@ -920,7 +1493,353 @@ class BatchSocket(NetlinkMixin):
         msg.encode()
 
     def get(self, *argv, **kwarg):
-        pass
+        # nothing is sent, so no responses
+        return ()
+
+
+class NetlinkPipeline(object):
+    '''
+    Pipelined requests. Requests are encoded into one buffer,
+    each with its own sequence number, and sent in chunks of
+    up to `chunk` bytes, one `sendto()` per chunk. The responses
+    are collected by the sequence numbers, so the cost of a request
+    is not a round-trip, but only the kernel processing time::
+
+        with NetlinkPipeline(sock) as pipe:
+            for msg in msgs:
+                pipe.nlm_request(msg, msg_type, msg_flags)
+        for result in pipe.results:
+            ...
+
+    `results` are in the order of requests: a tuple of response
+    messages, or an exception, if the request failed. Requests
+    w/o NLM_F_DUMP are sent with NLM_F_ACK, so every request has
+    a terminator. The kernel runs only one dump at a time on a
+    socket, so a dump request ends the chunk.
+
+    Requests are independent: `nlm_request()` returns an empty
+    tuple, the response is available only in `results`.
+    '''
+
+    def __init__(self, sock, chunk=32768):
+        self.sock = sock
+        self.marshal = sock.marshal
+        self.chunk = chunk
+        self.requests = []
+        self.results = []
+        self.buffer = bytearray()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.reset()
+
+    def reset(self):
+        '''
+        Drop all the requests, that are not sent yet
+        '''
+        self.requests = []
+        self.buffer = bytearray()
+
+    def nlm_request(self, msg, msg_type,
+                    msg_flags=NLM_F_REQUEST | NLM_F_DUMP,
+                    terminate=None,
+                    callback=None,
+                    attrs=None,
+                    record=False,
+                    columns=None,
+                    strict=False,
+                    prefilter=None):
+        '''
+        Encode a request, the parameters are the same as for
+        `NetlinkMixin.nlm_request()`, except of `columns`, that
+        is not supported, and `strict`, that is ignored.
+        '''
+        if not isinstance(msg, nlmsg):
+            msg = self.marshal.msg_map[msg_type](msg)
+        if not msg_flags & NLM_F_DUMP:
+            msg_flags |= NLM_F_ACK
+        msg_seq = self.sock.addr_pool.alloc()
+        msg['header']['type'] = msg_type
+        msg['header']['flags'] = msg_flags
+        msg['header']['sequence_number'] = msg_seq
+        msg['header']['pid'] = self.sock.epid or os.getpid()
+        msg.data = self.buffer
+        msg.offset = len(self.buffer)
+        msg.encode()
+        self.requests.append((msg_seq,
+                              msg.offset,
+                              msg_flags & NLM_F_DUMP,
+                              {'terminate': terminate,
+                               'callback': callback,
+                               'attrs': attrs,
+                               'prefilter': prefilter}, record))
+        return ()
+
+    def commit(self):
+        '''
+        Send all the requests and collect the responses. Return
+        the results of all the requests, sent so far.
+        '''
+        requests = self.requests
+        buf = self.buffer
+        self.reset()
+        start = 0
+        while start < len(requests):
+            # collect the chunk
+            stop = start + 1
+            offset = requests[start][1]
+            while stop < len(requests) and \
+                    not requests[stop - 1][2] and \
+                    requests[stop][1] - offset < self.chunk:
+                stop += 1
+            end = requests[stop][1] if stop < len(requests) else len(buf)
+            with self.sock.backlog_lock:
+                for request in requests[start:stop]:
+                    self.sock.backlog[request[0]] = []
+            # a slice copy, not a view: the data may be pickled,
+            # e.g. by RemoteSocket
+            self.sock.sendto(buf[offset:end], (0, 0))
+            for (msg_seq, _, _, kwarg, record) in requests[start:stop]:
+                try:
+                    ret = self.sock.get(msg_seq=msg_seq, **kwarg)
+                    if record:
+                        ret = [x.record() for x in ret]
+                    self.results.append(tuple(ret))
+                except Exception as e:
+                    self.results.append(e)
+                finally:
+                    with self.sock.backlog_lock:
+                        self.sock.backlog.pop(msg_seq, None)
+                    self.sock.addr_pool.free(msg_seq, ban=0xff)
+            start = stop
+        return self.results
+
+
+class BulkResult(object):
+    '''
+    Summary of a `NetlinkBulk` run:
+
+    * total -- number of requests sent
+    * errors -- `{request index: exception, ...}`, indices are
+      in the order of requests, starting from 0
+    * requests -- `{request index: message, ...}`, the failed
+      requests, as returned by the kernel in the error messages
+    '''
+
+    def __init__(self):
+        self.total = 0
+        self.errors = {}
+        self.requests = {}
+
+    @property
+    def failed(self):
+        return len(self.errors)
+
+    @property
+    def success(self):
+        return self.total - len(self.errors)
+
+    def codes(self):
+        '''
+        Count errors by the error code: `{code: count, ...}`
+        '''
+        ret = collections.Counter()
+        for error in self.errors.values():
+            ret[getattr(error, 'code', None)] += 1
+        return dict(ret)
+
+    def __repr__(self):
+        return '<BulkResult total=%i success=%i failed=%i %s>' % \
+            (self.total, self.success, self.failed, self.codes())
+
+
+class NetlinkBulk(object):
+    '''
+    Bulk requests. Unlike `NetlinkPipeline`, the responses are
+    not kept, only the errors: the requests are encoded into a
+    buffer and sent in chunks of up to `chunk` bytes, while the
+    requests are still being added, so the whole bulk is never
+    in memory::
+
+        bulk = NetlinkBulk(sock)
+        for msg in msgs:
+            bulk.nlm_request(msg, msg_type, msg_flags)
+        result = bulk.commit()
+        for (index, error) in result.errors.items():
+            ...
+
+    The kernel processes requests of one socket in order, so the
+    ACK of the last request in a chunk means that all the chunk
+    is processed. With `ack=False` only this last request has
+    NLM_F_ACK set, so the kernel sends back only errors, that
+    are collected as well.
+
+    With `wait=False` the chunks are sent w/o waiting for the
+    ACK: the responses are collected later, when they are read
+    from the socket by any other request, and on `commit()`.
+    It allows to send requests from a response callback, where
+    the socket can not be read, see `RTNL_API.flush_routes()`.
+
+    Dump requests are not supported.
+    '''
+
+    def __init__(self, sock, chunk=32768, ack=True, wait=True):
+        self.sock = sock
+        self.marshal = sock.marshal
+        self.chunk = chunk
+        self.ack = ack
+        self.wait = wait
+        self.requests = []      # [(seq, offset), ...] of the chunk
+        self.pending = []       # [(index, requests), ...] sent chunks
+        self.buffer = bytearray()
+        self.result = BulkResult()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.reset()
+
+    def reset(self):
+        '''
+        Drop all the requests, that are not sent yet, and
+        the responses, that are not collected
+        '''
+        for (msg_seq, _) in self.requests:
+            self.sock.addr_pool.free(msg_seq, ban=0xff)
+        for (index, requests) in self.pending:
+            self.release(index, requests)
+        self.requests = []
+        self.pending = []
+        self.buffer = bytearray()
+
+    def nlm_request(self, msg, msg_type,
+                    msg_flags=NLM_F_REQUEST | NLM_F_ACK,
+                    terminate=None,
+                    callback=None,
+                    attrs=None,
+                    record=False,
+                    columns=None,
+                    strict=False,
+                    prefilter=None):
+        '''
+        Encode a request, the parameters are the same as for
+        `NetlinkMixin.nlm_request()`; only `msg`, `msg_type` and
+        `msg_flags` are used.
+
+        `msg` may be an encoded message as well, e.g. a dump
+        response; it is copied as is, only the header is set.
+        '''
+        # NLM_F_DUMP bits are reused by NLM_F_EXCL and NLM_F_REPLACE
+        if msg_flags & NLM_F_DUMP == NLM_F_DUMP:
+            raise ValueError('dump requests can not be sent in bulk')
+        if self.ack:
+            msg_flags |= NLM_F_ACK
+        else:
+            msg_flags &= ~NLM_F_ACK
+        msg_seq = self.sock.addr_pool.alloc()
+        offset = len(self.buffer)
+        if isinstance(msg, (bytes, bytearray, memoryview)):
+            self.buffer.extend(msg)
+            self.buffer.extend(b'\0' * ((4 - len(msg) % 4) % 4))
+            struct.pack_into('IHHII', self.buffer, offset, len(msg),
+                             msg_type, msg_flags, msg_seq,
+                             self.sock.epid or os.getpid())
+        else:
+            if not isinstance(msg, nlmsg):
+                msg = self.marshal.msg_map[msg_type](msg)
+            msg['header']['type'] = msg_type
+            msg['header']['flags'] = msg_flags
+            msg['header']['sequence_number'] = msg_seq
+            msg['header']['pid'] = self.sock.epid or os.getpid()
+            msg.data = self.buffer
+            msg.offset = offset
+            msg.encode()
+        self.requests.append((msg_seq, offset))
+        if len(self.buffer) >= self.chunk:
+            self.flush(self.wait)
+        return ()
+
+    def flush(self, wait=True):
+        '''
+        Send the encoded requests and collect the errors. With
+        `wait=False` only the responses, that are already received,
+        are collected.
+        '''
+        requests = self.requests
+        buf = self.buffer
+        self.requests = []
+        self.buffer = bytearray()
+        if requests:
+            index = self.result.total
+            self.result.total += len(requests)
+            offset = requests[-1][1]
+            if not self.ack:
+                flags, = struct.unpack_from('H', buf, offset + 6)
+                struct.pack_into('H', buf, offset + 6, flags | NLM_F_ACK)
+            with self.sock.backlog_lock:
+                for (msg_seq, _) in requests:
+                    self.sock.backlog[msg_seq] = []
+            try:
+                self.sock.sendto(buf, (0, 0))
+                self.pending.append((index, requests))
+            except Exception as e:
+                # nothing is sent
+                for position in range(len(requests)):
+                    self.result.errors[index + position] = e
+                self.release(index, requests)
+        self.collect(wait)
+
+    def collect(self, wait=True):
+        '''
+        Collect the errors of the sent chunks. With `wait=False`
+        only the chunks, that are already acknowledged.
+        '''
+        while self.pending:
+            (index, requests) = self.pending[0]
+            barrier = requests[-1][0]
+            if wait:
+                try:
+                    tuple(self.sock.get(msg_seq=barrier))
+                except Exception as e:
+                    self.result.errors[index + len(requests) - 1] = e
+            else:
+                with self.sock.backlog_lock:
+                    if not self.sock.backlog.get(barrier):
+                        return
+            # the barrier is passed: all the responses are
+            # in the backlog already
+            self.pending.pop(0)
+            self.release(index, requests)
+
+    def release(self, index, requests):
+        with self.sock.backlog_lock:
+            for (position, (msg_seq, _)) in enumerate(requests):
+                for msg in self.sock.backlog.pop(msg_seq, ()):
+                    error = msg['header'].get('error')
+                    if error is not None:
+                        self.result.errors[index + position] = error
+                        errmsg = msg['header'].get('errmsg')
+                        if errmsg is not None:
+                            self.result.requests[index + position] = errmsg
+        for (msg_seq, _) in requests:
+            self.sock.addr_pool.free(msg_seq, ban=0xff)
+
+    def commit(self):
+        '''
+        Send the rest of the requests and return the
+        `BulkResult` of all the requests, sent so far
+        '''
+        self.flush()
+        return self.result
 
 
 class NetlinkSocket(NetlinkMixin):
@@ -941,8 +1860,14 @@ class NetlinkSocket(NetlinkMixin):
                 # --> monkey patch the socket
                 log.warning('patching socket.recv_into()')
 
-                def patch(data, bsize):
-                    data[0:] = self._sock.recv(bsize)
+                # BufferPool.recv() calls recv_into(buf, bufsize, flags);
+                # recv() can not report the real length, so MSG_TRUNC
+                # is dropped and truncated datagrams are not detected
+                def patch(data, bsize=0, flags=0):
+                    chunk = self._sock.recv(bsize or len(data),
+                                            flags & ~MSG_TRUNC)
+                    data[:len(chunk)] = chunk
+                    return len(chunk)
                 self._sock.recv_into = patch
             self.setsockopt(SOL_SOCKET, SO_SNDBUF, self._sndbuf)
             self.setsockopt(SOL_SOCKET, SO_RCVBUF, self._rcvbuf)
@@ -951,17 +1876,78 @@ class NetlinkSocket(NetlinkMixin):
 
     def __getattr__(self, attr):
         if attr in ('getsockname', 'getsockopt', 'makefile',
-                    'setsockopt', 'setblocking', 'settimeout',
+                    'setblocking', 'settimeout',
                     'gettimeout', 'shutdown', 'recvfrom',
                     'recvfrom_into', 'fileno'):
             return getattr(self._sock, attr)
         elif attr in ('_sendto', '_recv', '_recv_into'):
             return getattr(self._sock, attr.lstrip("_"))
-        elif attr == "recv_ft":
-            return self._sock.recv
 
         raise AttributeError(attr)
 
+    def setsockopt(self, *argv):
+        self.rcvbuf_size = None
+        return self._sock.setsockopt(*argv)
+
+    def start_capture(self, f):
+        '''
+        Write all the sent and received datagrams into a pcap
+        file, see `pyroute2.netlink.capture`
+
+        * f -- a file name or a file object, opened in the binary mode
+        '''
+        with self.sys_lock:
+            if isinstance(self._sock, CaptureSocket):
+                raise RuntimeError('capture is running')
+            self._sock = CaptureSocket(self._sock,
+                                       PcapWriter(f),
+                                       self.family)
+
+    def stop_capture(self):
+        '''
+        Stop the capture and close the file
+        '''
+        with self.sys_lock:
+            if isinstance(self._sock, CaptureSocket):
+                self._sock.writer.close()
+                self._sock = self._sock.sock
+
+    def set_strict_check(self, value):
+        # strict checking is enabled only for the requests that
+        # need it, see put(): with NETLINK_GET_STRICT_CHK the
+        # kernel rejects dumps w/o clean headers, and some other
+        # requests as well
+        if self.strict_check is False:
+            return False
+        try:
+            self._sock.setsockopt(SOL_NETLINK,
+                                  NETLINK_GET_STRICT_CHK,
+                                  int(value))
+            self.strict_check = True
+        except (IOError, OSError):
+            # ENOPROTOOPT, kernels < 4.20
+            self.strict_check = False
+        return self.strict_check
+
+    def grow_rcvbuf(self):
+        # SO_RCVBUFFORCE ignores net.core.rmem_max, but requires
+        # CAP_NET_ADMIN; the kernel doubles the value set, so
+        # setting the current value doubles the buffer
+        size = self._sock.getsockopt(SOL_SOCKET, SO_RCVBUF)
+        if size >= self.rcvbuf_max:
+            return False
+        try:
+            self.setsockopt(SOL_SOCKET, SO_RCVBUFFORCE, size)
+        except (IOError, OSError):
+            self.setsockopt(SOL_SOCKET, SO_RCVBUF, size)
+        ret = self._sock.getsockopt(SOL_SOCKET, SO_RCVBUF)
+        log.warning('ENOBUFS: SO_RCVBUF %i -> %i' % (size, ret))
+        return ret > size
+
+    def recv_ft(self, bufsize, flags=0):
+        # receive into the pooled buffers, see BufferPool
+        return self.buffer_pool.recv(self._sock, bufsize, flags)
+
     def _gate(self, msg, addr):
         msg.reset()
         msg.encode()
@@ -438,7 +438,12 @@ class ifinfbase(object):
                ('IFLA_IF_NETNSID', 'hex'),
                ('IFLA_CARRIER_UP_COUNT', 'uint32'),
                ('IFLA_CARRIER_DOWN_COUNT', 'uint32'),
-               ('IFLA_NEW_IFINDEX', 'hex'))
+               ('IFLA_NEW_IFINDEX', 'hex'),
+               ('IFLA_MIN_MTU', 'uint32'),
+               ('IFLA_MAX_MTU', 'uint32'),
+               ('IFLA_PROP_LIST', 'proplist'),
+               ('IFLA_ALT_IFNAME', 'asciiz'),
+               ('IFLA_PERM_ADDRESS', 'l2addr'))
 
     @staticmethod
     def flags2names(flags, mask=0xffffffff):
@@ -498,6 +503,9 @@ class ifinfbase(object):
             if self.netns_fd is not None:
                 os.close(self.netns_fd)
 
+    class proplist(nla):
+        nla_map = ((53, 'IFLA_ALT_IFNAME', 'asciiz'), )
+
     class vflist(nla):
         nla_map = (('IFLA_VF_INFO_UNSPEC', 'none'),
                    ('IFLA_VF_INFO', 'vfinfo'))
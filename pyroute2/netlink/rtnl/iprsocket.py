@@ -11,6 +11,8 @@ from pyroute2.netlink.nlsocket import NetlinkSocket
 from pyroute2.netlink.nlsocket import BatchSocket
 from pyroute2.netlink import rtnl
 from pyroute2.netlink.rtnl.marshal import MarshalRtnl
+from pyroute2.netlink.rtnl.resync import ResyncCache
+from pyroute2.netlink.rtnl.linkindex import LinkIndex
 
 if sys.platform.startswith('linux'):
     if config.kernel < [3, 3, 0]:
@@ -58,7 +60,19 @@ class IPRSocketMixin(object):
         return type(self)(sndbuf=self._sndbuf, rcvbuf=self._rcvbuf)
 
     def bind(self, groups=rtnl.RTMGRP_DEFAULTS, **kwarg):
+        resync = kwarg.pop('resync', False)
+        link_index = kwarg.pop('link_index', False)
+        if link_index and not groups & rtnl.RTMGRP_LINK:
+            raise ValueError('the link index requires RTMGRP_LINK')
         super(IPRSocketMixin, self).bind(groups, **kwarg)
+        if resync:
+            # see pyroute2.netlink.rtnl.resync
+            self.resync_cache = ResyncCache(self, groups)
+            self.resync_cache.load()
+        if link_index:
+            # see pyroute2.netlink.rtnl.linkindex
+            self.link_index = LinkIndex(self)
+            self.link_index.load()
 
     def _gate_linux(self, msg, addr):
         msg.reset()
@@ -108,7 +122,12 @@ class IPRSocketMixin(object):
 
 
 class IPBatchSocket(IPRSocketMixin, BatchSocket):
-    pass
+
+    def _sendto(self, data, addr):
+        # the messages are encoded by the RTNL proxy gate,
+        # see IPRSocketMixin._gate_linux(); just collect them
+        self.batch += data
+        return len(data)
 
 
 class IPRSocket(IPRSocketMixin, NetlinkSocket):
@@ -174,17 +193,26 @@ class IPRSocket(IPRSocketMixin, NetlinkSocket):
             def get(self, bufsize=DEFAULT_RCVBUF,
                     msg_seq=0,
                     terminate=None,
-                    callback=None):
+                    callback=None,
+                    attrs=None,
+                    columns=None,
+                    prefilter=None):
                 if msg_seq == 0:
                     return self._brd_socket.get(bufsize,
                                                 msg_seq,
                                                 terminate,
-                                                callback)
+                                                callback,
+                                                attrs,
+                                                columns,
+                                                prefilter)
                 else:
                     return super(IPRSocket, self).get(bufsize,
                                                       msg_seq,
                                                       terminate,
-                                                      callback)
+                                                      callback,
+                                                      attrs,
+                                                      columns,
+                                                      prefilter)
 
             def close(self, code=errno.ECONNRESET):
                 with self.sys_lock:
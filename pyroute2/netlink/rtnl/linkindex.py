@@ -0,0 +1,148 @@
+'''
+Link index
+----------
+
+`link_lookup()` resolves interface names with one RTM_GETLINK
+request, but lookups by other keys need a dump of all the links,
+that is slow with thousands of interfaces. Bound with
+`link_index=True`, an RTNL socket keeps an index of the links,
+updated by RTM_NEWLINK and RTM_DELLINK events, and `link_lookup()`
+uses it instead of the dump::
+
+    from pyroute2 import IPRoute
+
+    with IPRoute() as ipr:
+        ipr.bind(link_index=True)
+        ipr.link_lookup(address='52:54:00:9d:4e:3d')
+        ipr.link_lookup(master=2)
+        ipr.link_lookup(kind='vlan')
+
+The index keys are `ifname`, `address`, `master` and `kind`.
+Lookups by names still use RTM_GETLINK; use `lookup()` of the
+index to resolve names w/o any request::
+
+    ipr.link_index.lookup('ifname', 'eth0')
+
+The events are processed by the socket reader, so changes made
+by other processes are seen after the next `get()` or request
+on the socket. Changes made through the socket itself are seen
+immediately: the kernel sends the event before the ACK.
+
+The socket must be bound to `RTMGRP_LINK`. The index is updated
+only with the messages that pass the `get()` prefilter, so don't
+use prefilters with the link index. If the socket overflows, the
+events are lost and the index must be reloaded with `load()`.
+'''
+from socket import AF_UNSPEC
+from pyroute2.netlink import NLM_F_DUMP
+from pyroute2.netlink import NLM_F_REQUEST
+from pyroute2.netlink import rtnl
+from pyroute2.netlink.rtnl.ifinfmsg import ifinfmsg
+
+
+def link_keys(msg):
+    # the indexed values of a link
+    return {'IFLA_IFNAME': msg.get_attr('IFLA_IFNAME'),
+            'IFLA_ADDRESS': msg.get_attr('IFLA_ADDRESS'),
+            'IFLA_MASTER': msg.get_attr('IFLA_MASTER'),
+            'IFLA_KIND': msg.get_nested('IFLA_LINKINFO', 'IFLA_INFO_KIND')}
+
+
+class LinkIndex(object):
+    '''
+    The index `{key: {value: set(index)}}` of the links, see the
+    module docs. The index is updated by the socket reader under
+    `backlog_lock`.
+
+    * sock -- the RTNL socket, bound to `RTMGRP_LINK`
+    '''
+    keys = ('IFLA_IFNAME', 'IFLA_ADDRESS', 'IFLA_MASTER', 'IFLA_KIND')
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.links = {}
+        self.index = dict([(x, {}) for x in self.keys])
+        self.loading = False
+        self.touched = set()
+        sock.register_callback(self.update, predicate=self.match)
+
+    @staticmethod
+    def match(msg):
+        # only the events, bridge port messages use AF_BRIDGE
+        return msg['header']['sequence_number'] == 0 and \
+            msg['header']['type'] in (rtnl.RTM_NEWLINK,
+                                      rtnl.RTM_DELLINK) and \
+            msg['family'] == AF_UNSPEC
+
+    def load(self):
+        '''
+        Load the links. Links, changed by events during the dump,
+        are taken from the events.
+        '''
+        with self.sock.backlog_lock:
+            self.loading = True
+            self.touched = set()
+        msg = ifinfmsg()
+        msg['family'] = AF_UNSPEC
+        dump = {}
+        try:
+            for msg in self.sock.nlm_request(msg,
+                                             rtnl.RTM_GETLINK,
+                                             NLM_F_REQUEST | NLM_F_DUMP):
+                if msg['header']['type'] == rtnl.RTM_NEWLINK:
+                    dump[msg['index']] = link_keys(msg)
+        finally:
+            with self.sock.backlog_lock:
+                self.loading = False
+        with self.sock.backlog_lock:
+            for index in self.touched:
+                if index in self.links:
+                    dump[index] = self.links[index]
+                else:
+                    dump.pop(index, None)
+            self.touched = set()
+            self.links = {}
+            self.index = dict([(x, {}) for x in self.keys])
+            for (index, values) in dump.items():
+                self.add(index, values)
+
+    def add(self, index, values):
+        self.links[index] = values
+        for key in self.keys:
+            self.index[key].setdefault(values[key], set()).add(index)
+
+    def remove(self, index):
+        values = self.links.pop(index, None)
+        if values is None:
+            return
+        for key in self.keys:
+            indices = self.index[key].get(values[key])
+            if indices is not None:
+                indices.discard(index)
+                if not indices:
+                    del self.index[key][values[key]]
+
+    def update(self, msg):
+        '''
+        Update the index with an RTM_NEWLINK or RTM_DELLINK event
+        '''
+        index = msg['index']
+        self.remove(index)
+        if msg['header']['type'] == rtnl.RTM_NEWLINK:
+            self.add(index, link_keys(msg))
+        if self.loading:
+            self.touched.add(index)
+
+    def lookup(self, key, value):
+        '''
+        Return the sorted list of link indices with `key == value`.
+        The key is an NLA name, `IFLA_IFNAME` or `ifname`; `kind`
+        is `IFLA_INFO_KIND` of the link.
+        '''
+        key = str(key).upper()
+        if not key.startswith('IFLA_'):
+            key = 'IFLA_%s' % (key)
+        if key not in self.index:
+            raise KeyError('the key %s is not indexed' % key)
+        with self.sock.backlog_lock:
+            return sorted(self.index[key].get(value, ()))
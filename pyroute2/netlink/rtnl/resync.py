@@ -0,0 +1,313 @@
+'''
+Event stream resync
+-------------------
+
+When a monitoring socket overflows, the kernel drops messages
+and `recv()` fails with ENOBUFS. Bound with `resync=True`, an
+RTNL socket keeps the state of links, addresses, neighbours and
+routes, as seen in the received events, and recovers from the
+overflow::
+
+    from pyroute2 import IPRoute
+
+    with IPRoute() as ipr:
+        ipr.bind(resync=True)
+        while True:
+            for msg in ipr.get():
+                ...
+
+On ENOBUFS the socket grows SO_RCVBUF, see
+`NetlinkSocket.grow_rcvbuf()`, dumps the object classes of the
+bound multicast groups and compares the dump with the state.
+Then `get()` returns synthetic events: `RTM_NEW*` for new and
+changed objects, and `RTM_DEL*` for the objects that are gone.
+So the consumer gets the same state, as the kernel has, w/o
+reloading everything. Volatile NLAs -- counters and cache info,
+like IFLA_STATS64 or RTA_CACHEINFO -- are not compared, so the
+changed counters alone don't cause events.
+
+Resync is disabled by default. IPDB and NDB enable it with
+`IPDB(nl_resync=True)` and `NDB(resync=True)`.
+
+Only links (AF_UNSPEC), IPv4/IPv6 addresses, routes and
+neighbours are tracked; events for other objects, like rules
+or traffic control, may be lost on overflow. The state is
+updated only with the messages that pass the `get()` prefilter,
+so don't use prefilters with resync.
+'''
+import struct
+from socket import AF_INET
+from socket import AF_INET6
+from socket import AF_UNSPEC
+from pyroute2.netlink import NLM_F_DUMP
+from pyroute2.netlink import NLM_F_REQUEST
+from pyroute2.netlink import rtnl
+from pyroute2.netlink.rtnl.rtmsg import rtmsg
+from pyroute2.netlink.rtnl.ndmsg import ndmsg
+from pyroute2.netlink.rtnl.ifinfmsg import ifinfmsg
+from pyroute2.netlink.rtnl.ifaddrmsg import ifaddrmsg
+
+RTM_F_CLONED = 0x200
+IFLA_STATS = 7
+IFLA_STATS64 = 23
+IFLA_AF_SPEC = 26
+IFLA_INET6_STATS = 3
+IFLA_INET6_CACHEINFO = 5
+IFLA_INET6_ICMP6STATS = 6
+IFA_CACHEINFO = 6
+NDA_CACHEINFO = 3
+RTA_CACHEINFO = 12
+
+# volatile NLAs, {type: None} to skip an NLA, {type: {...}} to
+# skip NLAs in a nested one
+LINK_VOLATILE = {IFLA_STATS: None,
+                 IFLA_STATS64: None,
+                 IFLA_AF_SPEC: {AF_INET6: {IFLA_INET6_STATS: None,
+                                           IFLA_INET6_CACHEINFO: None,
+                                           IFLA_INET6_ICMP6STATS: None}}}
+ADDR_VOLATILE = {IFA_CACHEINFO: None}
+NEIGH_VOLATILE = {NDA_CACHEINFO: None}
+ROUTE_VOLATILE = {RTA_CACHEINFO: None}
+
+
+def link_key(msg):
+    return msg['index']
+
+
+def addr_key(msg):
+    return (msg['family'],
+            msg['index'],
+            msg['prefixlen'],
+            msg.get_attr('IFA_ADDRESS'),
+            msg.get_attr('IFA_LOCAL'))
+
+
+def neigh_key(msg):
+    return (msg['family'],
+            msg['ifindex'],
+            msg.get_attr('NDA_DST'))
+
+
+def route_key(msg):
+    # the kernel route identity
+    return (msg['family'],
+            msg.get_attr('RTA_TABLE') or msg['table'],
+            msg['dst_len'],
+            msg.get_attr('RTA_DST'),
+            msg['src_len'],
+            msg.get_attr('RTA_SRC'),
+            msg['tos'],
+            msg.get_attr('RTA_PRIORITY'))
+
+
+def stable(data, offset, volatile):
+    '''
+    Return the NLA chain w/o the volatile NLAs. The result is used
+    only to compare objects, nested NLA lengths are not updated.
+    '''
+    ret = []
+    while offset + 4 <= len(data):
+        length, nla_type = struct.unpack_from('HH', data, offset)
+        if length < 4:
+            break
+        nested = volatile.get(nla_type & 0x3fff, False)
+        if nested is None:
+            pass
+        elif nested:
+            ret.append(data[offset:offset + 4])
+            ret.append(stable(data[:offset + length], offset + 4, nested))
+        else:
+            ret.append(data[offset:offset + length])
+        offset += (length + 3) & ~3
+    return b''.join(ret)
+
+
+class ObjectClass(object):
+    '''
+    One tracked object class: the dump request and the state,
+    `{key: (payload, digest)}`, where the payload is the message
+    data w/o the netlink header, and the digest -- the payload
+    w/o the volatile NLAs, see `stable()`
+    '''
+
+    def __init__(self, msg_class, new_type, del_type, get_type,
+                 families, key, size, volatile):
+        self.msg_class = msg_class
+        self.new_type = new_type
+        self.del_type = del_type
+        self.get_type = get_type
+        self.families = families
+        self.key = key
+        self.size = size
+        self.volatile = volatile
+        self.state = {}
+
+    def entry(self, msg):
+        data = payload(msg)
+        return (data, data[:self.size] + stable(data,
+                                                self.size,
+                                                self.volatile))
+
+    def match(self, msg):
+        if msg['family'] not in self.families:
+            return False
+        if self.msg_class is rtmsg and msg['flags'] & RTM_F_CLONED:
+            # route cache entries are not dumped
+            return False
+        return True
+
+    def dump(self, sock):
+        ret = {}
+        for family in self.families:
+            msg = self.msg_class()
+            msg['family'] = family
+            for msg in sock.nlm_request(msg,
+                                        self.get_type,
+                                        NLM_F_REQUEST | NLM_F_DUMP):
+                if msg['header']['type'] == self.new_type and \
+                        self.match(msg):
+                    ret[self.key(msg)] = msg
+        return ret
+
+
+def payload(msg):
+    return bytes(msg.data[msg.offset + 16:msg.offset + msg.length])
+
+
+class ResyncCache(object):
+    '''
+    The state of RTNL objects for the socket resync, see the
+    module docs. The state is updated by the socket reader
+    under `backlog_lock`.
+
+    * sock -- the RTNL socket
+    * groups -- the socket multicast groups
+    '''
+
+    def __init__(self, sock, groups):
+        self.sock = sock
+        self.overflow = False
+        self.resyncing = False
+        self.touched = set()
+        self.classes = []
+        addr = self.families(groups, rtnl.RTMGRP_IPV4_IFADDR,
+                             rtnl.RTMGRP_IPV6_IFADDR)
+        route = self.families(groups, rtnl.RTMGRP_IPV4_ROUTE,
+                              rtnl.RTMGRP_IPV6_ROUTE)
+        if groups & rtnl.RTMGRP_LINK:
+            self.classes.append(ObjectClass(ifinfmsg,
+                                            rtnl.RTM_NEWLINK,
+                                            rtnl.RTM_DELLINK,
+                                            rtnl.RTM_GETLINK,
+                                            (AF_UNSPEC, ),
+                                            link_key,
+                                            16,
+                                            LINK_VOLATILE))
+        if addr:
+            self.classes.append(ObjectClass(ifaddrmsg,
+                                            rtnl.RTM_NEWADDR,
+                                            rtnl.RTM_DELADDR,
+                                            rtnl.RTM_GETADDR,
+                                            addr,
+                                            addr_key,
+                                            8,
+                                            ADDR_VOLATILE))
+        if groups & rtnl.RTMGRP_NEIGH:
+            self.classes.append(ObjectClass(ndmsg,
+                                            rtnl.RTM_NEWNEIGH,
+                                            rtnl.RTM_DELNEIGH,
+                                            rtnl.RTM_GETNEIGH,
+                                            (AF_INET, AF_INET6),
+                                            neigh_key,
+                                            12,
+                                            NEIGH_VOLATILE))
+        if route:
+            self.classes.append(ObjectClass(rtmsg,
+                                            rtnl.RTM_NEWROUTE,
+                                            rtnl.RTM_DELROUTE,
+                                            rtnl.RTM_GETROUTE,
+                                            route,
+                                            route_key,
+                                            12,
+                                            ROUTE_VOLATILE))
+        self.types = {}
+        for item in self.classes:
+            self.types[item.new_type] = (item, True)
+            self.types[item.del_type] = (item, False)
+
+    @staticmethod
+    def families(groups, ipv4, ipv6):
+        ret = []
+        if groups & ipv4:
+            ret.append(AF_INET)
+        if groups & ipv6:
+            ret.append(AF_INET6)
+        return tuple(ret)
+
+    def load(self):
+        '''
+        Load the initial state
+        '''
+        for item in self.classes:
+            state = item.dump(self.sock)
+            with self.sock.backlog_lock:
+                for (key, msg) in state.items():
+                    item.state[key] = item.entry(msg)
+
+    def update(self, msg):
+        '''
+        Update the state with a broadcast message
+        '''
+        spec = self.types.get(msg['header']['type'])
+        if spec is None or not spec[0].match(msg):
+            return
+        (item, new) = spec
+        key = item.key(msg)
+        if new:
+            item.state[key] = item.entry(msg)
+        else:
+            item.state.pop(key, None)
+        if self.resyncing:
+            self.touched.add((item.new_type, key))
+
+    def resync(self):
+        '''
+        Dump the objects and put the synthetic events into the
+        socket backlog. Objects, changed by events during the dump,
+        are skipped: they get their events anyways.
+        '''
+        self.overflow = False
+        with self.sock.backlog_lock:
+            self.resyncing = True
+            self.touched = set()
+        dumps = []
+        try:
+            for item in self.classes:
+                dumps.append((item, item.dump(self.sock)))
+        finally:
+            with self.sock.backlog_lock:
+                self.resyncing = False
+        events = []
+        deleted = []
+        with self.sock.backlog_lock:
+            for (item, dump) in dumps:
+                state = item.state
+                for (key, msg) in dump.items():
+                    if (item.new_type, key) in self.touched:
+                        continue
+                    entry = item.entry(msg)
+                    if key not in state or state[key][1] != entry[1]:
+                        state[key] = entry
+                        events.append(msg)
+                for key in tuple(state):
+                    if key not in dump and \
+                            (item.new_type, key) not in self.touched:
+                        deleted.append(self.message(item.del_type,
+                                                    state.pop(key)[0]))
+            # deletions go first, routes before links
+            self.sock.backlog[0].extend(deleted[::-1] + events)
+            self.touched = set()
+
+    def message(self, msg_type, data):
+        header = struct.pack('IHHII', len(data) + 16, msg_type, 0, 0, 0)
+        return self.sock.marshal.parse(header + data)[0]
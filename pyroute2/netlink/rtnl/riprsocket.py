@@ -2,6 +2,8 @@ from pyroute2.netlink import rtnl
 from pyroute2.netlink import NETLINK_ROUTE
 from pyroute2.netlink.nlsocket import NetlinkSocket
 from pyroute2.netlink.rtnl.marshal import MarshalRtnl
+from pyroute2.netlink.rtnl.resync import ResyncCache
+from pyroute2.netlink.rtnl.linkindex import LinkIndex
 
 
 class RawIPRSocketMixin(object):
@@ -11,7 +13,19 @@ class RawIPRSocketMixin(object):
         self.marshal = MarshalRtnl()
 
     def bind(self, groups=rtnl.RTMGRP_DEFAULTS, **kwarg):
+        resync = kwarg.pop('resync', False)
+        link_index = kwarg.pop('link_index', False)
+        if link_index and not groups & rtnl.RTMGRP_LINK:
+            raise ValueError('the link index requires RTMGRP_LINK')
         super(RawIPRSocketMixin, self).bind(groups, **kwarg)
+        if resync:
+            # see pyroute2.netlink.rtnl.resync
+            self.resync_cache = ResyncCache(self, groups)
+            self.resync_cache.load()
+        if link_index:
+            # see pyroute2.netlink.rtnl.linkindex
+            self.link_index = LinkIndex(self)
+            self.link_index.load()
 
 
 class RawIPRSocket(RawIPRSocketMixin, NetlinkSocket):
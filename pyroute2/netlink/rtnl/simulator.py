@@ -0,0 +1,735 @@
+'''
+RTNL simulator
+--------------
+
+An in-process stand-in for the kernel RTNL endpoint. It keeps an
+in-memory model of links, addresses, routes and neighbours,
+answers dumps with multipart responses, ACKs and NACKs requests
+with the correct sequence numbers, and sends broadcasts to the
+bound sockets. No root, no kernel, no changes on the host, so it
+can be used to load test IPRoute, IPDB and NDB in CI::
+
+    from pyroute2.iproute.linux import SimIPRoute
+
+    with SimIPRoute() as ipr:
+        ipr.link('add', ifname='v0', kind='dummy')
+        idx = ipr.link_lookup(ifname='v0')[0]
+        ipr.link('set', index=idx, state='up')
+        ipr.addr('add', index=idx, address='10.0.0.1', mask=24)
+        ipr.route('add', dst='10.1.0.0/24', gateway='10.0.0.2', oif=idx)
+
+Sockets, created with the same `Kernel()`, share the state, and
+get the broadcasts of each other; `clone()` shares the kernel as
+well, so IPDB works as is::
+
+    kernel = Kernel()
+    ipdb = IPDB(nl=SimIPRoute(kernel=kernel))
+    ndb = NDB(sources={'localhost': {'class': SimIPRoute,
+                                     'kernel': kernel}})
+
+The model is simple: objects are stored as they're sent in the
+requests, with some defaults added, and are keyed like in the
+kernel, see `pyroute2.netlink.rtnl.resync`. Link kinds are not
+simulated, e.g. veth peers are not created. Dumps of other
+objects, like rules or qdiscs, return nothing, other requests
+fail with EOPNOTSUPP. Broadcasts, that don't fit into the socket
+receive buffer, are dropped and the next `recv()` fails with
+ENOBUFS, like on the real kernel. Dump datagrams are queued one
+by one, when the socket queue is read out, so the responses to
+requests, sent during a dump, come before the dump end.
+'''
+import errno
+import struct
+import binascii
+import threading
+import collections
+from socket import AF_INET
+from socket import AF_INET6
+from socket import AF_UNSPEC
+from socket import SOL_SOCKET
+from socket import SO_RCVBUF
+from socket import SO_SNDBUF
+from socket import inet_pton
+from socket import MSG_PEEK
+from socket import MSG_TRUNC
+from pyroute2.netlink import NLM_F_ACK
+from pyroute2.netlink import NLM_F_CREATE
+from pyroute2.netlink import NLM_F_DUMP
+from pyroute2.netlink import NLM_F_EXCL
+from pyroute2.netlink import NLM_F_MULTI
+from pyroute2.netlink import NLMSG_DONE
+from pyroute2.netlink import NLMSG_ERROR
+from pyroute2.netlink import NETLINK_ADD_MEMBERSHIP
+from pyroute2.netlink import NETLINK_DROP_MEMBERSHIP
+from pyroute2.netlink import SOL_NETLINK
+from pyroute2.netlink import rtnl
+from pyroute2.netlink.rtnl.marshal import MarshalRtnl
+from pyroute2.netlink.rtnl.resync import link_key
+from pyroute2.netlink.rtnl.resync import addr_key
+from pyroute2.netlink.rtnl.resync import neigh_key
+from pyroute2.netlink.rtnl.resync import route_key
+from pyroute2.netlink.rtnl.ifinfmsg import IFF_UP
+from pyroute2.netlink.rtnl.ifinfmsg import IFF_LOOPBACK
+from pyroute2.netlink.rtnl.ifinfmsg import IFF_RUNNING
+from pyroute2.netlink.rtnl.ifinfmsg import IFF_LOWER_UP
+
+# NLA types, used to fill the defaults
+IFLA_ADDRESS = 1
+IFLA_BROADCAST = 2
+IFLA_IFNAME = 3
+IFLA_MTU = 4
+IFLA_TXQLEN = 13
+IFLA_OPERSTATE = 16
+IFA_ADDRESS = 1
+IFA_LOCAL = 2
+RTA_DST = 1
+RTA_OIF = 4
+IF_OPER_DOWN = 2
+IF_OPER_UP = 6
+ARPHRD_ETHER = 1
+ARPHRD_LOOPBACK = 772
+# the size of a dump datagram
+DUMP_CHUNK = 16384
+
+
+def nla(nla_type, data):
+    length = len(data) + 4
+    return struct.pack('HH', length, nla_type) + data + \
+        b'\0' * ((4 - length % 4) % 4)
+
+
+def message(msg_type, flags, fields, nlas=()):
+    data = fields + b''.join(nlas)
+    return struct.pack('IHHII', len(data) + 16, msg_type, flags, 0, 0) + data
+
+
+def addr_int(family, addr):
+    return int(binascii.hexlify(inet_pton(family, addr)), 16)
+
+
+def nla_chain(data, offset):
+    '''
+    Split the NLA chain into `{type: raw NLA}`, w/o decoding
+    '''
+    ret = collections.OrderedDict()
+    while offset + 4 <= len(data):
+        length, nla_type = struct.unpack_from('HH', data, offset)
+        if length < 4:
+            break
+        ret[nla_type & 0x3fff] = bytes(data[offset:offset + length]) + \
+            b'\0' * ((4 - length % 4) % 4)
+        offset += (length + 3) & ~3
+    return ret
+
+
+class ObjectTable(object):
+    '''
+    One object class of the model: `{key: message data}`; the
+    data is the whole message, with a zeroed header.
+
+    Objects must be changed only with `store()` and `remove()`,
+    that keep the secondary indices, see `add_index()`, so no
+    lookup scans the table.
+    '''
+
+    def __init__(self, new_type, del_type, msg_class, key, size,
+                 groups, enoent):
+        self.new_type = new_type
+        self.del_type = del_type
+        self.msg_class = msg_class
+        self.key = key
+        self.size = size            # header + fixed fields size
+        self.groups = groups        # {family: multicast group}
+        self.enoent = enoent        # the error on missing objects
+        self.objects = collections.OrderedDict()
+        # {name: (function(key, data), {index key: {key: None}})}
+        self.indices = {}
+
+    def decode(self, data):
+        msg = self.msg_class(data)
+        msg.decode()
+        return msg
+
+    def add_index(self, name, function):
+        '''
+        Add a secondary index: `function(key, data)` returns the
+        index key of an object, or `None` to skip the object
+        '''
+        index = {}
+        for (key, data) in self.objects.items():
+            ikey = function(key, data)
+            if ikey is not None:
+                index.setdefault(ikey, collections.OrderedDict())[key] = None
+        self.indices[name] = (function, index)
+
+    def find(self, name, ikey):
+        '''
+        Return the keys of the objects with the index key `ikey`,
+        in the insertion order
+        '''
+        return tuple(self.indices[name][1].get(ikey, ()))
+
+    def store(self, key, data):
+        old = self.objects.get(key)
+        self.objects[key] = data
+        for (function, index) in self.indices.values():
+            ikey = function(key, data)
+            if old is not None:
+                okey = function(key, old)
+                if okey == ikey:
+                    continue
+                self._unindex(index, okey, key)
+            if ikey is not None:
+                index.setdefault(ikey, collections.OrderedDict())[key] = None
+
+    def remove(self, key):
+        data = self.objects.pop(key)
+        for (function, index) in self.indices.values():
+            self._unindex(index, function(key, data), key)
+        return data
+
+    @staticmethod
+    def _unindex(index, ikey, key):
+        keys = index.get(ikey)
+        if keys is not None:
+            keys.pop(key, None)
+            if not keys:
+                del index[ikey]
+
+    def lookup(self, msg):
+        '''
+        Find an object by the request; `None` values in the
+        request key match any value
+        '''
+        key = self.key(msg)
+        if key in self.objects:
+            return key
+        if not isinstance(key, tuple) or None not in key:
+            return None
+        # index the objects by the fields, set in the request
+        fields = tuple(i for (i, x) in enumerate(key) if x is not None)
+        name = ('fields', fields)
+        if name not in self.indices:
+            self.add_index(name,
+                           lambda k, d: tuple(k[i] for i in fields))
+        for stored in self.indices[name][1].get(tuple(key[i]
+                                                      for i in fields),
+                                                ()):
+            return stored
+        return None
+
+
+def link_name(table):
+    # the index of links by the raw IFLA_IFNAME
+    def function(key, data):
+        return nla_chain(data, table.size).get(IFLA_IFNAME)
+    return function
+
+
+def nla_link(table, nla_type):
+    # the index of objects by the link from an NLA, e.g. RTA_OIF
+    def function(key, data):
+        value = nla_chain(data, table.size).get(nla_type)
+        if value is not None:
+            return struct.unpack_from('I', value, 4)[0]
+    return function
+
+
+def field_link(fmt):
+    # the index of objects by the link from the header fields
+    def function(key, data):
+        return struct.unpack_from(fmt, data, 20)[0]
+    return function
+
+
+def route_prefix(key, data):
+    # the index of routes by `(family, dst_len, network)`
+    family, dst_len, dst = key[0], key[2], key[3]
+    if family not in (AF_INET, AF_INET6):
+        return None
+    bits = 32 if family == AF_INET else 128
+    network = addr_int(family, dst) if dst is not None else 0
+    return (family, dst_len, network >> (bits - dst_len))
+
+
+class Kernel(object):
+    '''
+    The RTNL model, shared by the simulated sockets
+    '''
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.sockets = []
+        self.marshal = MarshalRtnl()
+        self.next_index = 1
+        self.links = ObjectTable(rtnl.RTM_NEWLINK, rtnl.RTM_DELLINK,
+                                 self.marshal.msg_map[rtnl.RTM_NEWLINK],
+                                 link_key, 32,
+                                 {AF_UNSPEC: rtnl.RTMGRP_LINK},
+                                 errno.ENODEV)
+        self.addr = ObjectTable(rtnl.RTM_NEWADDR, rtnl.RTM_DELADDR,
+                                self.marshal.msg_map[rtnl.RTM_NEWADDR],
+                                addr_key, 24,
+                                {AF_INET: rtnl.RTMGRP_IPV4_IFADDR,
+                                 AF_INET6: rtnl.RTMGRP_IPV6_IFADDR},
+                                errno.EADDRNOTAVAIL)
+        self.routes = ObjectTable(rtnl.RTM_NEWROUTE, rtnl.RTM_DELROUTE,
+                                  self.marshal.msg_map[rtnl.RTM_NEWROUTE],
+                                  route_key, 28,
+                                  {AF_INET: rtnl.RTMGRP_IPV4_ROUTE,
+                                   AF_INET6: rtnl.RTMGRP_IPV6_ROUTE},
+                                  errno.ESRCH)
+        self.neighbours = ObjectTable(rtnl.RTM_NEWNEIGH, rtnl.RTM_DELNEIGH,
+                                      self.marshal.msg_map[
+                                          rtnl.RTM_NEWNEIGH],
+                                      neigh_key, 28,
+                                      {AF_INET: rtnl.RTMGRP_NEIGH,
+                                       AF_INET6: rtnl.RTMGRP_NEIGH},
+                                      errno.ENOENT)
+        self.tables = {}
+        for table in (self.links, self.addr, self.routes, self.neighbours):
+            self.tables[table.new_type] = table
+            self.tables[table.del_type] = table
+            self.tables[table.new_type + 2] = table     # RTM_GET*
+        self.tables[rtnl.RTM_SETLINK] = self.links
+        self.links.add_index('name', link_name(self.links))
+        self.addr.add_index('link', field_link('I'))
+        self.neighbours.add_index('link', field_link('i'))
+        self.routes.add_index('link', nla_link(self.routes, RTA_OIF))
+        self.routes.add_index('prefix', route_prefix)
+        # the loopback
+        self.request(message(rtnl.RTM_NEWLINK,
+                             NLM_F_CREATE | NLM_F_EXCL,
+                             struct.pack('BBHiII', 0, 0, ARPHRD_LOOPBACK, 0,
+                                         IFF_UP | IFF_LOOPBACK, 0),
+                             (nla(IFLA_IFNAME, b'lo\0'),
+                              nla(IFLA_MTU, struct.pack('I', 65536)),
+                              nla(IFLA_ADDRESS, b'\0' * 6),
+                              nla(IFLA_BROADCAST, b'\0' * 6))))
+        self.request(message(rtnl.RTM_NEWADDR,
+                             NLM_F_CREATE | NLM_F_EXCL,
+                             struct.pack('BBBBI', AF_INET, 8, 0x80, 254, 1),
+                             (nla(IFA_ADDRESS,
+                                  inet_pton(AF_INET, '127.0.0.1')),
+                              nla(IFA_LOCAL,
+                                  inet_pton(AF_INET, '127.0.0.1')))))
+
+    def connect(self, sock):
+        with self.lock:
+            self.sockets.append(sock)
+
+    def disconnect(self, sock):
+        with self.lock:
+            if sock in self.sockets:
+                self.sockets.remove(sock)
+
+    def broadcast(self, table, data, msg_type):
+        family = struct.unpack_from('B', data, 16)[0]
+        group = table.groups.get(family, 0)
+        data = bytearray(data)
+        struct.pack_into('IH', data, 0, len(data), msg_type)
+        data = bytes(data)
+        for sock in self.sockets:
+            if sock.groups & group:
+                sock.push(data, broadcast=True)
+
+    def request(self, data):
+        '''
+        Run all the requests in the datagram and return the
+        response datagrams, a list per request
+        '''
+        ret = []
+        offset = 0
+        while offset + 16 <= len(data):
+            length, msg_type, flags, seq, pid = \
+                struct.unpack_from('IHHII', data, offset)
+            if length < 16:
+                break
+            request = data[offset:offset + length]
+            msg = bytearray(request)
+            struct.pack_into('IHHII', msg, 0, length, msg_type, 0, 0, 0)
+            offset += (length + 3) & ~3
+            with self.lock:
+                try:
+                    response = self.handle(msg_type, flags, msg)
+                    code = 0
+                except (OSError, IOError) as e:
+                    response = None
+                    code = e.errno or errno.EINVAL
+            if response is None:
+                response = []
+            elif not flags & NLM_F_DUMP:
+                response = [bytearray(x) for x in response]
+            for item in response:
+                # the header fields of the response messages
+                struct.pack_into('IHHII', item, 0, len(item),
+                                 struct.unpack_from('H', item, 4)[0],
+                                 NLM_F_MULTI if flags & NLM_F_DUMP else 0,
+                                 seq, pid)
+            if flags & NLM_F_DUMP and not code:
+                response.append(bytearray(struct.pack('IHHIIi', 20,
+                                                      NLMSG_DONE,
+                                                      NLM_F_MULTI,
+                                                      seq, pid, 0)))
+            elif code or flags & NLM_F_ACK:
+                # the error or ACK with the request message
+                response.append(bytearray(struct.pack('IHHIIi',
+                                                      20 + length,
+                                                      NLMSG_ERROR, 0,
+                                                      seq, pid, -code) +
+                                          bytes(request)))
+            # pack into datagrams
+            datagrams = []
+            chunk = bytearray()
+            for item in response:
+                if chunk and len(chunk) + len(item) > DUMP_CHUNK:
+                    datagrams.append(bytes(chunk))
+                    chunk = bytearray()
+                chunk.extend(item)
+                chunk.extend(b'\0' * ((4 - len(item) % 4) % 4))
+            if chunk:
+                datagrams.append(bytes(chunk))
+            ret.append(datagrams)
+        return ret
+
+    def handle(self, msg_type, flags, data):
+        table = self.tables.get(msg_type)
+        if table is None:
+            if flags & NLM_F_DUMP:
+                return []
+            raise OSError(errno.EOPNOTSUPP, 'not supported')
+        if msg_type == table.new_type + 2:
+            return self.get(table, flags, data)
+        elif msg_type == table.del_type:
+            return self.delete(table, data)
+        elif table is self.links:
+            return self.set_link(msg_type, flags, data)
+        else:
+            return self.add(table, flags, data)
+
+    def get(self, table, flags, data):
+        family = struct.unpack_from('B', data, 16)[0]
+        if not flags & NLM_F_DUMP:
+            msg = table.decode(data)
+            if table is self.links:
+                key = self.find_link(msg)
+            elif table is self.routes:
+                key = self.route_lookup(msg)
+            else:
+                key = table.lookup(msg)
+            if key is None:
+                raise OSError(table.enoent, 'not found')
+            ret = bytearray(table.objects[key])
+            struct.pack_into('H', ret, 4, table.new_type)
+            return [ret]
+        if table is self.links and family not in (AF_UNSPEC, 17):
+            # no bridge or other per-family link dumps
+            return []
+        ret = []
+        for item in table.objects.values():
+            if family in (AF_INET, AF_INET6) and \
+                    struct.unpack_from('B', item, 16)[0] != family:
+                continue
+            item = bytearray(item)
+            struct.pack_into('H', item, 4, table.new_type)
+            ret.append(item)
+        return ret
+
+    def find_link(self, msg):
+        if msg['index']:
+            if msg['index'] in self.links.objects:
+                return msg['index']
+            return None
+        # like the kernel: IFLA_ALT_IFNAME first; no alternative
+        # names are simulated, so it matches the name
+        ifname = msg.get_attr('IFLA_ALT_IFNAME') or \
+            msg.get_attr('IFLA_IFNAME')
+        if ifname is not None:
+            for key in self.links.find('name',
+                                       nla(IFLA_IFNAME,
+                                           ifname.encode('utf-8') + b'\0')):
+                return key
+        return None
+
+    def route_lookup(self, msg):
+        # the longest prefix match
+        dst = msg.get_attr('RTA_DST')
+        family = msg['family']
+        if dst is None or family not in (AF_INET, AF_INET6):
+            raise OSError(errno.EINVAL, 'invalid argument')
+        bits = 32 if family == AF_INET else 128
+        addr = addr_int(family, dst)
+        for dst_len in range(bits, -1, -1):
+            for key in self.routes.find('prefix',
+                                        (family,
+                                         dst_len,
+                                         addr >> (bits - dst_len))):
+                return key
+        raise OSError(errno.ENETUNREACH, 'network unreachable')
+
+    def set_link(self, msg_type, flags, data):
+        msg = self.links.decode(data)
+        key = self.find_link(msg)
+        if key is None:
+            if msg_type == rtnl.RTM_SETLINK or not flags & NLM_F_CREATE:
+                raise OSError(errno.ENODEV, 'no such device')
+            return self.create_link(msg, data)
+        elif msg_type == rtnl.RTM_NEWLINK and flags & NLM_F_EXCL:
+            raise OSError(errno.EEXIST, 'file exists')
+        old = self.links.objects[key]
+        ifi_flags, = struct.unpack_from('I', old, 24)
+        req_flags, change = struct.unpack_from('II', data, 24)
+        if req_flags or change:
+            if change:
+                ifi_flags = (req_flags & change) | (ifi_flags & ~change)
+            else:
+                ifi_flags = req_flags
+        nlas = nla_chain(old, self.links.size)
+        nlas.update(nla_chain(data, self.links.size))
+        self.links.store(key, self.link_data(old[:self.links.size],
+                                             ifi_flags,
+                                             nlas))
+        self.broadcast(self.links, self.links.objects[key], rtnl.RTM_NEWLINK)
+        return None
+
+    def create_link(self, msg, data):
+        nlas = nla_chain(data, self.links.size)
+        if IFLA_IFNAME not in nlas:
+            raise OSError(errno.EINVAL, 'invalid argument')
+        index = msg['index']
+        if not index:
+            while self.next_index in self.links.objects:
+                self.next_index += 1
+            index = self.next_index
+        ifi_type = struct.unpack_from('H', data, 18)[0] or ARPHRD_ETHER
+        mac = struct.pack('>HI', 0x0200, index)
+        defaults = ((IFLA_ADDRESS, mac),
+                    (IFLA_BROADCAST, b'\xff' * 6),
+                    (IFLA_MTU, struct.pack('I', 1500)),
+                    (IFLA_TXQLEN, struct.pack('I', 1000)))
+        for (nla_type, value) in defaults:
+            if nla_type not in nlas:
+                nlas[nla_type] = nla(nla_type, value)
+        header = bytearray(data[:self.links.size])
+        struct.pack_into('=Hi', header, 18, ifi_type, index)
+        flags, = struct.unpack_from('I', data, 24)
+        self.links.store(index, self.link_data(header, flags, nlas))
+        self.broadcast(self.links,
+                       self.links.objects[index],
+                       rtnl.RTM_NEWLINK)
+        return None
+
+    def link_data(self, header, flags, nlas):
+        if flags & IFF_UP:
+            flags |= IFF_RUNNING | IFF_LOWER_UP
+            state = IF_OPER_UP
+        else:
+            flags &= ~(IFF_RUNNING | IFF_LOWER_UP)
+            state = IF_OPER_DOWN
+        nlas[IFLA_OPERSTATE] = nla(IFLA_OPERSTATE, struct.pack('B', state))
+        ret = bytearray(header)
+        struct.pack_into('II', ret, 24, flags, 0)
+        for value in nlas.values():
+            ret.extend(value)
+        return bytes(ret)
+
+    def add(self, table, flags, data):
+        msg = table.decode(data)
+        if table is self.routes:
+            index = msg.get_attr('RTA_OIF')
+        else:
+            index = struct.unpack_from('i' if table is self.neighbours
+                                       else 'I', data, 20)[0]
+        if index and index not in self.links.objects:
+            raise OSError(errno.ENODEV, 'no such device')
+        if table is self.addr and msg.get_attr('IFA_ADDRESS') is None:
+            # the kernel sets the address from the local one
+            data = bytes(data) + nla(IFA_ADDRESS,
+                                     inet_pton(msg['family'],
+                                               msg.get_attr('IFA_LOCAL')))
+            msg = table.decode(data)
+        key = table.key(msg)
+        if key in table.objects:
+            if flags & NLM_F_EXCL:
+                raise OSError(errno.EEXIST, 'file exists')
+        elif not flags & NLM_F_CREATE:
+            raise OSError(errno.ENOENT, 'no such object')
+        table.store(key, bytes(data))
+        self.broadcast(table, table.objects[key], table.new_type)
+        return None
+
+    def delete(self, table, data):
+        msg = table.decode(data)
+        if table is self.links:
+            key = self.find_link(msg)
+        else:
+            key = table.lookup(msg)
+        if key is None:
+            raise OSError(table.enoent, 'not found')
+        item = table.remove(key)
+        if table is self.links:
+            # addresses and neighbours are removed with notifications
+            # before the link, routes -- silently
+            for dependent in (self.addr, self.neighbours):
+                for dkey in dependent.find('link', key):
+                    self.broadcast(dependent,
+                                   dependent.remove(dkey),
+                                   dependent.del_type)
+            for dkey in self.routes.find('link', key):
+                self.routes.remove(dkey)
+            # the kernel sends RTM_DELLINK with ifi_change = ~0U
+            item = bytearray(item)
+            struct.pack_into('I', item, 28, 0xffffffff)
+        self.broadcast(table, item, table.del_type)
+        return None
+
+
+class SimSocket(object):
+    '''
+    A stand-in for the system socket, connected to a `Kernel()`
+    '''
+
+    def __init__(self, kernel):
+        self.kernel = kernel
+        self.queue = collections.deque()
+        self.dump = collections.deque()
+        self.queued = 0
+        self.overflow = False
+        self.closed = False
+        self.cond = threading.Condition()
+        self.groups = 0
+        self.addr = (0, 0)
+        self.options = {}
+        kernel.connect(self)
+
+    def push(self, data, broadcast=False):
+        with self.cond:
+            if broadcast and \
+                    self.queued + len(data) > self.getsockopt(SOL_SOCKET,
+                                                              SO_RCVBUF):
+                self.overflow = True
+                return
+            self.queue.append(data)
+            self.queued += len(data)
+            self.cond.notify()
+
+    def sendto(self, data, addr=None):
+        # like the kernel, queue the first datagram of a dump, and
+        # the rest -- on recv(), so the responses to the requests,
+        # sent during the dump, are not delayed until the dump end
+        for response in self.kernel.request(bytes(data)):
+            if not response:
+                continue
+            with self.cond:
+                if len(response) > 1 and self.dump:
+                    # one dump at a time
+                    self.dump.extend(response)
+                    continue
+                self.push(response[0])
+                self.dump.extend(response[1:])
+        return len(data)
+
+    send = sendto
+
+    def recv(self, bufsize, flags=0):
+        with self.cond:
+            if not self.queue and self.dump:
+                data = self.dump.popleft()
+                self.queue.append(data)
+                self.queued += len(data)
+            while not self.queue and not self.overflow:
+                if self.closed:
+                    raise OSError(errno.EBADF, 'socket closed')
+                self.cond.wait()
+            if self.overflow:
+                self.overflow = False
+                raise OSError(errno.ENOBUFS, 'no buffer space available')
+            if flags & MSG_PEEK:
+                return self.queue[0][:bufsize]
+            data = self.queue.popleft()
+            self.queued -= len(data)
+            return data[:bufsize]
+
+    def recv_into(self, buf, nbytes=0, flags=0):
+        nbytes = nbytes or len(buf)
+        data = self.recv(1 << 30, flags & MSG_PEEK)
+        size = min(len(data), nbytes)
+        buf[:size] = data[:size]
+        if flags & MSG_TRUNC:
+            return len(data)
+        return size
+
+    def bind(self, addr):
+        self.addr = addr
+        self.groups = addr[1]
+
+    def getsockname(self):
+        return (self.addr[0], self.groups)
+
+    def setsockopt(self, level, option, value):
+        if level == SOL_NETLINK and option == NETLINK_ADD_MEMBERSHIP:
+            self.groups |= 1 << (value - 1)
+        elif level == SOL_NETLINK and option == NETLINK_DROP_MEMBERSHIP:
+            self.groups &= ~(1 << (value - 1))
+        elif level == SOL_SOCKET and option == 33:
+            # SO_RCVBUFFORCE
+            self.options[(level, SO_RCVBUF)] = value
+        else:
+            self.options[(level, option)] = value
+
+    def getsockopt(self, level, option, *argv):
+        # the kernel doubles the buffers size
+        return self.options.get((level, option), 0) * 2
+
+    def fileno(self):
+        return -1
+
+    def setblocking(self, *argv):
+        pass
+
+    def settimeout(self, *argv):
+        pass
+
+    def gettimeout(self):
+        return None
+
+    def close(self):
+        self.kernel.disconnect(self)
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+class SimulatorMixin(object):
+    '''
+    Simulated socket mixin, must precede the socket class::
+
+        class SimIPRoute(SimulatorMixin, RawIPRoute):
+            pass
+
+    Parameters:
+
+    * kernel -- the `Kernel()` to connect to, a new one by default
+    '''
+
+    def __init__(self, *argv, **kwarg):
+        self.kernel = kwarg.pop('kernel', None) or Kernel()
+        super(SimulatorMixin, self).__init__(*argv, **kwarg)
+
+    def post_init(self):
+        with self.sys_lock:
+            if self._sock is not None:
+                self._sock.close()
+            self._sock = SimSocket(self.kernel)
+            self.sendto_gate = self._gate
+            self.setsockopt(SOL_SOCKET, SO_SNDBUF, self._sndbuf)
+            self.setsockopt(SOL_SOCKET, SO_RCVBUF, self._rcvbuf)
+
+    def clone(self):
+        return type(self)(kernel=self.kernel)
+
+    def bind(self, *argv, **kwarg):
+        # no threads to poll the simulated socket
+        kwarg['async_cache'] = False
+        kwarg.pop('async', None)
+        return super(SimulatorMixin, self).bind(*argv, **kwarg)
@@ -311,6 +311,8 @@ class RemoteSocket(NetlinkMixin):
             del kwarg['async']
         # do not work with async servers
         kwarg['async_cache'] = False
+        # the server forwards raw data, so resync can not work
+        kwarg.pop('resync', None)
         return self.proxy('bind', *argv, **kwarg)
 
     def send(self, *argv, **kwarg):
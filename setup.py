@@ -63,6 +63,8 @@ setup(name='pyroute2',
                 'pyroute2.remote'],
       scripts=['./cli/ss2',
                './cli/pyroute2-cli'],
+      # Columns.to_numpy(), see pyroute2.netlink.columns
+      extras_require={'numpy': ['numpy']},
       classifiers=['License :: OSI Approved :: GNU General Public ' +
                    'License v2 or later (GPLv2+)',
                    'License :: OSI Approved :: Apache Software License',
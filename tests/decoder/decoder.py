@@ -10,17 +10,18 @@ Sample::
     ./decoder.py pyroute2.netlink.nl80211.nl80211cmd ./nl80211.data
 
 Module is a name within rtnl hierarchy. File should be a
-binary data in the escaped string format (see samples).
+binary data in the escaped string format (see samples), or
+a pcap recording, see `pyroute2.netlink.capture`.
 '''
 import sys
 from pprint import pprint
 from importlib import import_module
 from pyroute2.common import load_dump
 from pyroute2.common import hexdump
+from pyroute2.netlink.capture import load_pcap
 
 mod = sys.argv[1]
 mod = mod.replace('/', '.')
-f = open(sys.argv[2], 'r')
 s = mod.split('.')
 package = '.'.join(s[:-1])
 module = s[-1]
@@ -28,7 +29,12 @@ m = import_module(package)
 met = getattr(m, module)
 
 
-data = load_dump(f)
+if sys.argv[2].endswith('.pcap'):
+    # all the received datagrams
+    data = b''.join([x[3] for x in load_pcap(sys.argv[2]) if not x[1]])
+else:
+    with open(sys.argv[2], 'r') as f:
+        data = load_dump(f)
 
 offset = 0
 inbox = []
@@ -0,0 +1,61 @@
+import sys
+from pyroute2 import IPRoute
+from nose.plugins.skip import SkipTest
+
+
+class TestAsyncIPRoute(object):
+
+    def setup(self):
+        if sys.version_info < (3, 6):
+            raise SkipTest('asyncio API requires Python 3.6+')
+        import asyncio
+        from pyroute2.iproute.aio import AsyncIPRoute
+        self.asyncio = asyncio
+        self.loop = asyncio.new_event_loop()
+        self.ipr = AsyncIPRoute(loop=self.loop)
+
+    def teardown(self):
+        self.ipr.close()
+        self.loop.close()
+
+    def run(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def test_link_lookup(self):
+        assert self.run(self.ipr.link_lookup(ifname='lo')) == [1]
+
+    def test_dump(self):
+        with IPRoute() as ipr:
+            links = [x.get_attr('IFLA_IFNAME') for x in ipr.get_links()]
+        ret = self.run(self.ipr.get_links())
+        assert [x.get_attr('IFLA_IFNAME') for x in ret] == links
+
+    def test_stream(self):
+        ret = []
+        stream = self.ipr.get_addr(index=1).__aiter__()
+        while True:
+            try:
+                ret.append(self.run(stream.__anext__())['index'])
+            except StopAsyncIteration:
+                break
+        assert ret
+        assert set(ret) == set((1, ))
+
+    def test_concurrent(self):
+        calls = [self.ipr.link('get', index=1) for _ in range(64)] + \
+            [self.ipr.get_links() for _ in range(8)]
+        calls = [self.asyncio.ensure_future(x, loop=self.loop)
+                 for x in calls]
+        ret = self.run(self.asyncio.gather(*calls))
+        assert len(ret) == 72
+        assert all([x[0].get_attr('IFLA_IFNAME') == 'lo'
+                    for x in ret[:64]])
+        assert len(set([len(x) for x in ret[64:]])) == 1
+
+    def test_error(self):
+        try:
+            self.run(self.ipr.link('get', index=0x7fffffff))
+        except Exception as e:
+            assert e.code == 19
+        else:
+            raise AssertionError('expected ENODEV')
@@ -116,6 +116,32 @@ class TestMisc(object):
         for i in range(100):
             self.ip.get_addr()
 
+    def test_pipeline(self):
+        links = [x.get_attr('IFLA_IFNAME') for x in self.ip.get_links()]
+        with self.ip.pipeline() as pipe:
+            for _ in range(10):
+                pipe.link('get', index=1)
+            pipe.link('get', index=0x7fffffff)
+            pipe.get_links()
+        assert len(pipe.results) == 12
+        assert all([x[0].get_attr('IFLA_IFNAME') == 'lo'
+                    for x in pipe.results[:10]])
+        assert isinstance(pipe.results[10], NetlinkError)
+        assert pipe.results[10].code == errno.ENODEV
+        assert [x.get_attr('IFLA_IFNAME') for x in pipe.results[11]] == links
+
+    def test_strict_dump(self):
+        def dump():
+            return [(x['index'], x.get_attr('IFA_ADDRESS'))
+                    for x in self.ip.get_addr(index=1)]
+        self.ip.strict_check = None
+        strict = dump()
+        self.ip.strict_check = False
+        regular = dump()
+        assert strict
+        assert strict == regular
+        assert not tuple(self.ip.get_addr(index=0x7fffffff))
+
     def test_nla_compare(self):
         lvalue = self.ip.get_links()
         rvalue = self.ip.get_links()
@@ -1,5 +1,18 @@
+import struct
+import pickle
+from pyroute2 import config
 from pyroute2.common import load_dump
 from pyroute2.netlink import nlmsg
+from pyroute2.netlink import cache_jit
+from pyroute2.netlink import compile_struct
+from pyroute2.netlink import compile_encoder
+from pyroute2.netlink import nla_slot
+from pyroute2.netlink.columns import Columns
+from pyroute2.netlink.rtnl import RTM_NEWLINK
+from pyroute2.netlink.rtnl import RTM_NEWROUTE
+from pyroute2.netlink.rtnl.ifaddrmsg import ifaddrmsg
+from pyroute2.netlink.rtnl.ifinfmsg import ifinfmsg
+from pyroute2.netlink.rtnl.rtmsg import rtmsg
 from pyroute2.netlink.rtnl.iprsocket import MarshalRtnl
 from pyroute2.netlink.nl80211 import MarshalNl80211
 
@@ -32,6 +45,36 @@ class TestAttrs(object):
         assert self.msg.get_nested('B', 'D', 'G') is None
         assert self.msg.get_nested('C', 'D', 'E') is None
 
+    def test_attrs_index(self):
+        index = self.msg.get_attrs_index()
+        assert index is self.msg.get_attrs_index()
+        assert [x[1] for x in index['A']] == [2, 3, 4]
+        # the index is dropped when the chain changes
+        self.msg['attrs'].append(['G', 8])
+        assert self.msg.get_attr('G') == 8
+        self.msg.strip('A')
+        assert self.msg.get_attr('A') is None
+        self.msg['attrs'] = [['A', 9]]
+        assert self.msg.get_attrs('A') == [9]
+        # in place changes require an explicit reset
+        self.msg['attrs'][0] = ['A', 10]
+        self.msg.reset_attrs_index()
+        assert self.msg.get_attr('A') == 10
+
+    def test_attrs_index_encode(self):
+        msg = rtmsg()
+        msg['family'] = 2
+        msg['attrs'] = [['RTA_DST', '10.0.0.1'], ['RTA_OIF', 2]]
+        assert msg.get_attr('RTA_DST') == '10.0.0.1'
+        # an in place change is picked up after encode()
+        msg['attrs'][0] = ['RTA_DST', '10.0.0.2']
+        msg.encode()
+        assert msg.get_attr('RTA_DST') == '10.0.0.2'
+        assert msg.get_attr('RTA_OIF') == 2
+        # and after decode()
+        msg.decode()
+        assert msg.get_attr('RTA_DST') == '10.0.0.2'
+
 
 class TestNL(object):
 
@@ -70,6 +113,147 @@ class TestRtnl(TestNL):
         self.load_data(fname='decoder/gre_01', packets=2)
 
 
+class TestZeroCopy(TestNL):
+
+    marshal = MarshalRtnl
+
+    def test_gre(self):
+        with open('decoder/gre_01', 'r') as f:
+            data = bytearray(load_dump(f))
+        m = self.marshal()
+        m.zerocopy = True
+        pkts = m.parse(data)
+        assert all([isinstance(x.data, memoryview) for x in pkts])
+        assert pkts == self.marshal().parse(data)
+        linkinfo = pkts[0].get_attr('IFLA_LINKINFO')
+        for msg in pkts:
+            msg.release()
+            assert isinstance(msg.data, bytearray)
+            assert msg.offset == 0
+        assert not isinstance(linkinfo.data, memoryview)
+        assert pkts == self.marshal().parse(data)
+
+
+class TestProjection(TestNL):
+
+    marshal = MarshalRtnl
+
+    def test_gre(self):
+        with open('decoder/gre_01', 'r') as f:
+            data = load_dump(f)
+        seq = struct.unpack_from('I', data, 8)[0]
+        names = frozenset(('IFLA_IFNAME', 'IFLA_LINKINFO'))
+        pkts = self.marshal().parse(data, seq, None, names)
+        full = self.marshal().parse(data)
+        assert set([x[0] for x in pkts[0]['attrs']]) == names
+        assert pkts[0].get_attr('IFLA_IFNAME') == \
+            full[0].get_attr('IFLA_IFNAME')
+        assert pkts[0].get_attr('IFLA_MTU') is None
+        # other sequence numbers are not filtered
+        pkts = self.marshal().parse(data, seq + 1, None, names)
+        assert pkts == full
+
+
+class TestPrefilter(TestNL):
+
+    marshal = MarshalRtnl
+
+    def test_gre(self):
+        with open('decoder/gre_01', 'r') as f:
+            data = load_dump(f)
+        marshal = self.marshal()
+        full = marshal.parse(data)
+        for (spec, count) in (({'type': RTM_NEWLINK}, 2),
+                              ({'type': RTM_NEWROUTE}, 1),
+                              ({'type': RTM_NEWLINK, 'ifindex': 0}, 2),
+                              ({'index': (1, 2)}, 1),
+                              ({'family': 0}, 2),
+                              # ifinfmsg has no such field
+                              ({'table': 254}, 1)):
+            prefilter = marshal.compile_prefilter(spec)
+            msgs = marshal.parse(data, prefilter=prefilter)
+            assert len(msgs) == count
+            # NLMSG_ERROR is never dropped
+            assert msgs[-1]['header']['type'] == full[-1]['header']['type']
+            if count == 2:
+                assert msgs == full
+
+
+class TestRecord(TestNL):
+
+    marshal = MarshalRtnl
+
+    def test_gre(self):
+        with open('decoder/gre_01', 'r') as f:
+            data = load_dump(f)
+        msg = self.marshal().parse(data)[0]
+        record = msg.record()
+        assert record['index'] == msg['index']
+        assert record.index == msg['index']
+        assert record['event'] == msg['event']
+        assert record['header']['type'] == msg['header']['type']
+        assert record.ifname == msg.get_attr('IFLA_IFNAME')
+        assert record.get_attr('IFLA_IFNAME') == msg.get_attr('IFLA_IFNAME')
+        assert record.get_attr('IFLA_WEIGHT') is None
+        assert record.weight is None
+        # nested NLA are decoded on access
+        assert isinstance(record._attrs[-1][1], bytes)
+        linkinfo = record.get_attr('IFLA_LINKINFO')
+        assert linkinfo == msg.get_attr('IFLA_LINKINFO')
+        assert record.dump()['attrs'] == msg.dump()['attrs']
+        assert pickle.loads(pickle.dumps(record)).dump() == record.dump()
+        try:
+            record.index = 0
+        except AttributeError:
+            pass
+        else:
+            raise AssertionError('records must be read-only')
+
+
+class TestColumns(TestNL):
+
+    marshal = MarshalRtnl
+
+    def test_gre(self):
+        with open('decoder/gre_01', 'r') as f:
+            data = load_dump(f)
+        seq = struct.unpack_from('I', data, 8)[0]
+        names = ['index', 'ifname', 'mtu', 'linkinfo']
+        columns = Columns(ifinfmsg, RTM_NEWLINK, names)
+        msgs = self.marshal().parse(data, seq, None, None, columns)
+        full = self.marshal().parse(data)
+        # the link message is decoded into columns only
+        assert len(msgs) == len(full) - 1
+        assert len(columns) == 1
+        assert columns['index'].tolist() == [full[0]['index']]
+        assert columns['ifname'] == [full[0].get_attr('IFLA_IFNAME')]
+        # missing integer NLA
+        assert full[0].get_attr('IFLA_MTU') is None
+        assert columns['mtu'].tolist() == [0]
+        assert columns['linkinfo'] == \
+            [full[0].get_attr('IFLA_LINKINFO').dump()]
+
+
+class TestJit(TestNL):
+
+    marshal = MarshalRtnl
+
+    def teardown(self):
+        config.nlm_jit = True
+        cache_jit.clear()
+
+    def test_gre(self):
+        with open('decoder/gre_01', 'r') as f:
+            data = load_dump(f)
+        pkts = self.marshal().parse(data)
+        assert pkts[0]._ft_jit is not None
+        config.nlm_jit = False
+        cache_jit.clear()
+        generic = self.marshal().parse(data)
+        assert generic[0]._ft_jit is None
+        assert repr(pkts) == repr(generic)
+
+
 class TestNl80211(TestNL):
 
     marshal = MarshalNl80211
@@ -79,3 +263,111 @@ class TestNl80211(TestNL):
 
     def _test_iw_scan(self):
         self.load_data(fname='decoder/iw_scan_rsp', packets=4)
+
+
+class TestStruct(object):
+
+    def test_compile_native(self):
+        codec, layout = compile_struct((('length', 'I'),
+                                        ('type', 'H'),
+                                        ('__pad', '2x'),
+                                        ('mac', '6s'),
+                                        ('stats', '3L')))
+        assert codec.size == 4 + 2 + 2 + 6 + 3 * struct.calcsize('L')
+        assert layout == (('length', 0, 1),
+                          ('type', 1, 1),
+                          ('__pad', 2, 0),
+                          ('mac', 2, 1),
+                          ('stats', 3, 3))
+
+    def test_compile_byte_order(self):
+        codec, layout = compile_struct((('family', 'B'),
+                                        ('port', '>H'),
+                                        ('addr', '>I')))
+        assert codec.format in ('>BHI', b'>BHI')
+        assert compile_struct((('a', 'H'), ('b', '>H'))) is None
+        assert compile_struct((('value', 's'), )) is None
+
+    def test_roundtrip(self):
+        msg = ifaddrmsg()
+        msg['family'] = 2
+        msg['prefixlen'] = 24
+        msg['index'] = 3
+        msg['attrs'] = [['IFA_ADDRESS', '10.0.0.1'],
+                        ['IFA_LABEL', 'eth0']]
+        msg['header']['type'] = 20
+        msg['header']['sequence_number'] = 42
+        msg.encode()
+        assert msg['header']['length'] == len(msg.data)
+        ret = ifaddrmsg(msg.data)
+        ret.decode()
+        assert ret['header']['sequence_number'] == 42
+        assert ret['prefixlen'] == 24
+        assert ret['index'] == 3
+        assert ret.get_attr('IFA_ADDRESS') == '10.0.0.1'
+        assert ret.get_attr('IFA_LABEL') == 'eth0'
+
+
+class TestEncoder(object):
+
+    def test_compile(self):
+        assert compile_encoder(rtmsg.uint32) is not None
+        assert compile_encoder(rtmsg.target) is not None
+        assert compile_encoder(rtmsg.metrics) is None
+        assert compile_encoder(rtmsg.uint32)(None, 0x100) == \
+            struct.pack('I', 0x100)
+        assert compile_encoder(rtmsg.uint32)(None, [1]) is None
+
+    def test_roundtrip(self):
+        msg = rtmsg()
+        msg['family'] = 2
+        msg['dst_len'] = 24
+        msg['attrs'] = [['RTA_DST', '10.0.0.0'],
+                        ['RTA_GATEWAY', '10.0.0.1'],
+                        ['RTA_OIF', 2],
+                        ['RTA_METRICS', {'attrs': [['RTAX_MTU', 1400]]}]]
+        msg.encode()
+        parsed = rtmsg(msg.data)
+        parsed.decode()
+        assert parsed['header']['length'] == len(msg.data)
+        assert parsed.get_attr('RTA_DST') == '10.0.0.0'
+        assert parsed.get_attr('RTA_GATEWAY') == '10.0.0.1'
+        assert parsed.get_attr('RTA_OIF') == 2
+        assert parsed.get_attr('RTA_METRICS').get_attr('RTAX_MTU') == 1400
+
+    def test_slots(self):
+        msg = rtmsg()
+        msg['family'] = 2
+        msg['attrs'] = [['RTA_DST', '10.0.0.0'],
+                        ('RTA_OIF', 2, 0x8000),
+                        ['RTA_METRICS', {'attrs': [['RTAX_MTU', 1400]]}]]
+        msg.encode()
+        # simple NLA cells look like the object encoded ones
+        for cell in msg['attrs']:
+            assert isinstance(cell, nla_slot)
+        assert msg['attrs'][0].get_flags() == 0
+        assert msg['attrs'][1].get_flags() == 0x8000
+        assert msg['attrs'][0][1] == '10.0.0.0'
+        assert msg['attrs'][1][0:2] == ['RTA_OIF', 2]
+        assert msg['attrs'][0].try_to_decode()
+        assert msg['attrs'][0].cell[1]['header']['length'] == 8
+        assert msg.get_attr('RTA_OIF') == 2
+        assert msg.get_attr('RTA_METRICS').get_attr('RTAX_MTU') == 1400
+        assert repr(msg['attrs'][1]) == repr(('RTA_OIF', 2, 0x8000))
+
+    def test_reencode(self):
+        msg = ifinfmsg()
+        msg['index'] = 1
+        msg['attrs'] = [['IFLA_IFNAME', 'eth0'],
+                        ['IFLA_MTU', 1500]]
+        msg.encode()
+        data = bytes(msg.data)
+        # the same message is sent again, e.g. on EBUSY
+        msg.reset()
+        msg.encode()
+        assert bytes(msg.data) == data
+        msg.reset()
+        msg.encode()
+        assert bytes(msg.data) == data
+        assert msg.get_attr('IFLA_IFNAME') == 'eth0'
+        assert msg.get_attr('IFLA_MTU') == 1500
@@ -0,0 +1,15 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def nose_fixtures(request):
+    # the tests are written for nose: run the class level
+    # setup() / teardown() under pytest as well
+    instance = request.instance
+    setup = getattr(instance, 'setup', None)
+    teardown = getattr(instance, 'teardown', None)
+    if setup is not None:
+        setup()
+    yield
+    if teardown is not None:
+        teardown()
@@ -0,0 +1,99 @@
+import io
+import socket
+from pyroute2.netlink import NLM_F_DUMP
+from pyroute2.netlink import NLM_F_MULTI
+from pyroute2.netlink import NLM_F_REQUEST
+from pyroute2.netlink import NLMSG_DONE
+from pyroute2.netlink import NETLINK_ROUTE
+from pyroute2.netlink import nlmsg
+from pyroute2.netlink import rtnl
+from pyroute2.netlink.capture import CaptureSocket
+from pyroute2.netlink.capture import PcapWriter
+from pyroute2.netlink.capture import load_pcap
+from pyroute2.netlink.rtnl.ifinfmsg import ifinfmsg
+from pyroute2.iproute.linux import ReplayIPRoute
+
+
+def link(index, ifname, seq=0, msg_type=rtnl.RTM_NEWLINK):
+    msg = ifinfmsg()
+    msg['header']['type'] = msg_type
+    msg['header']['sequence_number'] = seq
+    msg['header']['flags'] = NLM_F_MULTI if seq else 0
+    msg['index'] = index
+    msg['attrs'] = [['IFLA_IFNAME', ifname]]
+    msg.encode()
+    return bytes(msg.data)
+
+
+def done(seq):
+    msg = nlmsg()
+    msg['header']['type'] = NLMSG_DONE
+    msg['header']['sequence_number'] = seq
+    msg['header']['flags'] = NLM_F_MULTI
+    msg.encode()
+    return bytes(msg.data)
+
+
+def recording():
+    f = io.BytesIO()
+    writer = PcapWriter(f)
+    request = ifinfmsg()
+    request['header']['type'] = rtnl.RTM_GETLINK
+    request['header']['flags'] = NLM_F_REQUEST | NLM_F_DUMP
+    request['header']['sequence_number'] = 1000
+    request.encode()
+    writer.write(link(1, 'lo'), NETLINK_ROUTE, ts=1.0)
+    writer.write(request.data, NETLINK_ROUTE, outgoing=True, ts=2.0)
+    writer.write(link(1, 'lo', 1000) + link(2, 'eth0', 1000),
+                 NETLINK_ROUTE, ts=2.1)
+    writer.write(done(1000), NETLINK_ROUTE, ts=2.2)
+    writer.write(link(2, 'eth0', msg_type=rtnl.RTM_DELLINK),
+                 NETLINK_ROUTE, ts=3.0)
+    writer.close()
+    f.seek(0)
+    return f
+
+
+class TestCapture(object):
+
+    def test_load(self):
+        records = load_pcap(recording())
+        assert len(records) == 5
+        assert [x[1] for x in records] == [False, True, False, False, False]
+        assert records[0][0] == 1.0
+        assert records[0][2] == NETLINK_ROUTE
+        assert records[0][3] == link(1, 'lo')
+
+    def test_capture(self):
+        rx, tx = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        f = io.BytesIO()
+        sock = CaptureSocket(rx, PcapWriter(f), NETLINK_ROUTE)
+        try:
+            tx.send(link(1, 'lo'))
+            buf = bytearray(1024)
+            assert sock.recv_into(buf, 1024, socket.MSG_PEEK) > 0
+            length = sock.recv_into(buf, 1024)
+            sock.send(link(2, 'eth0'))
+            assert tx.recv(1024) == link(2, 'eth0')
+        finally:
+            rx.close()
+            tx.close()
+        f.seek(0)
+        records = load_pcap(f)
+        assert len(records) == 2
+        assert records[0][1:] == (False, NETLINK_ROUTE, bytes(buf[:length]))
+        assert records[1][1:] == (True, NETLINK_ROUTE, link(2, 'eth0'))
+
+    def test_replay(self):
+        with ReplayIPRoute(replay=recording()) as ipr:
+            ipr.bind()
+            # the broadcast, recorded before the request
+            assert ipr.get()[0].get_attr('IFLA_IFNAME') == 'lo'
+            # the recorded response with a new sequence number
+            links = ipr.get_links()
+            assert [x.get_attr('IFLA_IFNAME') for x in links] == \
+                ['lo', 'eth0']
+            # no recorded requests -- empty response
+            assert not ipr.get_links()
+            assert ipr.get()[0]['header']['type'] == rtnl.RTM_DELLINK
+            assert ipr.wait(1)
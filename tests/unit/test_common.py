@@ -107,6 +107,44 @@ class TestAddrPool(object):
         except KeyError:
             pass
 
+    def test_ban(self):
+
+        ap = AddrPool(minaddr=1, maxaddr=1024)
+        f = ap.alloc()
+        ap.free(f, ban=3)
+        allocated = [ap.alloc() for i in range(3)]
+        assert f not in allocated
+        assert ap.alloc() == f
+        assert ap.allocated == 4
+
+    def test_ban_long(self):
+
+        ap = AddrPool(minaddr=1, maxaddr=1024)
+        f = ap.alloc()
+        ap.free(f, ban=ap.wheel_size * 2)
+        for i in range(ap.wheel_size * 2):
+            assert ap.alloc() != f
+        assert ap.alloc() == f
+
+    def test_reuse_fifo(self):
+
+        ap = AddrPool(minaddr=1, maxaddr=3)
+        f = [ap.alloc() for i in range(3)]
+        ap.free(f[2])
+        ap.free(f[0])
+        assert ap.alloc() == f[2]
+        assert ap.alloc() == f[0]
+
+    def test_setaddr_skip(self):
+
+        ap = AddrPool(minaddr=1, maxaddr=1024)
+        f = ap.alloc()
+        ap.setaddr(f + 1, 'allocated')
+        assert ap.alloc() == f + 2
+        ap.free(f)
+        ap.setaddr(f, 'allocated')
+        assert ap.alloc() == f + 3
+
 
 class TestCommon(object):
 
@@ -0,0 +1,349 @@
+import errno
+import pickle
+from socket import AF_INET
+from pyroute2.iproute.linux import IPBulk
+from pyroute2.iproute.linux import compile_match
+from pyroute2.iproute.linux import match_prefilter
+from pyroute2.iproute.linux import SimIPRoute
+from pyroute2.netlink.rtnl.rtmsg import rtmsg
+
+
+def routes(count, **kwarg):
+    for i in range(count):
+        spec = {'dst': '10.%i.%i.0/24' % (i >> 8, i & 0xff)}
+        spec.update(kwarg)
+        yield spec
+
+
+class TestRouteBulk(object):
+
+    def setup(self):
+        self.ipr = SimIPRoute()
+        self.ipr.link('add', ifname='t0', kind='dummy')
+        self.index = self.ipr.link_lookup(ifname='t0')[0]
+
+    def teardown(self):
+        self.ipr.close()
+
+    def test_add_del(self):
+        result = self.ipr.route_bulk('add', routes(1000, oif=self.index))
+        assert result.total == result.success == 1000
+        assert not result.errors
+        assert len(self.ipr.get_routes(oif=self.index)) == 1000
+        result = self.ipr.route_bulk('del', routes(1000, oif=self.index))
+        assert result.success == 1000
+        assert not self.ipr.get_routes(oif=self.index)
+        # all the sequence numbers are released
+        assert not [x for x in self.ipr.backlog if x != 0]
+
+    def test_errors(self):
+        self.ipr.route('add', dst='10.0.5.0/24', oif=self.index)
+        self.ipr.route('add', dst='10.1.0.0/24', oif=self.index)
+        for ack in (True, False):
+            result = self.ipr.route_bulk('add',
+                                         routes(257, oif=self.index),
+                                         chunk=1024,
+                                         ack=ack)
+            if ack:
+                assert sorted(result.errors) == [5, 256]
+            else:
+                # now all the routes exist
+                assert result.failed == 257
+            assert result.codes()[errno.EEXIST] == result.failed
+            assert result.errors[256].code == errno.EEXIST
+
+    def test_no_ack(self):
+        bulk = IPBulk(self.ipr, chunk=4096, ack=False)
+        for spec in routes(300, oif=self.index):
+            bulk.route('add', **spec)
+        result = bulk.commit()
+        assert result.success == 300
+        assert len(self.ipr.get_routes(oif=self.index)) == 300
+
+    def test_dump(self):
+        bulk = IPBulk(self.ipr)
+        try:
+            bulk.route('dump')
+        except ValueError:
+            pass
+        else:
+            raise AssertionError('exception expected')
+
+
+class TestPipeline(object):
+
+    def test_sendto(self):
+        ipr = SimIPRoute()
+        sendto = ipr.sendto
+        sent = []
+
+        def check(data, addr):
+            # remote sockets pickle the data
+            sent.append(pickle.loads(pickle.dumps(data)))
+            return sendto(data, addr)
+
+        ipr.sendto = check
+        try:
+            with ipr.pipeline() as pipe:
+                pipe.link('add', ifname='t0', kind='dummy')
+                pipe.get_links()
+            assert len(sent) == 2
+            assert not [x for x in pipe.results
+                        if isinstance(x, Exception)]
+            assert ipr.link_lookup(ifname='t0')
+        finally:
+            ipr.close()
+
+
+class TestFlush(object):
+
+    def setup(self):
+        self.ipr = SimIPRoute()
+        self.ipr.link('add', ifname='t0', kind='dummy')
+        self.index = self.ipr.link_lookup(ifname='t0')[0]
+        self.ipr.link('set', index=self.index, state='up')
+        self.ipr.addr('add', index=self.index, address='10.255.0.1', mask=24)
+        self.ipr.route_bulk('add', routes(1000,
+                                          table=100,
+                                          gateway='10.255.0.2'))
+        self.ipr.route_bulk('add', routes(1000,
+                                          table=101,
+                                          gateway='10.255.0.3'))
+
+    def teardown(self):
+        self.ipr.close()
+
+    def test_routes(self):
+        # small chunks: the deletes are sent during the dump
+        result = self.ipr.flush_routes(gateway='10.255.0.2',
+                                       bulk=True,
+                                       chunk=4096)
+        assert result.total == result.success == 1000
+        assert not self.ipr.get_routes(table=100)
+        assert len(self.ipr.get_routes(table=101)) == 1000
+        result = self.ipr.flush_routes(table=101, bulk=True)
+        assert result.success == 1000
+        assert not self.ipr.get_routes(table=101)
+        assert not [x for x in self.ipr.backlog if x != 0]
+        # the old API
+        self.ipr.route_bulk('add', routes(10, table=100, oif=self.index))
+        assert len(self.ipr.flush_routes(table=100)) == 10
+
+    def test_match(self):
+        result = self.ipr.flush_routes(
+            match=lambda x: x.get_attr('RTA_TABLE') == 101,
+            bulk=True)
+        assert result.success == 1000
+        assert not self.ipr.get_routes(gateway='10.255.0.3')
+        assert len(self.ipr.get_routes(gateway='10.255.0.2')) == 1000
+
+    def test_errors(self):
+        other = SimIPRoute(kernel=self.ipr.kernel)
+
+        def match(msg):
+            # delete the route before the flush does
+            if msg.get_attr('RTA_DST') == '10.0.7.0' and \
+                    msg.get_attr('RTA_TABLE') == 100:
+                other.route('del', table=100, dst='10.0.7.0/24')
+            return msg.get_attr('RTA_TABLE') in (100, 101)
+
+        try:
+            result = self.ipr.flush_routes(match=match, bulk=True)
+        finally:
+            other.close()
+        assert result.success == 1999
+        assert list(result.codes()) == [errno.ESRCH]
+        for (index, error) in result.errors.items():
+            assert result.requests[index].get_attr('RTA_DST') == '10.0.7.0'
+        assert not self.ipr.get_routes(table=100)
+        assert not self.ipr.get_routes(table=101)
+
+    def test_addr(self):
+        self.ipr.addr('add', index=self.index, address='10.254.0.1', mask=24)
+        result = self.ipr.flush_addr(index=self.index, bulk=True)
+        assert result.success == 2
+        assert not self.ipr.get_addr(index=self.index)
+        assert self.ipr.get_addr(index=1)
+
+
+class TestSyncRoutes(object):
+
+    def setup(self):
+        self.ipr = SimIPRoute()
+        self.ipr.link('add', ifname='t0', kind='dummy')
+        self.index = self.ipr.link_lookup(ifname='t0')[0]
+        self.ipr.link('set', index=self.index, state='up')
+        self.ipr.addr('add', index=self.index, address='10.255.0.1', mask=24)
+        self.desired = list(routes(100, gateway='10.255.0.2'))
+        self.desired.append({'dst': '10.254.0.0/24',
+                             'multipath': [{'gateway': '10.255.0.2'},
+                                           {'gateway': '10.255.0.3'}]})
+
+    def teardown(self):
+        self.ipr.close()
+
+    def test_sync(self):
+        ret = self.ipr.sync_routes(self.desired)
+        assert len(ret['add']) == 101
+        assert not ret['errors']
+        # the specs are not changed
+        assert self.desired[-1]['multipath'][0] == {'gateway': '10.255.0.2'}
+        ret = self.ipr.sync_routes(self.desired)
+        assert ret['unchanged'] == 101
+        assert not (ret['add'] or ret['replace'] or ret['delete'])
+        # ECMP next hops are compared as a set
+        self.desired[-1]['multipath'].reverse()
+        self.desired[0]['gateway'] = '10.255.0.3'
+        ret = self.ipr.sync_routes(self.desired)
+        assert ret['unchanged'] == 100
+        assert [x['dst'] for x in ret['replace']] == ['10.0.0.0/24']
+        route = self.ipr.get_routes(gateway='10.255.0.3')[0]
+        assert route.get_attr('RTA_DST') == '10.0.0.0'
+        ret = self.ipr.sync_routes(self.desired[1:])
+        assert len(ret['delete']) == 1
+        assert not self.ipr.get_routes(gateway='10.255.0.3')
+
+    def test_proto(self):
+        self.ipr.route('add', dst='10.253.0.0/24', oif=self.index,
+                       proto='boot')
+        self.ipr.sync_routes(self.desired)
+        ret = self.ipr.sync_routes([])
+        assert len(ret['delete']) == 101
+        # routes of other protocols are not touched
+        assert len(self.ipr.get_routes(table=254, oif=self.index)) == 1
+
+    def test_hop_oif(self):
+        # the kernel reports the resolved device of every hop
+        self.ipr.route('add', dst='10.254.0.0/24', proto='static',
+                       multipath=[{'gateway': '10.255.0.3',
+                                   'oif': self.index},
+                                  {'gateway': '10.255.0.2',
+                                   'oif': self.index}])
+        ret = self.ipr.sync_routes(self.desired[-1:], dry_run=True)
+        assert ret['unchanged'] == 1
+        assert not (ret['add'] or ret['replace'] or ret['delete'])
+        # fields, that are set in the spec, are compared
+        self.desired[-1]['multipath'][0]['oif'] = 1
+        ret = self.ipr.sync_routes(self.desired[-1:], dry_run=True)
+        assert len(ret['replace']) == 1
+        self.desired[-1]['multipath'][0]['oif'] = self.index
+        ret = self.ipr.sync_routes(self.desired[-1:], dry_run=True)
+        assert ret['unchanged'] == 1
+
+    def test_delete_spec(self):
+        self.ipr.route('add', dst='10.253.0.0/24', type='blackhole',
+                       proto='static')
+        ret = self.ipr.sync_routes([], dry_run=True)
+        assert len(ret['delete']) == 1
+        assert ret['delete'][0]['proto'] == 4
+        assert ret['delete'][0]['type'] == 6
+        ret = self.ipr.sync_routes([])
+        assert not ret['errors']
+        assert not self.ipr.get_routes(table=254, type=6)
+
+    def test_family(self):
+        desired = self.desired + [{'dst': 'fd00::/64',
+                                   'gateway': 'fd00::1'}]
+        try:
+            self.ipr.sync_routes(desired, family=AF_INET)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError('exception expected')
+        assert not self.ipr.get_routes(gateway='10.255.0.2')
+        ret = self.ipr.sync_routes(self.desired, family=AF_INET)
+        assert len(ret['add']) == 101
+
+    def test_dry_run(self):
+        ret = self.ipr.sync_routes(self.desired, dry_run=True)
+        assert len(ret['add']) == 101
+        assert not self.ipr.get_routes(gateway='10.255.0.2')
+
+
+class TestLinkLookup(object):
+
+    def setup(self):
+        self.ipr = SimIPRoute()
+        self.ipr.link('add', ifname='br0', kind='bridge')
+        self.ipr.link('add', ifname='t0', kind='dummy', master=2)
+
+    def teardown(self):
+        self.ipr.close()
+
+    def test_name(self):
+        assert self.ipr.link_lookup(ifname='t0') == [3]
+        assert self.ipr.link_lookup(alt_ifname='br0') == [2]
+        assert self.ipr.link_lookup(ifname='t1') == []
+        assert self.ipr.link_lookup(ifname=None) == []
+
+    def test_dump(self):
+        assert self.ipr.link_lookup(kind='dummy') == [3]
+        assert self.ipr.link_lookup(master=2) == [3]
+        assert self.ipr.link_lookup(address='02:00:00:00:00:02') == [2]
+        assert self.ipr.link_lookup(operstate='UP') == [1]
+
+    def test_index(self):
+        self.ipr.bind(link_index=True)
+        index = self.ipr.link_index
+        assert index.lookup('ifname', 'br0') == [2]
+        assert self.ipr.link_lookup(kind='bridge') == [2]
+        assert self.ipr.link_lookup(master=2) == [3]
+        # own changes are seen right away
+        self.ipr.link('add', ifname='t1', kind='dummy', master=2)
+        assert self.ipr.link_lookup(master=2) == [3, 4]
+        self.ipr.link('set', index=4, ifname='t2')
+        assert index.lookup('ifname', 't2') == [4]
+        assert index.lookup('ifname', 't1') == []
+        # changes of other sockets -- after the next request
+        with SimIPRoute(kernel=self.ipr.kernel) as ipr:
+            ipr.link('del', index=3)
+        self.ipr.get_links(1)
+        assert self.ipr.link_lookup(master=2) == [4]
+        assert self.ipr.link_lookup(kind='dummy') == [4]
+        # reload
+        index.load()
+        assert index.lookup('kind', 'dummy') == [4]
+        assert sorted(index.links) == [1, 2, 4]
+
+
+class TestMatch(object):
+
+    def setup(self):
+        self.ipr = SimIPRoute()
+        self.ipr.link('add', ifname='t0', kind='dummy')
+        self.ipr.link('set', index=2, state='up')
+        self.ipr.addr('add', index=2, address='10.255.0.1', mask=24)
+        for (i, spec) in enumerate(routes(40)):
+            self.ipr.route('add',
+                           gateway='10.255.0.%i' % (2 + i % 2),
+                           table=254 if i % 4 else 1000,
+                           priority=i % 3,
+                           **spec)
+
+    def teardown(self):
+        self.ipr.close()
+
+    def test_match(self):
+        for record in (False, True):
+            msgs = self.ipr.route('dump', record=record)
+            for (spec, count) in (({'table': 1000}, 10),
+                                  ({'table': lambda x: x > 255}, 0),
+                                  ({'gateway': '10.255.0.2'}, 20),
+                                  ({'gateway': None}, 40),
+                                  ({'priority': lambda x: x > 1,
+                                    'dst_len': 24}, 13),
+                                  ({'foo': None}, 40),
+                                  ({'foo': 1}, 0),
+                                  ({'type': 1}, 40)):
+                predicate = compile_match(spec)
+                assert len([x for x in msgs if predicate(x)]) == count
+
+    def test_prefilter(self):
+        assert match_prefilter(rtmsg, {'table': 1000,
+                                       'type': 1,
+                                       'dst_len': 24,
+                                       'proto': 'static',
+                                       'gateway': '10.0.0.1'}) == \
+            {'table': 1000, 'dst_len': 24}
+        assert len(self.ipr.get_routes(table=1000, dst_len=24)) == 10
+        assert len(self.ipr.get_routes(dst_len=16, record=True)) == 0
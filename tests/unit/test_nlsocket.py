@@ -0,0 +1,207 @@
+import socket
+import threading
+import time
+import tracemalloc
+from pyroute2.netlink import rtnl
+from pyroute2.netlink.nlsocket import BufferPool
+from pyroute2.netlink.nlsocket import Histogram
+from pyroute2.netlink.nlsocket import SocketStats
+from pyroute2.netlink.rtnl.ifinfmsg import ifinfmsg
+from pyroute2.netlink.rtnl.resync import ResyncCache
+
+
+class TestBufferPool(object):
+
+    def setup(self):
+        self.rx, self.tx = socket.socketpair(socket.AF_UNIX,
+                                             socket.SOCK_DGRAM)
+
+    def teardown(self):
+        self.rx.close()
+        self.tx.close()
+
+    def test_copy(self):
+        pool = BufferPool(size=8192)
+        for size in (100, 5000):
+            self.tx.send(b'x' * size)
+            data = pool.recv(self.rx)
+            assert data == b'x' * size
+            # the pool buffer is reused at once
+            assert len(pool.free) == 1
+            assert pool.free[0] is not data
+
+    def test_retained(self):
+        # retained datagrams don't pin the pool buffers
+        pool = BufferPool(size=65536)
+        tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+        retained = []
+        for _ in range(50):
+            self.tx.send(b'x' * 5000)
+            retained.append(pool.recv(self.rx))
+        used = tracemalloc.get_traced_memory()[0] - base
+        tracemalloc.stop()
+        assert len(pool.free) == 1
+        assert used < 65536 + 50 * 8192
+
+    def test_truncated(self):
+        pool = BufferPool(size=64)
+        self.tx.send(b'x' * 100)
+        data = pool.recv(self.rx)
+        assert data == b'x' * 64
+        assert pool.truncated == 1
+        assert pool.size >= 100
+
+
+class TestResync(object):
+
+    def setup(self):
+        from pyroute2.netlink.rtnl.marshal import MarshalRtnl
+        self.links = {}
+        self.counters = {}
+        self.marshal = MarshalRtnl()
+        self.backlog = {0: []}
+        self.backlog_lock = threading.Lock()
+
+    def link(self, index, ifname, msg_type=rtnl.RTM_NEWLINK):
+        msg = ifinfmsg()
+        msg['header']['type'] = msg_type
+        msg['index'] = index
+        msg['attrs'] = [['IFLA_IFNAME', ifname]]
+        if index in self.counters:
+            msg['attrs'].append(['IFLA_STATS64',
+                                 {'rx_packets': self.counters[index]}])
+        msg.encode()
+        return self.marshal.parse(msg.data)[0]
+
+    def nlm_request(self, msg, msg_type, msg_flags):
+        return [self.link(*x) for x in self.links.items()]
+
+    def test_resync(self):
+        self.links = {1: 'lo', 2: 'eth0', 3: 'eth1'}
+        cache = ResyncCache(self, rtnl.RTMGRP_LINK)
+        cache.load()
+        assert set(cache.classes[0].state) == set((1, 2, 3))
+        # an event, received before the overflow
+        self.links[4] = 'eth2'
+        cache.update(self.link(4, 'eth2'))
+        # lost events
+        del self.links[2]
+        self.links[3] = 'eth3'
+        self.links[5] = 'eth5'
+        cache.overflow = True
+        cache.resync()
+        assert not cache.overflow
+        events = dict((x['index'], x) for x in self.backlog[0])
+        assert set(events) == set((2, 3, 5))
+        assert events[2]['header']['type'] == rtnl.RTM_DELLINK
+        assert events[2].get_attr('IFLA_IFNAME') == 'eth0'
+        assert events[3]['header']['type'] == rtnl.RTM_NEWLINK
+        assert events[3].get_attr('IFLA_IFNAME') == 'eth3'
+        assert events[5]['header']['type'] == rtnl.RTM_NEWLINK
+        # no changes -- no events
+        self.backlog[0] = []
+        cache.resync()
+        assert self.backlog[0] == []
+
+    def test_counters(self):
+        self.links = {1: 'lo', 2: 'eth0'}
+        self.counters = {1: 10, 2: 20}
+        cache = ResyncCache(self, rtnl.RTMGRP_LINK)
+        cache.load()
+        # only the counters are changed -- no events
+        self.counters = {1: 11, 2: 21}
+        cache.resync()
+        assert self.backlog[0] == []
+        # the counters are ignored, the other NLAs are not
+        self.links[2] = 'eth1'
+        self.counters = {1: 12, 2: 22}
+        cache.resync()
+        assert [x['index'] for x in self.backlog[0]] == [2]
+        assert self.backlog[0][0].get_attr('IFLA_IFNAME') == 'eth1'
+
+
+class TestStats(object):
+
+    def test_histogram(self):
+        hist = Histogram()
+        for value in (0, 0.0000015, 0.000003, 0.001):
+            hist.add(value)
+        ret = hist.dump()
+        assert ret['count'] == 4
+        assert ret['max'] == 0.001
+        assert ret['buckets'] == {1: 1, 2: 1, 4: 1, 1024: 1}
+
+    def test_parse(self):
+        from pyroute2.netlink.rtnl.marshal import MarshalRtnl
+        stats = SocketStats()
+        marshal = MarshalRtnl()
+        marshal.stats = stats
+        data = b''
+        for index in (1, 2):
+            msg = ifinfmsg()
+            msg['header']['type'] = rtnl.RTM_NEWLINK
+            msg['index'] = index
+            msg.encode()
+            data += msg.data
+        assert len(marshal.parse(data)) == 2
+        ret = stats.dump()
+        assert ret['msgs_recv'] == 2
+        assert ret['bytes_recv'] == len(data)
+        assert ret['parse']['ifinfmsg']['count'] == 2
+
+
+class TestWaiters(object):
+
+    def setup(self):
+        from pyroute2.iproute.linux import SimIPRoute
+        self.ipr = SimIPRoute()
+        self.ipr.bind(rtnl.RTMGRP_LINK)
+        self.events = []
+        self.latency = []
+        self.lock = threading.Lock()
+
+    def teardown(self):
+        self.ipr.close()
+
+    def requests(self, count):
+        for _ in range(count):
+            start = time.time()
+            assert self.ipr.link('get', index=1)[0]['index'] == 1
+            with self.lock:
+                self.latency.append(time.time() - start)
+
+    def broadcasts(self, total):
+        try:
+            while len(self.events) < total:
+                for msg in self.ipr.get():
+                    with self.lock:
+                        self.events.append(msg)
+        except (IOError, OSError):
+            # the socket is closed
+            pass
+
+    def test_threads(self):
+        total = 40
+        readers = [threading.Thread(target=self.broadcasts, args=(total, ))
+                   for _ in range(2)]
+        workers = [threading.Thread(target=self.requests, args=(50, ))
+                   for _ in range(8)]
+        for thread in readers + workers:
+            thread.daemon = True
+            thread.start()
+        for i in range(total):
+            self.ipr.link('add', ifname='t%i' % i, kind='dummy')
+        for thread in workers:
+            thread.join(10)
+        deadline = time.time() + 5
+        while len(self.events) < total and time.time() < deadline:
+            time.sleep(0.01)
+        # no lost wakeups: all the requests and events are served
+        # w/o falling back to the one second poll
+        assert len(self.latency) == 400
+        assert max(self.latency) < 0.5
+        assert len([x for x in self.events
+                    if x['header']['type'] == rtnl.RTM_NEWLINK]) == total
+        # the waiters of finished calls are removed
+        assert not [x for x in self.ipr.waiters if x != 0]
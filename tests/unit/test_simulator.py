@@ -0,0 +1,185 @@
+import time
+import errno
+import struct
+from socket import SOL_SOCKET
+from socket import SO_RCVBUF
+from pyroute2 import IPDB
+from pyroute2.netlink import NLM_F_ACK
+from pyroute2.netlink import NLM_F_CREATE
+from pyroute2.netlink import NLM_F_EXCL
+from pyroute2.netlink import rtnl
+from pyroute2.netlink.exceptions import NetlinkError
+from pyroute2.netlink.rtnl.simulator import Kernel
+from pyroute2.netlink.rtnl.simulator import SimSocket
+from pyroute2.netlink.rtnl.simulator import IFLA_IFNAME
+from pyroute2.netlink.rtnl.simulator import IFLA_MTU
+from pyroute2.netlink.rtnl.simulator import message
+from pyroute2.netlink.rtnl.simulator import nla
+from pyroute2.iproute.linux import SimIPRoute
+
+
+class TestSimulator(object):
+
+    def setup(self):
+        self.ipr = SimIPRoute()
+        self.ipr.link('add', ifname='t0', kind='dummy')
+        self.index = self.ipr.link_lookup(ifname='t0')[0]
+
+    def teardown(self):
+        self.ipr.close()
+
+    def test_loopback(self):
+        lo = self.ipr.get_links(1)[0]
+        assert lo.get_attr('IFLA_IFNAME') == 'lo'
+        assert lo.get_attr('IFLA_OPERSTATE') == 'UP'
+        addr = self.ipr.get_addr(index=1)[0]
+        assert addr.get_attr('IFA_ADDRESS') == '127.0.0.1'
+
+    def test_link(self):
+        self.ipr.link('set', index=self.index, state='up', mtu=9000)
+        link = self.ipr.get_links(self.index)[0]
+        assert link['flags'] & 1
+        assert link.get_attr('IFLA_MTU') == 9000
+        assert link.get_attr('IFLA_OPERSTATE') == 'UP'
+        assert link.get_attr('IFLA_ADDRESS') == '02:00:00:00:00:02'
+        self.ipr.link('del', index=self.index)
+        assert not self.ipr.link_lookup(ifname='t0')
+
+    def test_errors(self):
+        for (code, call) in ((errno.EEXIST,
+                              lambda: self.ipr.link('add',
+                                                    ifname='t0',
+                                                    kind='dummy')),
+                             (errno.ENODEV,
+                              lambda: self.ipr.get_links(1000)),
+                             (errno.ENODEV,
+                              lambda: self.ipr.addr('add',
+                                                    index=1000,
+                                                    address='10.0.0.1',
+                                                    mask=24)),
+                             (errno.ESRCH,
+                              lambda: self.ipr.route('del',
+                                                     dst='10.1.0.0/24'))):
+            try:
+                call()
+            except NetlinkError as e:
+                assert e.code == code
+            else:
+                raise AssertionError('exception expected')
+
+    def test_addr_route(self):
+        self.ipr.link('set', index=self.index, state='up')
+        self.ipr.addr('add', index=self.index, address='10.0.0.1', mask=24)
+        self.ipr.route('add', dst='10.1.0.0/16', gateway='10.0.0.2')
+        self.ipr.route('add', dst='10.1.2.0/24', gateway='10.0.0.3')
+        assert len(self.ipr.get_addr(index=self.index)) == 1
+        assert len(self.ipr.get_routes(dst='10.1.0.0', dst_len=16)) == 1
+        # longest prefix match
+        route = self.ipr.route('get', dst='10.1.2.3')[0]
+        assert route.get_attr('RTA_GATEWAY') == '10.0.0.3'
+        route = self.ipr.route('get', dst='10.1.3.3')[0]
+        assert route.get_attr('RTA_GATEWAY') == '10.0.0.2'
+        self.ipr.route('del', dst='10.1.2.0/24', gateway='10.0.0.3')
+        route = self.ipr.route('get', dst='10.1.2.3')[0]
+        assert route.get_attr('RTA_GATEWAY') == '10.0.0.2'
+
+    def test_dump_chunks(self):
+        for i in range(500):
+            self.ipr.route('add', dst='10.%i.%i.0/24' % (i >> 8, i & 0xff),
+                           oif=self.index)
+        assert len(self.ipr.get_routes(oif=self.index)) == 500
+
+    def test_broadcast(self):
+        self.ipr.bind()
+        with SimIPRoute(kernel=self.ipr.kernel) as ipr:
+            ipr.addr('add', index=self.index, address='10.0.0.1', mask=24)
+            ipr.link('del', index=self.index)
+        events = []
+        while len(events) < 2:
+            events.extend(self.ipr.get())
+        assert [x['header']['type'] for x in events] == [rtnl.RTM_NEWADDR,
+                                                         rtnl.RTM_DELADDR]
+        events = self.ipr.get()
+        assert events[0]['header']['type'] == rtnl.RTM_DELLINK
+
+    def test_enobufs(self):
+        kernel = Kernel()
+        sock = SimSocket(kernel)
+        sock.bind((0, rtnl.RTMGRP_LINK))
+        sock.setsockopt(SOL_SOCKET, SO_RCVBUF, 512)
+        with SimIPRoute(kernel=kernel) as ipr:
+            for i in range(10):
+                ipr.link('add', ifname='t%i' % i, kind='dummy')
+        try:
+            sock.recv(16384)
+        except OSError as e:
+            assert e.errno == errno.ENOBUFS
+        else:
+            raise AssertionError('exception expected')
+        # the queued broadcasts are still there
+        assert sock.recv(16384)
+        sock.close()
+
+    def test_scale(self):
+        # lookups use the indices: no request scans the tables
+        kernel = Kernel()
+        count = 20000
+
+        def link(msg_type, flags, ifname, nlas=()):
+            data = message(msg_type, flags | NLM_F_ACK,
+                           struct.pack('BBHiII', 0, 0, 0, 0, 0, 0),
+                           (nla(IFLA_IFNAME, ifname),) + nlas)
+            ret = kernel.request(data)[0][0]
+            return struct.unpack_from('i', ret, 16)[0]
+
+        start = time.time()
+        for i in range(count):
+            assert link(rtnl.RTM_NEWLINK, NLM_F_CREATE | NLM_F_EXCL,
+                        b't%i\0' % i) == 0
+        for i in range(count):
+            assert link(rtnl.RTM_SETLINK, 0, b't%i\0' % i,
+                        (nla(IFLA_MTU, struct.pack('I', 9000)), )) == 0
+        for i in range(0, count, 2):
+            assert link(rtnl.RTM_DELLINK, 0, b't%i\0' % i) == 0
+        assert link(rtnl.RTM_DELLINK, 0, b't0\0') == -errno.ENODEV
+        assert len(kernel.links.objects) == count // 2 + 1
+        assert time.time() - start < 10
+
+
+class TestIPDB(object):
+
+    def wait(self, check, timeout=3):
+        limit = time.time() + timeout
+        while not check() and time.time() < limit:
+            time.sleep(0.05)
+        return check()
+
+    def test_add_del(self):
+        kernel = Kernel()
+        ipdb = IPDB(nl=SimIPRoute(kernel=kernel))
+        ipr = SimIPRoute(kernel=kernel)
+        try:
+            # changes made via IPDB
+            with ipdb.create(ifname='t0', kind='dummy') as i:
+                i.add_ip('10.0.0.1/24')
+            assert ('10.0.0.1', 24) in ipdb.interfaces.t0.ipaddr
+            ipdb.interfaces.t0.remove().commit()
+            assert 't0' not in ipdb.interfaces
+            # external changes: IPDB gets only the broadcasts
+            ipr.link('add', ifname='t1', kind='dummy')
+            assert self.wait(lambda: 't1' in ipdb.interfaces)
+            ipr.link('del', index=ipr.link_lookup(ifname='t1')[0])
+            assert self.wait(lambda: 't1' not in ipdb.interfaces)
+        finally:
+            ipr.close()
+            ipdb.release()
+
+    def test_resync(self):
+        # resync is opt-in
+        for (kwarg, enabled) in (({}, False),
+                                 ({'nl_resync': True}, True)):
+            ipdb = IPDB(nl=SimIPRoute(kernel=Kernel()), **kwarg)
+            try:
+                assert (ipdb.mnl.resync_cache is not None) == enabled
+            finally:
+                ipdb.release()